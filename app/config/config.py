@@ -12,6 +12,7 @@ class Settings(BaseSettings):
     app_host: str = Field(..., env="app_host")
     app_port: int = Field(..., env="app_port")
     app_session_lifetime: int = Field(..., env="app_session_lifetime")
+    app_session_backend: str = Field("postgres", env="app_session_backend")
     app_disable_auth: bool = Field(..., env="app_disable_auth")
     app_env: str = Field(..., env="app_env")
     app_ssl_key: str = Field(..., env="app_ssl_key")
@@ -20,6 +21,7 @@ class Settings(BaseSettings):
     app_admin_pass: str = Field(..., env="app_admin_pass")
     app_token_secret: str = Field(..., env="app_token_secret")
     app_workers: int = Field(..., env="app_workers")
+    app_auth_cache_ttl: int = Field(60, env="app_auth_cache_ttl")
 
     db_host: str = Field(..., env="db_host")
     db_user: str = Field(..., env="db_user")
@@ -27,6 +29,15 @@ class Settings(BaseSettings):
     db_name: str = Field(..., env="db_name")
     db_pool_size: str = Field(..., env="db_pool_size")
     db_max_overflow: str = Field(..., env="db_max_overflow")
+    db_log_storage: str = Field("tables", env="db_log_storage")
+    db_log_partition_interval: str = Field("day", env="db_log_partition_interval")
+    db_log_partitions_ahead: int = Field(7, env="db_log_partitions_ahead")
+    db_log_retention_days: int = Field(0, env="db_log_retention_days")
+    db_rollup_hour_retention_days: int = Field(0, env="db_rollup_hour_retention_days")
+    db_rollup_day_retention_days: int = Field(0, env="db_rollup_day_retention_days")
+    db_retention_batch_size: int = Field(5000, env="db_retention_batch_size")
+    db_query_concurrency: int = Field(4, env="db_query_concurrency")
+    db_endpoint_search: str = Field("trigram", env="db_endpoint_search")
 
     email_domain_name: str = Field(..., env="email_domain_name")
     email_host: str = Field(..., env="email_host")
@@ -34,6 +45,24 @@ class Settings(BaseSettings):
     email_username: str = Field(..., env="email_username")
     email_password: str = Field(..., env="email_password")
 
+    chart_source: str = Field("rollup", env="chart_source")
+    chart_cache_size: int = Field(256, env="chart_cache_size")
+    chart_cache_ttl: int = Field(300, env="chart_cache_ttl")
+
+    probe_concurrency: int = Field(500, env="probe_concurrency")
+    probe_timeout: float = Field(10, env="probe_timeout")
+    probe_refresh_interval: int = Field(60, env="probe_refresh_interval")
+    probe_shards: int = Field(256, env="probe_shards")
+    probe_lease_ttl: int = Field(30, env="probe_lease_ttl")
+    probe_batch_rows: int = Field(1000, env="probe_batch_rows")
+    probe_batch_delay_ms: int = Field(200, env="probe_batch_delay_ms")
+    probe_buffer_rows: int = Field(10000, env="probe_buffer_rows")
+
+    ingest_tokens: str = Field("", env="ingest_tokens")
+    ingest_max_results: int = Field(10000, env="ingest_max_results")
+    ingest_max_body_bytes: int = Field(32 * 1024 * 1024, env="ingest_max_body_bytes")
+    ingest_key_ttl_hours: int = Field(24, env="ingest_key_ttl_hours")
+
     @property
     def app(self) -> Dict[str, str]:
         return {
@@ -44,13 +73,15 @@ class Settings(BaseSettings):
             "host": self.app_host,
             "port": int(self.app_port),
             "session_lifetime": self.app_session_lifetime,
+            "session_backend": self.app_session_backend,
             "disable_auth": self.app_disable_auth,
             "env": self.app_env,
             "ssl_cert": self.app_ssl_cert,
             "ssl_key": self.app_ssl_key,
             "admin_email": self.app_admin_email,
             "admin_pass": self.app_admin_pass,
-            "workers": self.app_workers
+            "workers": self.app_workers,
+            "auth_cache_ttl": self.app_auth_cache_ttl
         }
 
     @property
@@ -61,7 +92,16 @@ class Settings(BaseSettings):
             "password": self.db_password,
             "name": self.db_name,
             "pool_size": self.db_pool_size,
-            "max_overflow": self.db_max_overflow
+            "max_overflow": self.db_max_overflow,
+            "log_storage": self.db_log_storage,
+            "log_partition_interval": self.db_log_partition_interval,
+            "log_partitions_ahead": self.db_log_partitions_ahead,
+            "log_retention_days": self.db_log_retention_days,
+            "rollup_hour_retention_days": self.db_rollup_hour_retention_days,
+            "rollup_day_retention_days": self.db_rollup_day_retention_days,
+            "retention_batch_size": self.db_retention_batch_size,
+            "query_concurrency": self.db_query_concurrency,
+            "endpoint_search": self.db_endpoint_search
         }
 
     @property
@@ -80,6 +120,36 @@ class Settings(BaseSettings):
             "password": self.email_password
         }
 
+    @property
+    def charts(self) -> Dict[str, str]:
+        return {
+            "source": self.chart_source,
+            "cache_size": self.chart_cache_size,
+            "cache_ttl": self.chart_cache_ttl
+        }
+
+    @property
+    def probe(self) -> Dict[str, str]:
+        return {
+            "concurrency": self.probe_concurrency,
+            "timeout": self.probe_timeout,
+            "refresh_interval": self.probe_refresh_interval,
+            "shards": self.probe_shards,
+            "lease_ttl": self.probe_lease_ttl,
+            "batch_rows": self.probe_batch_rows,
+            "batch_delay_ms": self.probe_batch_delay_ms,
+            "buffer_rows": self.probe_buffer_rows
+        }
+
+    @property
+    def ingest(self) -> Dict[str, str]:
+        return {
+            "tokens": self.ingest_tokens,
+            "max_results": self.ingest_max_results,
+            "max_body_bytes": self.ingest_max_body_bytes,
+            "key_ttl_hours": self.ingest_key_ttl_hours
+        }
+
     class Config:
         env_file = ".env"
 
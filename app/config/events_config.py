@@ -1,15 +1,30 @@
 import asyncio
 import hashlib
+import re
 
 from sqlalchemy import create_engine, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.ddl import CreateIndex
 
 from app.config.config import Settings
-from app.models.db_models import Base
-from app.utils.database import SQLALCHEMY_DATABASE_URL, SessionLocal
+from app.models.db_models import Base, create_rollup_function, create_rollup_trigger
+from app.services.log_maintenance_srv import LogMaintenanceService
+from app.utils.chart_cache import CHART_CACHE
+from app.utils.database import SQLALCHEMY_DATABASE_URL, SessionLocal, engine as async_engine, try_advisory_lock
 from app.models import db_models as model
 from app.utils.enums import AccessLevel, DatabaseSchemas
+from app.utils.invalidation_bus import INVALIDATION_BUS
+from app.utils.permission_cache import PERMISSION_CACHE
+from app.utils.session_store import SESSION_STORE, purge_sessions
+from app.utils.logger import Logger
 
 config = Settings().app
+LOGGER = Logger().start_logger()
+
+INDEX_LOCK = "create_indexes"
+INVALID_INDEXES = ("SELECT n.nspname, c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                   "JOIN pg_namespace n ON n.oid = c.relnamespace WHERE NOT i.indisvalid")
+CREATE_INDEX = re.compile(r'^CREATE (UNIQUE )?INDEX IF NOT EXISTS ("?)([^\s"]+)\2 ')
 
 
 async def create_admin_user():
@@ -42,17 +57,99 @@ async def create_schemas():
 
             await session.execute(text(create_schema_sql))
 
+        # Operator classes of the endpoint search index
+        if model.TRIGRAM_SEARCH:
+            await session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await session.commit()
+
+
+ADDED_COLUMNS = [model.EndpointsStatus.__table__.c.status_at]
+
+
+async def create_columns():
+    """Add the columns added to already existing tables, create_all only creates the missing tables."""
+    async with SessionLocal() as session:
+        for column in ADDED_COLUMNS:
+            column_type = column.type.compile(dialect=postgresql.dialect())
+            await session.execute(text(f"ALTER TABLE {column.table.fullname} "
+                                       f"ADD COLUMN IF NOT EXISTS {column.name} {column_type}"))
+
         await session.commit()
 
 
+async def create_indexes():
+    """Create the indexes added to already existing tables, create_all only indexes the tables it creates.
+
+    A single worker builds them, concurrently so the writes to the tables go on meanwhile. An index left invalid by
+    an interrupted build is dropped and built again. Partitioned tables cannot be indexed concurrently.
+    """
+    async with try_advisory_lock(INDEX_LOCK) as acquired:
+        if not acquired:
+            LOGGER.info("The missing indexes are created by another worker.")
+            return
+
+        async with async_engine.connect() as connection:
+            # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            invalid = {tuple(row) for row in await connection.exec_driver_sql(INVALID_INDEXES)}
+
+            for table in Base.metadata.sorted_tables:
+                partitioned = table.dialect_options['postgresql'].get('partition_by')
+                for index in table.indexes:
+                    statement = str(CreateIndex(index, if_not_exists=True).compile(dialect=async_engine.dialect))
+                    match = CREATE_INDEX.match(statement)
+                    try:
+                        if match and not partitioned:
+                            if (table.schema, match.group(3)) in invalid:
+                                await connection.exec_driver_sql(
+                                    f"DROP INDEX CONCURRENTLY IF EXISTS {table.schema}.{match.group(2)}"
+                                    f"{match.group(3)}{match.group(2)}")
+                            statement = CREATE_INDEX.sub(r'CREATE \1INDEX CONCURRENTLY IF NOT EXISTS \2\3\2 ',
+                                                         statement, count=1)
+                        await connection.exec_driver_sql(statement)
+                    except Exception as e:
+                        LOGGER.error(f"Unable to create the index {index.name} of {table.fullname}: {e}")
+
+
+async def create_rollups():
+    await create_rollup_function()
+
+    async with SessionLocal() as session:
+        result = await session.execute(select(model.Endpoints.log_table)
+                                       .where(model.Endpoints.log_table.isnot(None)))
+        log_tables = result.scalars().all()
+
+    for log_table in [model.EndpointChecks.__tablename__, *log_tables]:
+        try:
+            await create_rollup_trigger(log_table, backfill=True)
+        except Exception as e:
+            LOGGER.warning(f"Unable to attach rollup trigger to log table {log_table}: {e}")
+
+
 async def startup_event():
     # Database setup
     await create_schemas()
 
     engine = create_engine(SQLALCHEMY_DATABASE_URL)
     Base.metadata.create_all(bind=engine)
+    await create_columns()
+    # Building the indexes of large tables takes a while, the worker serves meanwhile.
+    asyncio.create_task(create_indexes())
 
     await create_admin_user()
+    await create_rollups()
+
+    if LogMaintenanceService.is_partitioned():
+        await LogMaintenanceService().maintain_partitions()
+    asyncio.create_task(LogMaintenanceService().run())
+
+    # In-process caches are kept consistent across workers by the invalidation events
+    CHART_CACHE.subscribe(INVALIDATION_BUS)
+    PERMISSION_CACHE.subscribe(INVALIDATION_BUS)
+    asyncio.create_task(INVALIDATION_BUS.run())
+
+    if SESSION_STORE is not None:
+        asyncio.create_task(purge_sessions(SESSION_STORE))
 
 
 async def shutdown_event():
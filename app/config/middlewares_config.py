@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
 from app.config.config import Settings
+from app.utils.session_store import ServerSessionMiddleware, SESSION_STORE
 
 config = Settings().app
 
@@ -28,8 +29,16 @@ def configure(app: FastAPI):
         allow_headers=["*"],
     )
 
-    app.add_middleware(SessionMiddleware,
-                       secret_key=config['secret_key'],
+    if SESSION_STORE is None:
+        app.add_middleware(SessionMiddleware,
+                           secret_key=config['secret_key'],
+                           https_only=True,
+                           same_site=same_site_value,
+                           max_age=int(config['session_lifetime']))
+        return
+
+    app.add_middleware(ServerSessionMiddleware,
+                       store=SESSION_STORE,
                        https_only=True,
                        same_site=same_site_value,
                        max_age=int(config['session_lifetime']))
@@ -1,7 +1,8 @@
 from fastapi import FastAPI
 from app.config.config import Settings
 
-from app.routers import auth_rt, status_rt, users_rt, endpoints_rt, admin_rt, notifications_rt, dashboards_rt
+from app.routers import auth_rt, status_rt, users_rt, endpoints_rt, admin_rt, notifications_rt, dashboards_rt, \
+    ingest_rt
 
 config = Settings().app
 
@@ -14,5 +15,6 @@ def configure(app: FastAPI):
     app.include_router(admin_rt.router, prefix=config['root_path'])
     app.include_router(notifications_rt.router, prefix=config['root_path'])
     app.include_router(dashboards_rt.router, prefix=config['root_path'])
+    app.include_router(ingest_rt.router, prefix=config['root_path'])
 
 
@@ -8,6 +8,8 @@ from sqlalchemy.orm import selectinload, Session, joinedload
 from app.models import db_models as model
 from app.schemas.dashboards_sch import CreateDashboard, DashboardEndpointCreate, DashboardEndpoint
 from app.utils import database
+from app.utils.enums import InvalidationEvents
+from app.utils.invalidation_bus import publish
 from app.utils.logger import Logger
 
 LOGGER = Logger().start_logger()
@@ -24,13 +26,13 @@ class DashboardDAO:
 
     async def get_all(self) -> List[model.Dashboards]:
         """Fetch all dashboards."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Dashboards).order_by(model.Dashboards.created_at))
             return result.scalars().all()
 
     async def get_all_by_ids(self, ids: List[int]) -> List[model.Dashboards]:
         """Fetch all dashboards by ids."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Dashboards)
                                            .options(
                                                 joinedload(model.Dashboards.endpoints)
@@ -43,7 +45,7 @@ class DashboardDAO:
 
     async def get_by_id(self, dashboard_id: int) -> model.Dashboards:
         """Fetch a specific dashboard by ID."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(
                 select(model.Dashboards)
                 .options(selectinload(model.Dashboards.endpoints)
@@ -55,7 +57,7 @@ class DashboardDAO:
 
     async def get_by_uuid(self, dashboard_uuid: str) -> model.Dashboards:
         """Fetch a specific dashboard by ID."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Dashboards)
                                            .options(selectinload(model.Dashboards.endpoints)
                                                     .selectinload(model.DashboardEndpoints.endpoint))
@@ -72,8 +74,9 @@ class DashboardDAO:
             user_id=dashboard_data.user_id,
         )
         try:
-            async with self.db:
+            async with database.session_scope(self.db):
                 self.db.add(dashboard)
+                await publish(self.db, InvalidationEvents.PERMISSIONS_CHANGED.value, user_id=dashboard_data.user_id)
                 await self.db.commit()
                 return dashboard
         except IntegrityError as e:
@@ -87,7 +90,7 @@ class DashboardDAO:
 
     async def update(self, dashboard_id: int, data_to_update: dict) -> model.Dashboards:
         """Update an existing dashboard."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(update(model.Dashboards)
                                   .where(model.Dashboards.id == dashboard_id).values(**data_to_update))
             await self.db.commit()
@@ -96,8 +99,9 @@ class DashboardDAO:
 
     async def delete(self, dashboard_id: int):
         """Delete a dashboard."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(delete(model.Dashboards).where(model.Dashboards.id == dashboard_id))
+            await publish(self.db, InvalidationEvents.PERMISSIONS_CHANGED.value)
             await self.db.commit()
 
     async def update_endpoints_in_dashboard(self, dashboard_id: int, endpoints_data: List[DashboardEndpoint]):
@@ -117,7 +121,7 @@ class DashboardDAO:
                     i=endpoint.i
                 )
                 for endpoint in endpoints_data]
-            async with self.db:
+            async with database.session_scope(self.db):
                 self.db.add_all(endpoints)
                 await self.db.commit()
         except IntegrityError as e:
@@ -140,7 +144,7 @@ class DashboardDAO:
                 h=endpoints_data.h,
                 i=endpoints_data.i
             )
-            async with self.db:
+            async with database.session_scope(self.db):
                 await self.db.execute(update(model.DashboardEndpoints)
                                       .where(model.DashboardEndpoints.endpoint_id == endpoints_data.id)
                                       .where(model.DashboardEndpoints.i == endpoints_data.i)
@@ -158,14 +162,14 @@ class DashboardDAO:
 
     async def delete_assigned_endpoints(self, dashboard_id: int) -> None:
         """Delete all endpoints for a dashboard."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(delete(model.DashboardEndpoints)
                                   .where(model.DashboardEndpoints.dashboard_id == dashboard_id))
             await self.db.commit()
 
     async def delete_assigned_widget(self, dashboard_id: int, widget_id: int) -> None:
         """Delete dashboard widget."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(delete(model.DashboardEndpoints)
                                   .where(model.DashboardEndpoints.dashboard_id == dashboard_id)
                                   .where(model.DashboardEndpoints.i == widget_id))
@@ -189,7 +193,7 @@ class DashboardDAO:
                 )
                 for endpoint_id in endpoints_data.endpoints]
 
-            async with self.db:
+            async with database.session_scope(self.db):
                 self.db.add_all(endpoints)
                 await self.db.commit()
         except IntegrityError as e:
@@ -1,14 +1,26 @@
-from typing import List, Dict
+import json
+from datetime import datetime
+from typing import List, Dict, Tuple
 
 from psycopg2 import errorcodes
-from sqlalchemy import select, delete, update, String, or_, func
+from sqlalchemy import select, delete, update, String, Integer, TIMESTAMP, or_, func, tuple_, literal_column, column, \
+    values, Select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import joinedload, selectinload, Session
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import joinedload, selectinload, noload, Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
 
+from app.config.config import Settings
 from app.models import db_models as model
 from app.schemas.endpoints_sch import CreateEndpointInDb
 from app.utils import database
-from app.utils.enums import EndpointPermissions
+from app.utils.enums import EndpointPermissions, InvalidationEvents, EndpointSearchModes
+from app.utils.invalidation_bus import publish
+
+db_config = Settings().database
+
+# Three bound parameters per row, below the 32767 parameters of a PostgreSQL statement.
+STATUS_UPDATE_CHUNK = 10000
 
 
 class DuplicateEndpointError(Exception):
@@ -16,18 +28,32 @@ class DuplicateEndpointError(Exception):
         self.detail = detail
 
 
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN of a statement, its bound parameters are sent along like for the statement itself."""
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element: _Explain, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
 class EndpointDAO:
     def __init__(self, db: Session = None):
         self.db = db or database.SessionLocal()
 
     async def get_all_with_latest_log_status(self, page: int, per_page: int, search_query: str,
                                              user_endpoints: dict = None,
-                                             is_admin: bool = False) -> List[model.Endpoints]:
+                                             is_admin: bool = False, after: Tuple = None,
+                                             endpoint_status: str = None) -> List[model.Endpoints]:
         """Fetch all endpoints with their latest log status."""
-        async with self.db:
+        async with database.session_scope(self.db):
             try:
                 endpoints = await self._fetch_endpoints_with_filter(page, per_page, search_query,
-                                                                    user_endpoints, is_admin)
+                                                                    user_endpoints, is_admin, after, endpoint_status)
 
                 self._apply_permissions(endpoints, user_endpoints)
                 return endpoints
@@ -35,38 +61,127 @@ class EndpointDAO:
                 await self.db.rollback()
                 raise e
 
-    async def _fetch_endpoints_with_filter(self, page: int, per_page: int, search_query: str,
-                                           user_endpoints: dict, is_admin: bool) -> List[model.Endpoints]:
-        """Fetch endpoints based on given criteria."""
-        query = select(model.Endpoints).options(
-            selectinload(model.Endpoints.notifications).selectinload(model.EndpointNotifications.notification)
-        ).join(model.EndpointsStatus)
+    @classmethod
+    def _search_filter(cls, search_query: str):
+        if db_config['endpoint_search'] == EndpointSearchModes.TRIGRAM.value:
+            # Same expression as the trigram index, a leading wildcard pattern is matched through the index.
+            return literal_column(model.ENDPOINT_SEARCH_DOCUMENT).ilike(f"%{search_query}%")
+
+        return or_(
+            model.Endpoints.name.ilike(f"%{search_query}%"),
+            model.Endpoints.description.ilike(f"%{search_query}%"),
+            model.Endpoints.url.ilike(f"%{search_query}%"),
+            model.Endpoints.response.cast(String).ilike(f"%{search_query}%"),
+            model.EndpointsStatus.status.ilike(f"%{search_query}%")  # Ensure this relation exists and is correct
+        )
+
+    def _filter_endpoints(self, query: Select, search_query: str, user_endpoints: dict, is_admin: bool,
+                          endpoint_status: str = None) -> Select:
+        """Restrict a query to the endpoints visible to the user, matching the search and the exact status."""
+        query = query.join(model.EndpointsStatus)
 
         # Apply filtering for non-admin users
         if not is_admin:
-            if user_endpoints:
-                query = query.where(model.Endpoints.id.in_(user_endpoints.keys()))
-            else:
-                return []
+            query = query.where(model.Endpoints.id.in_(user_endpoints.keys()))
 
         # Apply search filter
         if search_query:
-            search_filter = or_(
-                model.Endpoints.name.ilike(f"%{search_query}%"),
-                model.Endpoints.description.ilike(f"%{search_query}%"),
-                model.Endpoints.url.ilike(f"%{search_query}%"),
-                model.Endpoints.response.cast(String).ilike(f"%{search_query}%"),
-                model.EndpointsStatus.status.ilike(f"%{search_query}%")  # Ensure this relation exists and is correct
-            )
-            query = query.where(search_filter)
+            query = query.where(self._search_filter(search_query))
+
+        if endpoint_status:
+            query = query.where(model.EndpointsStatus.status == endpoint_status)
+
+        return query
+
+    def _endpoints_page_query(self, page: int, per_page: int, search_query: str, user_endpoints: dict,
+                              is_admin: bool, *columns, after: Tuple = None, endpoint_status: str = None) -> Select:
+        """Build the query of a page of endpoints ordered by (created_at, id).
+
+        With `after`, the (created_at, id) of the last endpoint of the previous page, the page is found by seeking the
+        index instead of skipping the rows of all the previous pages.
+        """
+        query = select(model.Endpoints, *columns).options(
+            selectinload(model.Endpoints.notifications).selectinload(model.EndpointNotifications.notification)
+        )
+        query = self._filter_endpoints(query, search_query, user_endpoints, is_admin, endpoint_status)
 
         # Apply ordering and pagination
-        query = query.order_by(model.Endpoints.created_at).offset((page - 1) * per_page).limit(per_page)
+        query = query.order_by(model.Endpoints.created_at, model.Endpoints.id)
+        if after:
+            return query.where(tuple_(model.Endpoints.created_at, model.Endpoints.id) > tuple_(*after)).limit(per_page)
+        return query.offset((page - 1) * per_page).limit(per_page)
+
+    async def _fetch_endpoints_with_filter(self, page: int, per_page: int, search_query: str,
+                                           user_endpoints: dict, is_admin: bool, after: Tuple = None,
+                                           endpoint_status: str = None) -> List[model.Endpoints]:
+        """Fetch endpoints based on given criteria."""
+        if not is_admin and not user_endpoints:
+            return []
 
         # Execute the query and fetch results
-        result = await self.db.execute(query)
+        result = await self.db.execute(self._endpoints_page_query(page, per_page, search_query, user_endpoints,
+                                                                  is_admin, after=after,
+                                                                  endpoint_status=endpoint_status))
         return result.scalars().all()
 
+    async def get_page_with_total(self, page: int, per_page: int, search_query: str, user_endpoints: dict = None,
+                                  is_admin: bool = False,
+                                  endpoint_status: str = None) -> Tuple[List[model.Endpoints], int]:
+        """Fetch a page of endpoints and the total count of matching endpoints in a single query.
+
+        The total is computed with a window function over the filtered rows, before the offset and limit apply. A page
+        past the end has no row to carry it, in that case only the total is counted.
+        """
+        if not is_admin and not user_endpoints:
+            return [], 0
+
+        async with database.session_scope(self.db):
+            try:
+                result = await self.db.execute(self._endpoints_page_query(
+                    page, per_page, search_query, user_endpoints, is_admin, func.count().over().label("total_count"),
+                    endpoint_status=endpoint_status))
+                rows = result.all()
+                endpoints = [row[0] for row in rows]
+                if rows:
+                    total_count = rows[0].total_count
+                elif page > 1:
+                    total_count = await self.count_endpoints(search_query, user_endpoints, is_admin, endpoint_status)
+                else:
+                    total_count = 0
+
+                self._apply_permissions(endpoints, user_endpoints)
+                return endpoints, total_count
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    async def count_endpoints(self, search_query: str, user_endpoints: dict = None, is_admin: bool = False,
+                              endpoint_status: str = None) -> int:
+        """Count the endpoints visible to the user and matching the search."""
+        if not is_admin and not user_endpoints:
+            return 0
+
+        query = self._filter_endpoints(select(func.count()).select_from(model.Endpoints), search_query,
+                                       user_endpoints, is_admin, endpoint_status)
+        async with database.session_scope(self.db):
+            result = await self.db.execute(query)
+            return result.scalar()
+
+    async def estimate_total(self, search_query: str, user_endpoints: dict = None, is_admin: bool = False,
+                             endpoint_status: str = None) -> int:
+        """Estimate the count of matching endpoints from the planner statistics, without scanning them."""
+        if not is_admin and not user_endpoints:
+            return 0
+
+        query = self._filter_endpoints(select(model.Endpoints.id), search_query, user_endpoints, is_admin,
+                                       endpoint_status)
+        async with database.session_scope(self.db):
+            result = await self.db.execute(_Explain(query))
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+
     def _apply_permissions(self, endpoints: List[model.Endpoints], user_endpoints: Dict[int, dict] = None) -> None:
         """Apply permissions to endpoints."""
         for endpoint in endpoints:
@@ -75,16 +190,40 @@ class EndpointDAO:
             else:
                 endpoint.permission = EndpointPermissions.UPDATE.value
 
+    async def get_all_with_log_table(self) -> List[model.Endpoints]:
+        """Fetch all endpoints which have a log table."""
+        async with database.session_scope(self.db):
+            result = await self.db.execute(select(model.Endpoints).where(model.Endpoints.log_table.isnot(None))
+                                           .order_by(model.Endpoints.id))
+            return result.scalars().all()
+
+    async def get_all_to_probe(self, shard_count: int = None, shards: List[int] = None) -> List[model.Endpoints]:
+        """Fetch all endpoints which have a cron schedule, or only those of the given shards, with their status."""
+        query = select(model.Endpoints).where(model.Endpoints.cron.isnot(None)).order_by(model.Endpoints.id)
+        if shard_count:
+            query = query.where((model.Endpoints.id % shard_count).in_(shards or []))
+
+        async with database.session_scope(self.db):
+            result = await self.db.execute(query)
+            return result.scalars().all()
+
+    async def get_by_ids(self, endpoint_ids: List[int]) -> Dict[int, model.Endpoints]:
+        """Fetch the given endpoints by their ID, without their relationships."""
+        async with database.session_scope(self.db):
+            result = await self.db.execute(select(model.Endpoints).options(noload('*'))
+                                           .where(model.Endpoints.id.in_(endpoint_ids)))
+            return {endpoint.id: endpoint for endpoint in result.scalars().all()}
+
     async def get_by_id(self, endpoint_id: int) -> model.Endpoints:
         """Fetch a specific endpoint by its ID."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Endpoints).where(model.Endpoints.id == endpoint_id))
             return result.scalars().first()
 
     async def get_by_id_with_latest_log_status(self, endpoint_id: int, user_endpoints: dict, is_admin: bool) \
             -> model.Endpoints:
         """Fetch a specific endpoint by its ID."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Endpoints)
                                            .options(joinedload(model.Endpoints.notifications)
                                                     .joinedload(model.EndpointNotifications.notification))
@@ -104,17 +243,19 @@ class EndpointDAO:
 
     async def update(self, endpoint_id: int, updated_data) -> model.Endpoints:
         """Update an existing endpoint."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(update(model.Endpoints)
                                   .where(model.Endpoints.id == endpoint_id).values(**updated_data))
+            await publish(self.db, InvalidationEvents.ENDPOINT_UPDATED.value, endpoint_id=endpoint_id)
             await self.db.commit()
 
         return await self.get_by_id(endpoint_id)
 
     async def delete(self, endpoint_id: int):
         """Delete an endpoint."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(delete(model.Endpoints).where(model.Endpoints.id == endpoint_id))
+            await publish(self.db, InvalidationEvents.ENDPOINT_DELETED.value, endpoint_id=endpoint_id)
             await self.db.commit()
 
     async def create(self, db_data: CreateEndpointInDb) -> model.Endpoints:
@@ -132,7 +273,7 @@ class EndpointDAO:
             type=db_data.type
         )
         try:
-            async with self.db:
+            async with database.session_scope(self.db):
                 self.db.add(endpoint)
                 await self.db.commit()
                 return endpoint
@@ -154,8 +295,9 @@ class EndpointDAO:
             permissions=permissions
         )
         try:
-            async with self.db:
+            async with database.session_scope(self.db):
                 self.db.add(user_endpoint)
+                await publish(self.db, InvalidationEvents.PERMISSIONS_CHANGED.value, user_id=user_id)
                 await self.db.commit()
                 return user_endpoint
         except IntegrityError as e:
@@ -175,7 +317,7 @@ class EndpointDAO:
             status=status
         )
         try:
-            async with self.db:
+            async with database.session_scope(self.db):
                 self.db.add(user_endpoint)
                 await self.db.commit()
                 return user_endpoint
@@ -184,39 +326,50 @@ class EndpointDAO:
             await self.db.rollback()
             raise e
 
-    async def count_total_invoices(self, search_query: str = None, user_endpoints: dict = None):
-        """Count the total number of endpoints in the database."""
-        async with self.db:
-            query = select(func.count()).select_from(model.Endpoints)
-            if user_endpoints:
-                query = query.where(model.Endpoints.id.in_(user_endpoints.keys()))
-
-            if search_query:
-                search_filter = or_(
-                    model.Endpoints.name.ilike(f"%{search_query}%"),
-                    model.Endpoints.description.ilike(f"%{search_query}%"),
-                    model.Endpoints.url.ilike(f"%{search_query}%"),
-                    model.Endpoints.response.cast(String).ilike(f"%{search_query}%"),
-                    model.EndpointsStatus.status.ilike(f"%{search_query}%")
-                )
-                query = query.join(model.EndpointsStatus).where(search_filter)
+    async def update_statuses(self, statuses: Dict[int, Tuple[str, datetime]]) -> int:
+        """Set the current status of many endpoints at once, return the number of statuses which changed.
 
-            result = await self.db.execute(query)
-            count = result.scalar()
-            return count
+        Only the rows whose status changed are written, and only by a check more recent than the one which set their
+        status, so results arriving late or out of order do not roll a status back. The rows are updated in the order
+        of their endpoint ID, so concurrent writers lock them in the same order.
+        """
+        items = [(endpoint_id, status, status_at) for endpoint_id, (status, status_at) in sorted(statuses.items())]
+        changed = 0
+        async with database.session_scope(self.db):
+            try:
+                for start in range(0, len(items), STATUS_UPDATE_CHUNK):
+                    new_statuses = values(column('endpoint_id', Integer), column('status', String),
+                                          column('status_at', TIMESTAMP),
+                                          name='new_statuses').data(items[start:start + STATUS_UPDATE_CHUNK])
+                    result = await self.db.execute(
+                        update(model.EndpointsStatus)
+                        .where(model.EndpointsStatus.endpoint_id == new_statuses.c.endpoint_id,
+                               model.EndpointsStatus.status.is_distinct_from(new_statuses.c.status),
+                               or_(model.EndpointsStatus.status_at.is_(None),
+                                   model.EndpointsStatus.status_at < new_statuses.c.status_at))
+                        .values(status=new_statuses.c.status, status_at=new_statuses.c.status_at)
+                        .execution_options(synchronize_session=False))
+                    changed += result.rowcount
+                await self.db.commit()
+                return changed
+            except Exception as e:
+                await self.db.rollback()
+                raise e
 
     async def assign_notifications(self, endpoint_id: int, notification_ids: List[int]):
         """Add a list of notifications to a specific endpoint."""
         notifications = [model.EndpointNotifications(endpoint_id=endpoint_id, notification_id=notification_id)
                          for notification_id in notification_ids]
 
-        async with self.db:
+        async with database.session_scope(self.db):
             self.db.add_all(notifications)
+            await publish(self.db, InvalidationEvents.ENDPOINT_UPDATED.value, endpoint_id=endpoint_id)
             await self.db.commit()
 
     async def delete_assigned_notifications(self, endpoint_id: int):
         """Delete a notifications for endpoint."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(delete(model.EndpointNotifications)
                                   .where(model.EndpointNotifications.endpoint_id == endpoint_id))
+            await publish(self.db, InvalidationEvents.ENDPOINT_UPDATED.value, endpoint_id=endpoint_id)
             await self.db.commit()
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import db_models as model
+from app.utils import database
+
+
+class IngestKeyDAO:
+    def __init__(self, db: Session = None):
+        self.db = db or database.SessionLocal()
+
+    async def get_by_key(self, key: str) -> model.IngestKeys:
+        """Fetch the batch ingested with an idempotency key."""
+        async with database.session_scope(self.db):
+            result = await self.db.execute(select(model.IngestKeys).where(model.IngestKeys.key == key))
+            return result.scalars().first()
+
+    async def claim(self, key: str, results: int) -> bool:
+        """Record an idempotency key, return False when a batch was already ingested with it.
+
+        A concurrent claim of the same key waits for the first transaction, so only one of them writes its batch.
+        """
+        async with database.session_scope(self.db):
+            try:
+                result = await self.db.execute(insert(model.IngestKeys).values(key=key, results=results)
+                                               .on_conflict_do_nothing(index_elements=[model.IngestKeys.key])
+                                               .returning(model.IngestKeys.key))
+                claimed = result.first() is not None
+                await self.db.commit()
+                return claimed
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    async def delete_before(self, cutoff: datetime) -> int:
+        """Forget the idempotency keys received before the cutoff."""
+        async with database.session_scope(self.db):
+            result = await self.db.execute(delete(model.IngestKeys).where(model.IngestKeys.received_at < cutoff))
+            await self.db.commit()
+            return result.rowcount
@@ -0,0 +1,98 @@
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import select, text, func
+from sqlalchemy.orm import Session
+
+from app.daos.log_table_dao import LogTableDAO
+from app.models import db_models as model
+from app.utils import database
+from app.utils.enums import DatabaseSchemas, LogMigrationStatus
+from app.utils.logger import Logger
+
+LOGGER = Logger().start_logger()
+
+LOG_COPY_COLUMNS = ['created_at', 'endpoint_id', 'status', 'response', 'response_time']
+NOTIFICATION_COPY_COLUMNS = ['created_at', 'endpoint_id', 'notification_id', 'status', 'response']
+
+
+class LogMigrationDAO:
+    def __init__(self, db: Session = None):
+        self.db = db or database.SessionLocal()
+
+    async def get_endpoints_to_migrate(self, endpoint_ids: List[int] = None) -> List[model.Endpoints]:
+        """Fetch the endpoints which still have a legacy log table.
+
+        Endpoints created in partitioned mode have a log table name but no table, they have nothing to migrate.
+        """
+        legacy_table = func.concat(f"{DatabaseSchemas.LOG_SCHEMA.value}.", model.Endpoints.log_table)
+        query = select(model.Endpoints).where(model.Endpoints.log_table.isnot(None),
+                                              func.to_regclass(legacy_table).isnot(None)).order_by(model.Endpoints.id)
+        if endpoint_ids:
+            query = query.where(model.Endpoints.id.in_(endpoint_ids))
+
+        async with database.session_scope(self.db):
+            result = await self.db.execute(query)
+            return result.scalars().all()
+
+    async def get_or_create_progress(self, endpoint: model.Endpoints) -> model.LogMigrations:
+        """Fetch the migration progress of an endpoint, registering it on first run."""
+        async with database.session_scope(self.db):
+            progress = await self.db.get(model.LogMigrations, endpoint.id)
+            if not progress:
+                progress = model.LogMigrations(endpoint_id=endpoint.id, log_table=endpoint.log_table,
+                                               log_copied_id=0, notification_copied_id=0, copied_rows=0,
+                                               status=LogMigrationStatus.COPYING.value)
+                self.db.add(progress)
+                await self.db.commit()
+            return progress
+
+    async def set_status(self, endpoint_id: int, status: str):
+        """Set the migration status of an endpoint."""
+        async with database.session_scope(self.db):
+            progress = await self.db.get(model.LogMigrations, endpoint_id)
+            progress.status = status
+            await self.db.commit()
+
+    async def select_interval(self, log_table: str) -> Tuple[datetime, datetime]:
+        """Return the oldest and newest created_at of a legacy log table."""
+        async with database.session_scope(self.db):
+            result = await self.db.execute(text(
+                f"SELECT min(created_at), max(created_at) "
+                f"FROM {DatabaseSchemas.LOG_SCHEMA.value}.{LogTableDAO._sanitize_table_name(log_table)}"
+            ))
+            return result.first()
+
+    async def copy_batch(self, endpoint: model.Endpoints, schema: str, target: str, columns: List[str],
+                         progress_column: str, batch_size: int) -> int:
+        """Copy the next batch of a legacy table into the consolidated storage with COPY.
+
+        The copied rows and the new watermark are committed together, so an interrupted migration resumes exactly
+        where it stopped. Rollups are not touched, the copied rows are already accounted in them.
+        """
+        async with database.session_scope(self.db):
+            try:
+                await self.db.execute(text(f"SET LOCAL {model.ROLLUP_SKIP_SETTING} = 'on'"))
+                progress = await self.db.get(model.LogMigrations, endpoint.id, with_for_update=True)
+
+                connection = await self.db.connection()
+                raw_connection = (await connection.get_raw_connection()).driver_connection
+                rows = await raw_connection.fetch(
+                    f"SELECT id, {', '.join(columns)} "
+                    f"FROM {schema}.{LogTableDAO._sanitize_table_name(endpoint.log_table)} "
+                    f"WHERE id > $1 ORDER BY id LIMIT $2",
+                    getattr(progress, progress_column), batch_size)
+
+                if rows:
+                    records = [tuple(endpoint.id if column == 'endpoint_id' else row[column] for column in columns)
+                               for row in rows]
+                    await raw_connection.copy_records_to_table(target, schema_name=schema, columns=columns,
+                                                               records=records)
+                    setattr(progress, progress_column, rows[-1]['id'])
+                    progress.copied_rows += len(rows)
+
+                await self.db.commit()
+                return len(rows)
+            except Exception as e:
+                await self.db.rollback()
+                raise e
@@ -0,0 +1,112 @@
+import re
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models import db_models as model
+from app.utils import database
+from app.utils.enums import DatabaseSchemas, PartitionIntervals
+from app.utils.logger import Logger
+
+LOGGER = Logger().start_logger()
+
+PARTITIONED_TABLES = [
+    (DatabaseSchemas.LOG_SCHEMA.value, model.EndpointChecks.__tablename__),
+    (DatabaseSchemas.NOTIFICATION_SCHEMA.value, model.EndpointNotificationEvents.__tablename__)
+]
+PARTITION_BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+class LogPartitionDAO:
+    def __init__(self, db: Session = None):
+        self.db = db or database.SessionLocal()
+
+    @classmethod
+    def partition_start(cls, value: datetime, interval: str) -> datetime:
+        """Return the lower bound of the partition holding the given timestamp."""
+        start = value.replace(hour=0, minute=0, second=0, microsecond=0)
+        if interval == PartitionIntervals.WEEK.value:
+            start -= timedelta(days=start.weekday())
+        return start
+
+    @classmethod
+    def partition_step(cls, interval: str) -> timedelta:
+        return timedelta(weeks=1) if interval == PartitionIntervals.WEEK.value else timedelta(days=1)
+
+    async def _select_partitions(self, schema: str, table: str) -> List[Tuple[str, datetime, datetime]]:
+        """List the partitions of a table as (name, lower bound, upper bound)."""
+        result = await self.db.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = CAST(:parent AS regclass)"
+        ), {"parent": f"{schema}.{table}"})
+
+        partitions = []
+        for name, bound in result.fetchall():
+            match = PARTITION_BOUND_PATTERN.search(bound or "")
+            if match:
+                partitions.append((name, datetime.fromisoformat(match.group(1)),
+                                   datetime.fromisoformat(match.group(2))))
+        return partitions
+
+    async def _lock(self, wait: bool = True) -> bool:
+        """Serialize partition maintenance across workers, the lock is released on commit/rollback."""
+        if wait:
+            await self.db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+                                  {"name": "log_partition_maintenance"})
+            return True
+
+        result = await self.db.execute(text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"),
+                                       {"name": "log_partition_maintenance"})
+        return result.scalar()
+
+    async def create_partitions(self, date_from: datetime, date_to: datetime, interval: str) -> List[str]:
+        """Create the partitions covering [date_from, date_to) which are not covered yet."""
+        step = self.partition_step(interval)
+        created = []
+
+        async with database.session_scope(self.db):
+            try:
+                await self._lock()
+
+                for schema, table in PARTITIONED_TABLES:
+                    existing = await self._select_partitions(schema, table)
+                    lower = self.partition_start(date_from, interval)
+                    while lower < date_to:
+                        upper = lower + step
+                        if not any(start < upper and lower < end for _, start, end in existing):
+                            name = f"{table}_p{lower:%Y%m%d}"
+                            await self.db.execute(text(
+                                f"CREATE TABLE IF NOT EXISTS {schema}.{name} PARTITION OF {schema}.{table} "
+                                f"FOR VALUES FROM ('{lower.isoformat(sep=' ')}') TO ('{upper.isoformat(sep=' ')}')"
+                            ))
+                            created.append(f"{schema}.{name}")
+                        lower = upper
+
+                await self.db.commit()
+                return created
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    async def drop_partitions_before(self, cutoff: datetime) -> List[str]:
+        """Drop the partitions holding only rows older than the cutoff."""
+        dropped = []
+
+        async with database.session_scope(self.db):
+            try:
+                if not await self._lock(wait=False):
+                    return dropped
+
+                for schema, table in PARTITIONED_TABLES:
+                    for name, _, upper in await self._select_partitions(schema, table):
+                        if upper <= cutoff:
+                            await self.db.execute(text(f"DROP TABLE IF EXISTS {schema}.{name}"))
+                            dropped.append(f"{schema}.{name}")
+
+                await self.db.commit()
+                return dropped
+            except Exception as e:
+                await self.db.rollback()
+                raise e
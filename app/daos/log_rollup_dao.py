@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+
+from app.models import db_models as model
+from app.utils import database
+from app.utils.logger import Logger
+
+LOGGER = Logger().start_logger()
+
+
+class LogRollupDAO:
+    def __init__(self, db: Session = None):
+        self.db = db or database.SessionLocal()
+
+    async def select_rollups(self, endpoint_id: int, unit: str, date_from: datetime,
+                             date_to: datetime = None) -> List[model.EndpointLogRollups]:
+        """Select the rollup buckets of an endpoint for a given unit and interval, oldest first."""
+        query = select(model.EndpointLogRollups).where(
+            model.EndpointLogRollups.endpoint_id == endpoint_id,
+            model.EndpointLogRollups.unit == unit,
+            model.EndpointLogRollups.bucket >= date_from
+        )
+        if date_to:
+            query = query.where(model.EndpointLogRollups.bucket < date_to)
+
+        async with database.session_scope(self.db):
+            try:
+                result = await self.db.execute(query.order_by(model.EndpointLogRollups.bucket))
+                return result.scalars().all()
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    async def delete_rollups_before(self, endpoint_id: int, unit: str, cutoff: datetime, batch_size: int) -> int:
+        """Delete one bounded batch of rollups older than the cutoff and return the number of deleted rows."""
+        buckets = select(model.EndpointLogRollups.bucket).where(
+            model.EndpointLogRollups.endpoint_id == endpoint_id,
+            model.EndpointLogRollups.unit == unit,
+            model.EndpointLogRollups.bucket < cutoff
+        ).limit(batch_size)
+
+        async with database.session_scope(self.db):
+            try:
+                result = await self.db.execute(delete(model.EndpointLogRollups).where(
+                    model.EndpointLogRollups.endpoint_id == endpoint_id,
+                    model.EndpointLogRollups.unit == unit,
+                    model.EndpointLogRollups.bucket.in_(buckets.scalar_subquery())
+                ))
+                await self.db.commit()
+                return result.rowcount
+            except Exception as e:
+                await self.db.rollback()
+                raise e
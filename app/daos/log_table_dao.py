@@ -1,14 +1,41 @@
+import json
 import re
+from collections import defaultdict
 from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
 
 from sqlalchemy import text, select, and_
 from sqlalchemy.orm import Session
 
+from app.config.config import Settings
+from app.models import db_models as model
 from app.utils import database
-from app.utils.enums import DatabaseSchemas, DashboardChartUnits
+from app.utils.enums import DatabaseSchemas, DashboardChartUnits, LogStorages, EndpointStatus, RollupUnits, \
+    InvalidationEvents
+from app.utils.invalidation_bus import INVALIDATION_CHANNEL
 from app.utils.logger import Logger
 
 LOGGER = Logger().start_logger()
+db_config = Settings().database
+
+LOG_COLUMN_NAMES = ("id", "status", "endpoint_id", "created_at", "response", "response_time")
+LOG_COLUMNS = ", ".join(LOG_COLUMN_NAMES)
+# The ids of the legacy tables overlap with those of the consolidated storage, they are negated while both are read.
+LEGACY_LOG_COLUMNS = ", ".join("-id AS id" if column == "id" else column for column in LOG_COLUMN_NAMES)
+LOG_WRITE_COLUMNS = ["created_at", "endpoint_id", "status", "response", "response_time"]
+ROLLUP_UPSERT = (
+    f"INSERT INTO {DatabaseSchemas.LOG_SCHEMA.value}.{model.EndpointLogRollups.__tablename__} AS r "
+    f"(endpoint_id, unit, bucket, checks, errors, last_created_at, last_error_at, min_response_time, "
+    f"max_response_time, sum_response_time, timed_checks) "
+    f"SELECT * FROM unnest($1::integer[], $2::text[], $3::timestamp[], $4::integer[], $5::integer[], "
+    f"$6::timestamp[], $7::timestamp[], $8::integer[], $9::integer[], $10::bigint[], $11::integer[]) "
+    f"ON CONFLICT (endpoint_id, unit, bucket) DO UPDATE SET {model.ROLLUP_CONFLICT_UPDATE}"
+)
+CHECK_WRITTEN_NOTIFY = (
+    f"SELECT pg_notify('{INVALIDATION_CHANNEL}', json_build_object("
+    f"'event', '{InvalidationEvents.CHECK_WRITTEN.value}', 'endpoint_id', endpoint_id)::text) "
+    f"FROM unnest($1::integer[]) AS endpoint_id"
+)
 
 
 class LogTableDAO:
@@ -22,37 +49,181 @@ class LogTableDAO:
             raise ValueError("Invalid table name")
         return table_name
 
-    async def delete_log_table(self, table_name: str):
-        """Delete a log table from the log schema."""
-        sanitized_table_name = self._sanitize_table_name(table_name)
-        drop_table_sql = f"DROP TABLE IF EXISTS {DatabaseSchemas.LOG_SCHEMA.value}.{sanitized_table_name};"
+    @classmethod
+    def _select_columns(cls, columns=None):
+        """Build the select list of a log query, only known log columns are allowed."""
+        if not columns:
+            return "*"
+        unknown = set(columns) - set(LOG_COLUMN_NAMES)
+        if unknown:
+            raise ValueError(f"Invalid log columns: {', '.join(sorted(unknown))}")
+        return ", ".join(columns)
+
+    @classmethod
+    def _log_storage(cls):
+        return db_config['log_storage']
+
+    def _log_source(self, endpoint: model.Endpoints):
+        """Return the FROM clause holding the logs of an endpoint together with its bind parameters.
+
+        While migrating, the consolidated rows are read together with the rows of the legacy table which were not
+        copied yet (see LogMigrationDAO). The legacy rows get negative ids, so an id or a (created_at, id) cursor always
+        designates a single row.
+        """
+        checks_table = f"{DatabaseSchemas.LOG_SCHEMA.value}.{model.EndpointChecks.__tablename__}"
+        if self._log_storage() == LogStorages.PARTITIONED.value:
+            return f"(SELECT * FROM {checks_table} WHERE endpoint_id = :endpoint_id) AS log_rows", \
+                {"endpoint_id": endpoint.id}
+
+        sanitized_table_name = self._sanitize_table_name(endpoint.log_table)
+        legacy_table = f"{DatabaseSchemas.LOG_SCHEMA.value}.{sanitized_table_name}"
+        if self._log_storage() == LogStorages.MIGRATING.value:
+            migrations_table = f"{DatabaseSchemas.LOG_SCHEMA.value}.{model.LogMigrations.__tablename__}"
+            return (
+                f"(SELECT {LOG_COLUMNS} FROM {checks_table} WHERE endpoint_id = :endpoint_id "
+                f"UNION ALL SELECT {LEGACY_LOG_COLUMNS} FROM {legacy_table} WHERE id > COALESCE("
+                f"(SELECT log_copied_id FROM {migrations_table} WHERE endpoint_id = :endpoint_id), 0)) AS log_rows",
+                {"endpoint_id": endpoint.id}
+            )
+
+        return legacy_table, {}
+
+    def _log_target(self, endpoint: model.Endpoints) -> Tuple[str, str]:
+        """Return the schema and table new logs of an endpoint are written to, the legacy table unless partitioned."""
+        if self._log_storage() == LogStorages.PARTITIONED.value:
+            return DatabaseSchemas.LOG_SCHEMA.value, model.EndpointChecks.__tablename__
+        return DatabaseSchemas.LOG_SCHEMA.value, self._sanitize_table_name(endpoint.log_table)
 
-        async with self.db:
+    @classmethod
+    def _rollup_rows(cls, records: List[tuple]) -> List[list]:
+        """Aggregate log records per (endpoint, unit, bucket) the way the rollup trigger folds them row by row."""
+        rollups = {}
+        for created_at, endpoint_id, status, _, response_time in records:
+            error = status != EndpointStatus.HEALTHY.value
+            hour = created_at.replace(minute=0, second=0, microsecond=0)
+            for unit, bucket in ((RollupUnits.HOUR.value, hour), (RollupUnits.DAY.value, hour.replace(hour=0))):
+                rollup = rollups.get((endpoint_id, unit, bucket))
+                if rollup is None:
+                    rollup = rollups[(endpoint_id, unit, bucket)] = [endpoint_id, unit, bucket, 0, 0, None, None,
+                                                                     None, None, 0, 0]
+                rollup[3] += 1
+                rollup[5] = created_at if rollup[5] is None else max(rollup[5], created_at)
+                if error:
+                    rollup[4] += 1
+                    rollup[6] = created_at if rollup[6] is None else max(rollup[6], created_at)
+                if response_time is not None:
+                    rollup[7] = response_time if rollup[7] is None else min(rollup[7], response_time)
+                    rollup[8] = response_time if rollup[8] is None else max(rollup[8], response_time)
+                    rollup[9] += response_time
+                    rollup[10] += 1
+
+        # A stable order of the upserted buckets keeps concurrent writers from deadlocking on them.
+        return [rollups[key] for key in sorted(rollups)]
+
+    async def copy_logs(self, logs: List[Tuple[model.Endpoints, datetime, str, dict, int | None]]):
+        """Write the results of many checks in a single transaction, with one COPY per target table.
+
+        The per-row rollup trigger is skipped: the rows are folded into their rollup buckets beforehand and every
+        bucket is upserted once, then a single check_written notification is sent per endpoint.
+        """
+        if not logs:
+            return
+
+        tables = defaultdict(list)
+        for endpoint, created_at, status, response, response_time in logs:
+            tables[self._log_target(endpoint)].append(
+                (created_at, endpoint.id, status, json.dumps(response), response_time))
+        records = [record for table_records in tables.values() for record in table_records]
+        rollups = self._rollup_rows(records)
+        endpoint_ids = sorted({record[1] for record in records})
+
+        async with database.session_scope(self.db):
             try:
-                await self.db.execute(text(drop_table_sql))
+                connection = await self.db.connection()
+                raw_connection = (await connection.get_raw_connection()).driver_connection
+                # A standalone session did not begin the driver's transaction yet, the COPYs get their own one. In a
+                # unit of work they run in a savepoint of the request's transaction.
+                async with raw_connection.transaction():
+                    await raw_connection.execute("SELECT set_config($1, 'on', true)", model.ROLLUP_SKIP_SETTING)
+                    for (schema, table), table_records in tables.items():
+                        await raw_connection.copy_records_to_table(table, schema_name=schema,
+                                                                   columns=LOG_WRITE_COLUMNS, records=table_records)
+                    # The setting lasts until the end of the enclosing transaction, later writes must not skip.
+                    await raw_connection.execute("SELECT set_config($1, 'off', true)", model.ROLLUP_SKIP_SETTING)
+
+                    await raw_connection.execute(ROLLUP_UPSERT, *map(list, zip(*rollups)))
+                    await raw_connection.execute(CHECK_WRITTEN_NOTIFY, endpoint_ids)
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    async def delete_log_table(self, endpoint: model.Endpoints):
+        """Delete the logs of an endpoint, its log table and/or its rows in the partitioned storage."""
+        statements = []
+        if self._log_storage() != LogStorages.TABLES.value:
+            statements.append((f"DELETE FROM {DatabaseSchemas.LOG_SCHEMA.value}.{model.EndpointChecks.__tablename__} "
+                               f"WHERE endpoint_id = :endpoint_id;", {"endpoint_id": endpoint.id}))
+        if self._log_storage() != LogStorages.PARTITIONED.value:
+            sanitized_table_name = self._sanitize_table_name(endpoint.log_table)
+            statements.append((f"DROP TABLE IF EXISTS {DatabaseSchemas.LOG_SCHEMA.value}.{sanitized_table_name};", {}))
+
+        async with database.session_scope(self.db):
+            try:
+                for statement, params in statements:
+                    await self.db.execute(text(statement), params)
                 await self.db.commit()
             except Exception as e:
                 await self.db.rollback()
                 raise e
 
-    async def select_all_from_log_table(self, table_name: str):
+    def _log_targets(self, endpoint: model.Endpoints):
+        """Return the tables holding rows of an endpoint, each with the condition selecting them."""
+        targets = []
+        if self._log_storage() != LogStorages.TABLES.value:
+            targets.append((f"{DatabaseSchemas.LOG_SCHEMA.value}.{model.EndpointChecks.__tablename__}",
+                            "endpoint_id = :endpoint_id"))
+        if self._log_storage() != LogStorages.PARTITIONED.value:
+            targets.append((f"{DatabaseSchemas.LOG_SCHEMA.value}.{self._sanitize_table_name(endpoint.log_table)}",
+                            "TRUE"))
+        return targets
+
+    async def delete_logs_before(self, endpoint: model.Endpoints, cutoff: datetime, batch_size: int) -> int:
+        """Delete one bounded batch of logs older than the cutoff and return the number of deleted rows."""
+        params = {"endpoint_id": endpoint.id, "cutoff": cutoff, "batch_size": batch_size}
+        deleted = 0
+
+        async with database.session_scope(self.db):
+            try:
+                for table, condition in self._log_targets(endpoint):
+                    result = await self.db.execute(text(
+                        f"DELETE FROM {table} WHERE created_at < :cutoff AND id IN ("
+                        f"SELECT id FROM {table} WHERE {condition} AND created_at < :cutoff LIMIT :batch_size);"
+                    ), params)
+                    deleted += result.rowcount
+                await self.db.commit()
+                return deleted
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    async def select_all_from_log_table(self, endpoint: model.Endpoints):
         """Select all records from a specific log table."""
-        sanitized_table_name = self._sanitize_table_name(table_name)
-        select_query = f"SELECT * FROM {DatabaseSchemas.LOG_SCHEMA.value}.{sanitized_table_name} " \
-                       f"ORDER BY created_at ASC;"
+        log_source, params = self._log_source(endpoint)
+        select_query = f"SELECT * FROM {log_source} ORDER BY created_at ASC;"
 
-        async with self.db:
+        async with database.session_scope(self.db):
             try:
-                result = await self.db.execute(text(select_query))
+                result = await self.db.execute(text(select_query), params)
                 records = result.fetchall()
                 return records
             except Exception as e:
                 await self.db.rollback()
                 raise e
 
-    async def select_logs_from_last_hours(self, table_name: str, unit: str, duration: int):
-        """Select records from a specific log table for the last 24 hours."""
-        sanitized_table_name = self._sanitize_table_name(table_name)
+    async def select_logs_from_last_hours(self, endpoint: model.Endpoints, unit: str, duration: int,
+                                          columns=None):
+        """Select records from a specific log table for the last 24 hours, optionally only the given columns."""
+        log_source, params = self._log_source(endpoint)
         if unit == DashboardChartUnits.HOURS.value:
             delta = datetime.now() - timedelta(hours=duration)
         elif unit == DashboardChartUnits.DAY.value:
@@ -63,30 +234,74 @@ class LogTableDAO:
         formatted_timestamp = delta.strftime("%Y-%m-%d %H:%M:%S")
 
         select_query = (
-            f"SELECT * FROM {DatabaseSchemas.LOG_SCHEMA.value}.{sanitized_table_name} "
+            f"SELECT {self._select_columns(columns)} FROM {log_source} "
             f"WHERE created_at >= '{formatted_timestamp}' ORDER BY created_at ASC;"
         )
 
-        async with self.db:
+        async with database.session_scope(self.db):
             try:
-                result = await self.db.execute(text(select_query))
+                result = await self.db.execute(text(select_query), params)
                 records = result.fetchall()
                 return records
             except Exception as e:
                 await self.db.rollback()
                 raise e
 
-    async def select_logs_by_interval(self, table_name: str, date_from: datetime = None,
-                                      date_to: datetime = None, full: bool = False):
-        """Select logs from a specified log table within a given time interval."""
-        sanitized_table_name = self._sanitize_table_name(table_name)
+    async def select_latest_log(self, endpoint: model.Endpoints):
+        """Select the id and timestamp of the latest log record of an endpoint."""
+        log_source, params = self._log_source(endpoint)
+        select_query = f"SELECT id, created_at FROM {log_source} ORDER BY created_at DESC, id DESC LIMIT 1;"
 
-        query = select("*").select_from(
-            text(f"{DatabaseSchemas.LOG_SCHEMA.value}.{sanitized_table_name}")
-        ).order_by(text('created_at DESC'))
+        async with database.session_scope(self.db):
+            try:
+                result = await self.db.execute(text(select_query), params)
+                return result.first()
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    async def select_logs_after(self, endpoint: model.Endpoints, after: Tuple[datetime, int], columns=None):
+        """Select the records written after the given (created_at, id), oldest first."""
+        log_source, params = self._log_source(endpoint)
+        params['after_created_at'], params['after_id'] = after
+        select_query = (
+            f"SELECT {self._select_columns(columns)} FROM {log_source} "
+            f"WHERE created_at >= :after_created_at AND (created_at > :after_created_at OR id > :after_id) "
+            f"ORDER BY created_at ASC, id ASC;"
+        )
+
+        async with database.session_scope(self.db):
+            try:
+                result = await self.db.execute(text(select_query), params)
+                return result.fetchall()
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    async def select_log_by_id(self, endpoint: model.Endpoints, log_id: int):
+        """Select a single log record of an endpoint, including its response body."""
+        log_source, params = self._log_source(endpoint)
+        params['log_id'] = log_id
+
+        async with database.session_scope(self.db):
+            try:
+                result = await self.db.execute(text(f"SELECT * FROM {log_source} WHERE id = :log_id LIMIT 1;"), params)
+                return result.first()
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    def _interval_query(self, endpoint: model.Endpoints, date_from: datetime = None, date_to: datetime = None,
+                        full: bool = False, after: Tuple[datetime, int] = None):
+        """Build the query selecting the logs of an endpoint within a time interval, newest first.
+
+        When `after` holds the (created_at, id) of a previously returned row, only the rows following it are selected.
+        """
+        log_source, params = self._log_source(endpoint)
+
+        query = select("*").select_from(text(log_source)).order_by(text('created_at DESC, id DESC'))
 
         conditions = []
-        params = {}
 
         if date_from:
             utc_date_from = date_from.astimezone(timezone.utc).replace(tzinfo=None)
@@ -102,10 +317,26 @@ class LogTableDAO:
         if not full:
             conditions.append(text("status != 'healthy'"))
 
+        if after:
+            # Expanded row comparison, so the created_at index bounds the scan.
+            conditions.append(text("created_at <= :after_created_at "
+                                   "AND (created_at < :after_created_at OR id < :after_id)"))
+            params['after_created_at'], params['after_id'] = after
+
         if conditions:
             query = query.where(and_(*conditions))
 
-        async with self.db:
+        return query, params
+
+    async def select_logs_by_interval(self, endpoint: model.Endpoints, date_from: datetime = None,
+                                      date_to: datetime = None, full: bool = False, limit: int = None,
+                                      after: Tuple[datetime, int] = None):
+        """Select logs from a specified log table within a given time interval, optionally a single page."""
+        query, params = self._interval_query(endpoint, date_from, date_to, full, after)
+        if limit:
+            query = query.limit(limit)
+
+        async with database.session_scope(self.db):
             try:
                 result = await self.db.execute(query, params)
                 records = result.fetchall()
@@ -113,3 +344,63 @@ class LogTableDAO:
             except Exception as e:
                 await self.db.rollback()
                 raise e
+
+    async def stream_logs_by_interval(self, endpoint: model.Endpoints, date_from: datetime = None,
+                                      date_to: datetime = None, full: bool = False, chunk_size: int = 1000):
+        """Iterate over the logs of a time interval in chunks of rows fetched through a server-side cursor."""
+        query, params = self._interval_query(endpoint, date_from, date_to, full)
+
+        async with database.session_scope(self.db):
+            try:
+                result = await self.db.stream(query.execution_options(yield_per=chunk_size), params)
+                async for chunk in result.partitions(chunk_size):
+                    yield chunk
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    async def select_uptime_buckets(self, endpoint: model.Endpoints, start_time: datetime, width: timedelta,
+                                    buckets: int):
+        """Aggregate a log table into fixed-width buckets on the database side.
+
+        Returns one row per bucket (oldest first) with its check count, non-healthy count, last check and last
+        error timestamp. Buckets without checks are generated by generate_series and come back with zero checks.
+        """
+        log_source, params = self._log_source(endpoint)
+        select_query = f"""
+            WITH logs AS (
+                SELECT floor(extract(epoch FROM created_at - CAST(:start_time AS timestamp))
+                             / CAST(:width AS integer))::integer AS bucket_index,
+                       count(*) AS checks,
+                       count(*) FILTER (WHERE status != 'healthy') AS errors,
+                       max(created_at) AS last_created_at,
+                       max(created_at) FILTER (WHERE status != 'healthy') AS last_error_at
+                FROM {log_source}
+                WHERE created_at >= CAST(:start_time AS timestamp) AND created_at < CAST(:end_time AS timestamp)
+                GROUP BY 1
+            )
+            SELECT CAST(:start_time AS timestamp) + buckets.bucket_index * make_interval(secs => CAST(:width AS integer))
+                       AS bucket,
+                   COALESCE(logs.checks, 0) AS checks,
+                   COALESCE(logs.errors, 0) AS errors,
+                   logs.last_created_at,
+                   logs.last_error_at
+            FROM generate_series(0, CAST(:buckets AS integer) - 1) AS buckets(bucket_index)
+            LEFT JOIN logs ON logs.bucket_index = buckets.bucket_index
+            ORDER BY buckets.bucket_index ASC;
+        """
+        params.update({
+            "start_time": start_time,
+            "end_time": start_time + width * buckets,
+            "width": int(width.total_seconds()),
+            "buckets": buckets
+        })
+
+        async with database.session_scope(self.db):
+            try:
+                result = await self.db.execute(text(select_query), params)
+                records = result.fetchall()
+                return records
+            except Exception as e:
+                await self.db.rollback()
+                raise e
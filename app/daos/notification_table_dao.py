@@ -4,11 +4,16 @@ from datetime import datetime, timedelta
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.config.config import Settings
+from app.models import db_models as model
 from app.utils import database
-from app.utils.enums import DatabaseSchemas
+from app.utils.enums import DatabaseSchemas, LogStorages
 from app.utils.logger import Logger
 
 LOGGER = Logger().start_logger()
+db_config = Settings().database
+
+NOTIFICATION_COLUMNS = "id, status, endpoint_id, notification_id, created_at, response"
 
 
 class NotificationTableDAO:
@@ -22,36 +27,101 @@ class NotificationTableDAO:
             raise ValueError("Invalid table name")
         return table_name
 
-    async def delete_log_table(self, table_name: str):
-        """Delete a log table from the notification schema."""
-        sanitized_table_name = self._sanitize_table_name(table_name)
-        drop_table_sql = f"DROP TABLE IF EXISTS {DatabaseSchemas.NOTIFICATION_SCHEMA.value}.{sanitized_table_name};"
+    @classmethod
+    def _log_storage(cls):
+        return db_config['log_storage']
+
+    def _log_source(self, endpoint: model.Endpoints):
+        """Return the FROM clause holding the notifications of an endpoint together with its bind parameters.
+
+        While migrating, the consolidated rows are read together with the rows of the legacy table which were not
+        copied yet (see LogMigrationDAO).
+        """
+        events_table = f"{DatabaseSchemas.NOTIFICATION_SCHEMA.value}.{model.EndpointNotificationEvents.__tablename__}"
+        if self._log_storage() == LogStorages.PARTITIONED.value:
+            return f"(SELECT * FROM {events_table} WHERE endpoint_id = :endpoint_id)", {"endpoint_id": endpoint.id}
+
+        sanitized_table_name = self._sanitize_table_name(endpoint.log_table)
+        legacy_table = f"{DatabaseSchemas.NOTIFICATION_SCHEMA.value}.{sanitized_table_name}"
+        if self._log_storage() == LogStorages.MIGRATING.value:
+            migrations_table = f"{DatabaseSchemas.LOG_SCHEMA.value}.{model.LogMigrations.__tablename__}"
+            return (
+                f"(SELECT {NOTIFICATION_COLUMNS} FROM {events_table} WHERE endpoint_id = :endpoint_id "
+                f"UNION ALL SELECT {NOTIFICATION_COLUMNS} FROM {legacy_table} WHERE id > COALESCE("
+                f"(SELECT notification_copied_id FROM {migrations_table} WHERE endpoint_id = :endpoint_id), 0))",
+                {"endpoint_id": endpoint.id}
+            )
+
+        return legacy_table, {}
+
+    async def delete_log_table(self, endpoint: model.Endpoints):
+        """Delete the notifications of an endpoint, its table and/or its rows in the partitioned storage."""
+        statements = []
+        if self._log_storage() != LogStorages.TABLES.value:
+            statements.append((f"DELETE FROM {DatabaseSchemas.NOTIFICATION_SCHEMA.value}."
+                               f"{model.EndpointNotificationEvents.__tablename__} WHERE endpoint_id = :endpoint_id;",
+                               {"endpoint_id": endpoint.id}))
+        if self._log_storage() != LogStorages.PARTITIONED.value:
+            sanitized_table_name = self._sanitize_table_name(endpoint.log_table)
+            statements.append((f"DROP TABLE IF EXISTS {DatabaseSchemas.NOTIFICATION_SCHEMA.value}."
+                               f"{sanitized_table_name};", {}))
+
+        async with database.session_scope(self.db):
+            try:
+                for statement, params in statements:
+                    await self.db.execute(text(statement), params)
+                await self.db.commit()
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    def _log_targets(self, endpoint: model.Endpoints):
+        """Return the tables holding notifications of an endpoint, each with the condition selecting them."""
+        targets = []
+        if self._log_storage() != LogStorages.TABLES.value:
+            targets.append((f"{DatabaseSchemas.NOTIFICATION_SCHEMA.value}."
+                            f"{model.EndpointNotificationEvents.__tablename__}", "endpoint_id = :endpoint_id"))
+        if self._log_storage() != LogStorages.PARTITIONED.value:
+            targets.append((f"{DatabaseSchemas.NOTIFICATION_SCHEMA.value}."
+                            f"{self._sanitize_table_name(endpoint.log_table)}", "TRUE"))
+        return targets
+
+    async def delete_logs_before(self, endpoint: model.Endpoints, cutoff: datetime, batch_size: int) -> int:
+        """Delete one bounded batch of notifications older than the cutoff and return the number of deleted rows."""
+        params = {"endpoint_id": endpoint.id, "cutoff": cutoff, "batch_size": batch_size}
+        deleted = 0
 
-        async with self.db:
+        async with database.session_scope(self.db):
             try:
-                await self.db.execute(text(drop_table_sql))
+                for table, condition in self._log_targets(endpoint):
+                    result = await self.db.execute(text(
+                        f"DELETE FROM {table} WHERE created_at < :cutoff AND id IN ("
+                        f"SELECT id FROM {table} WHERE {condition} AND created_at < :cutoff LIMIT :batch_size);"
+                    ), params)
+                    deleted += result.rowcount
                 await self.db.commit()
+                return deleted
             except Exception as e:
                 await self.db.rollback()
                 raise e
 
-    async def select_logs_from_last_hours(self, table_name: str, hours: int):
+    async def select_logs_from_last_hours(self, endpoint: model.Endpoints, hours: int):
         """Select records from a specific log table for the last 24 hours."""
-        sanitized_table_name = self._sanitize_table_name(table_name)
+        log_source, params = self._log_source(endpoint)
         twenty_four_hours_ago = datetime.now() - timedelta(hours=hours)
         # Format the timestamp in a way that's compatible with your database
         formatted_timestamp = twenty_four_hours_ago.strftime("%Y-%m-%d %H:%M:%S")
 
         select_query = (
             f"SELECT nt.*, n.name as notification_name, n.type as notification_type "
-            f"FROM {DatabaseSchemas.NOTIFICATION_SCHEMA.value}.{sanitized_table_name} nt "
+            f"FROM {log_source} nt "
             f"JOIN {DatabaseSchemas.CONFIG_SCHEMA.value}.notifications n ON nt.notification_id = n.id "
             f"WHERE nt.created_at >= '{formatted_timestamp}' ORDER BY nt.created_at DESC;"
         )
 
-        async with self.db:
+        async with database.session_scope(self.db):
             try:
-                result = await self.db.execute(text(select_query))
+                result = await self.db.execute(text(select_query), params)
                 records = result.fetchall()
                 return records
             except Exception as e:
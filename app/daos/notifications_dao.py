@@ -7,6 +7,8 @@ from sqlalchemy.orm import Session
 
 from app.schemas.notifications_sch import CreateNotification
 from app.utils import database
+from app.utils.enums import InvalidationEvents
+from app.utils.invalidation_bus import publish
 from app.utils.logger import Logger
 from app.models import db_models as model
 
@@ -24,19 +26,19 @@ class NotificationDAO:
 
     async def get_all(self) -> List[model.Notifications]:
         """Fetch all notifications."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Notifications).order_by(model.Notifications.created_at))
             return result.scalars().all()
 
     async def get_all_by_ids(self, ids: List[int]) -> List[model.Notifications]:
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Notifications).where(model.Notifications.id.in_(ids))
                                            .order_by(model.Notifications.created_at))
             return result.scalars().all()
 
     async def get_by_id(self, notification_id: int) -> model.Notifications:
         """Fetch a specific notification by ID."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Notifications).where(model.Notifications.id == notification_id))
             return result.scalars().first()
 
@@ -50,8 +52,10 @@ class NotificationDAO:
             properties=notification_data.properties
         )
         try:
-            async with self.db:
+            async with database.session_scope(self.db):
                 self.db.add(notification)
+                await publish(self.db, InvalidationEvents.PERMISSIONS_CHANGED.value,
+                              user_id=notification_data.user_id)
                 await self.db.commit()
                 return notification
         except IntegrityError as e:
@@ -65,7 +69,7 @@ class NotificationDAO:
 
     async def update(self, notification_id: int, data_to_update: dict) -> model.Notifications:
         """Update an existing notification."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(update(model.Notifications)
                                   .where(model.Notifications.id == notification_id).values(**data_to_update))
             await self.db.commit()
@@ -74,8 +78,9 @@ class NotificationDAO:
 
     async def delete(self, notification_id: int):
         """Delete an notification."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(delete(model.Notifications).where(model.Notifications.id == notification_id))
+            await publish(self.db, InvalidationEvents.PERMISSIONS_CHANGED.value)
             await self.db.commit()
 
 
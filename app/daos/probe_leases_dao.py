@@ -0,0 +1,78 @@
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models import db_models as model
+from app.utils import database
+from app.utils.enums import DatabaseSchemas
+
+NODES_TABLE = f"{DatabaseSchemas.CONFIG_SCHEMA.value}.{model.ProbeNodes.__tablename__}"
+LEASES_TABLE = f"{DatabaseSchemas.CONFIG_SCHEMA.value}.{model.ProbeLeases.__tablename__}"
+
+
+class ProbeLeaseDAO:
+    """Leases of the probe shards. Expiry is always compared with the database clock, never with the nodes' ones."""
+
+    def __init__(self, db: Session = None):
+        self.db = db or database.SessionLocal()
+
+    async def _execute(self, statement: str, params: dict):
+        async with database.session_scope(self.db):
+            try:
+                result = await self.db.execute(text(statement), params)
+                rows = result.fetchall() if result.returns_rows else result.rowcount
+                await self.db.commit()
+                return rows
+            except Exception as e:
+                await self.db.rollback()
+                raise e
+
+    async def ensure_shards(self, shards: int):
+        """Create the lease of every shard and drop the leases of shards which no longer exist."""
+        await self._execute(
+            f"INSERT INTO {LEASES_TABLE} (shard) SELECT generate_series(0, :shards - 1) ON CONFLICT DO NOTHING;",
+            {"shards": shards})
+        await self._execute(f"DELETE FROM {LEASES_TABLE} WHERE shard >= :shards;", {"shards": shards})
+
+    async def heartbeat(self, node_id: str, ttl: int) -> int:
+        """Record the heartbeat of a node, forget the dead ones and return the number of live nodes."""
+        rows = await self._execute(
+            f"WITH beat AS (INSERT INTO {NODES_TABLE} (node_id, heartbeat_at, started_at) "
+            f"VALUES (:node_id, LOCALTIMESTAMP, LOCALTIMESTAMP) "
+            f"ON CONFLICT (node_id) DO UPDATE SET heartbeat_at = EXCLUDED.heartbeat_at RETURNING node_id), "
+            f"dead AS (DELETE FROM {NODES_TABLE} WHERE heartbeat_at < LOCALTIMESTAMP - make_interval(secs => :ttl)) "
+            f"SELECT count(*) + 1 FROM {NODES_TABLE} "
+            f"WHERE node_id <> :node_id AND heartbeat_at >= LOCALTIMESTAMP - make_interval(secs => :ttl);",
+            {"node_id": node_id, "ttl": ttl})
+        return rows[0][0]
+
+    async def renew(self, node_id: str, ttl: int) -> List[int]:
+        """Extend the leases held by a node and return their shards."""
+        rows = await self._execute(
+            f"UPDATE {LEASES_TABLE} SET expires_at = LOCALTIMESTAMP + make_interval(secs => :ttl) "
+            f"WHERE node_id = :node_id RETURNING shard;",
+            {"node_id": node_id, "ttl": ttl})
+        return sorted(row[0] for row in rows)
+
+    async def claim(self, node_id: str, ttl: int, count: int) -> List[int]:
+        """Take up to `count` free or expired shards, shards being claimed by another node are skipped."""
+        rows = await self._execute(
+            f"UPDATE {LEASES_TABLE} SET node_id = :node_id, expires_at = LOCALTIMESTAMP + make_interval(secs => :ttl) "
+            f"WHERE shard IN (SELECT shard FROM {LEASES_TABLE} "
+            f"WHERE node_id IS NULL OR expires_at IS NULL OR expires_at < LOCALTIMESTAMP "
+            f"ORDER BY shard LIMIT :count FOR UPDATE SKIP LOCKED) RETURNING shard;",
+            {"node_id": node_id, "ttl": ttl, "count": count})
+        return sorted(row[0] for row in rows)
+
+    async def release(self, node_id: str, shards: List[int] = None):
+        """Give back some (or all) shards of a node, they can be claimed right away."""
+        condition = "" if shards is None else "AND shard = ANY(:shards)"
+        await self._execute(
+            f"UPDATE {LEASES_TABLE} SET node_id = NULL, expires_at = NULL WHERE node_id = :node_id {condition};",
+            {"node_id": node_id, "shards": shards or []})
+
+    async def leave(self, node_id: str):
+        """Release all the shards of a node and unregister it."""
+        await self.release(node_id)
+        await self._execute(f"DELETE FROM {NODES_TABLE} WHERE node_id = :node_id;", {"node_id": node_id})
@@ -0,0 +1,43 @@
+from typing import List
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import db_models as model
+from app.utils import database
+
+
+class RetentionPolicyDAO:
+    def __init__(self, db: Session = None):
+        self.db = db or database.SessionLocal()
+
+    async def get_all(self) -> List[model.EndpointRetentionPolicies]:
+        """Fetch all per-endpoint retention overrides."""
+        async with database.session_scope(self.db):
+            result = await self.db.execute(select(model.EndpointRetentionPolicies))
+            return result.scalars().all()
+
+    async def get_by_endpoint_id(self, endpoint_id: int) -> model.EndpointRetentionPolicies:
+        """Fetch the retention override of an endpoint."""
+        async with database.session_scope(self.db):
+            result = await self.db.execute(select(model.EndpointRetentionPolicies)
+                                           .where(model.EndpointRetentionPolicies.endpoint_id == endpoint_id))
+            return result.scalars().first()
+
+    async def upsert(self, endpoint_id: int, policy: dict) -> model.EndpointRetentionPolicies:
+        """Create or replace the retention override of an endpoint."""
+        async with database.session_scope(self.db):
+            await self.db.execute(insert(model.EndpointRetentionPolicies)
+                                  .values(endpoint_id=endpoint_id, **policy)
+                                  .on_conflict_do_update(index_elements=['endpoint_id'], set_=policy))
+            await self.db.commit()
+
+        return await self.get_by_endpoint_id(endpoint_id)
+
+    async def delete(self, endpoint_id: int):
+        """Delete the retention override of an endpoint."""
+        async with database.session_scope(self.db):
+            await self.db.execute(delete(model.EndpointRetentionPolicies)
+                                  .where(model.EndpointRetentionPolicies.endpoint_id == endpoint_id))
+            await self.db.commit()
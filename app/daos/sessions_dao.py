@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import db_models as model
+from app.utils import database
+
+
+class SessionDAO:
+    def __init__(self, db: Session = None):
+        self.db = db or database.SessionLocal()
+
+    async def get(self, session_id: str, now: datetime) -> model.UserSessions:
+        """Fetch a session which did not expire yet."""
+        async with database.session_scope(self.db):
+            result = await self.db.execute(select(model.UserSessions)
+                                           .where(model.UserSessions.id == session_id,
+                                                  model.UserSessions.expires_at > now))
+            return result.scalars().first()
+
+    async def upsert(self, session_id: str, data: dict, expires_at: datetime):
+        """Create or replace a session."""
+        async with database.session_scope(self.db):
+            await self.db.execute(insert(model.UserSessions)
+                                  .values(id=session_id, data=data, expires_at=expires_at)
+                                  .on_conflict_do_update(index_elements=['id'],
+                                                         set_={'data': data, 'expires_at': expires_at}))
+            await self.db.commit()
+
+    async def delete(self, session_id: str):
+        """Delete a session."""
+        async with database.session_scope(self.db):
+            await self.db.execute(delete(model.UserSessions).where(model.UserSessions.id == session_id))
+            await self.db.commit()
+
+    async def delete_expired(self, now: datetime) -> int:
+        """Delete the expired sessions and return their number."""
+        async with database.session_scope(self.db):
+            result = await self.db.execute(delete(model.UserSessions).where(model.UserSessions.expires_at <= now))
+            await self.db.commit()
+            return result.rowcount
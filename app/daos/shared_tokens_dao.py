@@ -15,19 +15,19 @@ class SharedTokenDAO:
 
     async def get_all(self) -> List[model.ShareTokens]:
         """Fetch all tokens."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.ShareTokens).order_by(model.ShareTokens.created_ts))
             return result.scalars().all()
 
     async def get_by_id(self, token_id: int) -> model.ShareTokens:
         """Fetch a specific token by its ID."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.ShareTokens).where(model.ShareTokens.id == token_id))
             return result.scalars().first()
 
     async def get_by_token(self, token: str) -> model.ShareTokens:
         """Fetch a specific token by its name."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.ShareTokens).where(model.ShareTokens.token == token))
             return result.scalars().first()
 
@@ -40,7 +40,7 @@ class SharedTokenDAO:
             token=token_data.token
         )
         try:
-            async with self.db:
+            async with database.session_scope(self.db):
                 self.db.add(token)
                 await self.db.commit()
                 return token
@@ -51,7 +51,7 @@ class SharedTokenDAO:
 
     async def update(self, token_id: int, updated_data) -> model.ShareTokens:
         """Update an existing token."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(update(model.ShareTokens)
                                   .where(model.ShareTokens.id == token_id).values(**updated_data))
             await self.db.commit()
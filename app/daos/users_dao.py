@@ -3,12 +3,13 @@ from typing import List
 from psycopg2 import errorcodes
 from sqlalchemy import select, delete, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import joinedload, Session
+from sqlalchemy.orm import selectinload, Session
 
 from app.models import db_models as model
 from app.schemas.auth_sch import RegisterUser
 from app.utils import database
-from app.utils.enums import AccessLevel, UserStatus
+from app.utils.enums import AccessLevel, UserStatus, InvalidationEvents
+from app.utils.invalidation_bus import publish
 
 
 class DuplicateUserError(Exception):
@@ -22,31 +23,31 @@ class UserDAO:
 
     async def get_all(self) -> List[model.Users]:
         """Fetch all users."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Users).order_by(model.Users.name))
             return result.scalars().all()
 
     async def get_by_id(self, user_id: int) -> model.Users:
         """Fetch a specific user by its ID."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Users).where(model.Users.id == user_id))
             return result.scalars().first()
 
     async def get_by_email(self, email: str) -> model.Users:
         """Fetch a specific user by its Email."""
-        async with self.db:
+        async with database.session_scope(self.db):
             result = await self.db.execute(select(model.Users).where(model.Users.email == email))
             return result.scalars().first()
 
     async def get_detailed_user_info_by_email(self, email: str) -> model.Users:
         """Fetch a user with their endpoints access."""
-        async with self.db:
+        async with database.session_scope(self.db):
             stmt = (
                 select(model.Users)
                 .options(
-                    joinedload(model.Users.endpoints).joinedload(model.UserEndpoints.endpoint),
-                    joinedload(model.Users.notifications),
-                    joinedload(model.Users.dashboards)
+                    selectinload(model.Users.endpoints).joinedload(model.UserEndpoints.endpoint),
+                    selectinload(model.Users.notifications),
+                    selectinload(model.Users.dashboards)
                 )
                 .where(model.Users.email == email)
             )
@@ -63,7 +64,7 @@ class UserDAO:
             access_level=AccessLevel.NORMAL.value,
         )
         try:
-            async with self.db:
+            async with database.session_scope(self.db):
                 self.db.add(user)
                 await self.db.commit()
                 return user
@@ -79,14 +80,16 @@ class UserDAO:
 
     async def update(self, user_id: int, updated_data) -> model.Users:
         """Update an existing user."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(update(model.Users).where(model.Users.id == user_id).values(**updated_data))
+            await publish(self.db, InvalidationEvents.PERMISSIONS_CHANGED.value, user_id=user_id)
             await self.db.commit()
 
         return await self.get_by_id(user_id)
 
     async def delete(self, user_id: int):
         """Delete an user."""
-        async with self.db:
+        async with database.session_scope(self.db):
             await self.db.execute(delete(model.Users).where(model.Users.id == user_id))
+            await publish(self.db, InvalidationEvents.PERMISSIONS_CHANGED.value, user_id=user_id)
             await self.db.commit()
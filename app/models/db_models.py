@@ -1,14 +1,18 @@
 from typing import Optional, List
 
 from sqlalchemy import Column, Integer, String, TIMESTAMP, SmallInteger, Table, ForeignKey, Boolean, UniqueConstraint, \
-    Index
+    Index, BigInteger, text
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, Session
 from sqlalchemy.sql import func
 from sqlalchemy.sql.ddl import CreateTable, CreateIndex
 
-from app.utils.database import Base, SessionLocal
-from app.utils.enums import DatabaseSchemas
+from app.config.config import Settings
+from app.utils.database import Base, SessionLocal, session_scope
+from app.utils.enums import DatabaseSchemas, RollupUnits, InvalidationEvents, EndpointSearchModes
+from app.utils.invalidation_bus import INVALIDATION_CHANNEL
+
+db_config = Settings().database
 
 
 class Users(Base):
@@ -58,9 +62,20 @@ class Auth(Base):
         }
 
 
+# Text matched by the endpoint search, it must stay identical to the expression of the trigram index to use it.
+ENDPOINT_SEARCH_DOCUMENT = "(coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || coalesce(url, ''))"
+# The trigram index (and the pg_trgm extension it needs) only exists in trigram search mode.
+TRIGRAM_SEARCH = db_config['endpoint_search'] == EndpointSearchModes.TRIGRAM.value
+
+
 class Endpoints(Base):
     __tablename__ = "endpoints"
-    __table_args__ = {'schema': DatabaseSchemas.CONFIG_SCHEMA.value}
+    __table_args__ = (
+        Index('idx_endpoints_created_at_id', 'created_at', 'id'),
+        *([Index('idx_endpoints_search_trgm', text(f"{ENDPOINT_SEARCH_DOCUMENT} gin_trgm_ops"),
+                 postgresql_using='gin')] if TRIGRAM_SEARCH else []),
+        {'schema': DatabaseSchemas.CONFIG_SCHEMA.value}
+    )
     __allow_unmapped__ = True
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -105,11 +120,16 @@ class Endpoints(Base):
 
 class EndpointsStatus(Base):
     __tablename__ = "endpoints_status"
-    __table_args__ = {'schema': DatabaseSchemas.CONFIG_SCHEMA.value}
+    __table_args__ = (
+        Index('idx_endpoints_status_status', 'status'),
+        {'schema': DatabaseSchemas.CONFIG_SCHEMA.value}
+    )
 
     endpoint_id = Column(Integer, ForeignKey(f"{DatabaseSchemas.CONFIG_SCHEMA.value}.endpoints.id", ondelete='CASCADE'),
                          primary_key=True)
     status = Column(String)
+    # Time of the check which set the current status, older results arriving late do not roll it back.
+    status_at = Column(TIMESTAMP)
 
     endpoint = relationship("Endpoints", back_populates="status", uselist=False)
 
@@ -325,19 +345,191 @@ class EndpointMaintenanceWindows(Base):
         }
 
 
-async def create_table(table_name: str, schema: DatabaseSchemas, columns: List[Column]):
+class EndpointLogRollups(Base):
+    __tablename__ = "rollups"
+    __table_args__ = {'schema': DatabaseSchemas.LOG_SCHEMA.value}
+
+    endpoint_id = Column(Integer, ForeignKey(f"{DatabaseSchemas.CONFIG_SCHEMA.value}.endpoints.id", ondelete='CASCADE'),
+                         primary_key=True)
+    unit = Column(String, primary_key=True)
+    bucket = Column(TIMESTAMP, primary_key=True)
+    checks = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+    last_created_at = Column(TIMESTAMP)
+    last_error_at = Column(TIMESTAMP)
+    min_response_time = Column(Integer)
+    max_response_time = Column(Integer)
+    sum_response_time = Column(BigInteger, default=0)
+    timed_checks = Column(Integer, default=0)
+
+    def as_dict(self):
+        return {
+            'endpoint_id': self.endpoint_id,
+            'unit': self.unit,
+            'bucket': self.bucket.isoformat() if self.bucket else None,
+            'checks': self.checks,
+            'errors': self.errors,
+            'last_created_at': self.last_created_at.isoformat() if self.last_created_at else None,
+            'last_error_at': self.last_error_at.isoformat() if self.last_error_at else None,
+            'min_response_time': self.min_response_time,
+            'max_response_time': self.max_response_time,
+            'avg_response_time': self.sum_response_time // self.timed_checks if self.timed_checks else None
+        }
+
+
+class EndpointRetentionPolicies(Base):
+    __tablename__ = "endpoint_retention_policies"
+    __table_args__ = {'schema': DatabaseSchemas.CONFIG_SCHEMA.value}
+
+    endpoint_id = Column(Integer, ForeignKey(f"{DatabaseSchemas.CONFIG_SCHEMA.value}.endpoints.id", ondelete='CASCADE'),
+                         primary_key=True)
+    raw_days = Column(Integer)
+    hour_days = Column(Integer)
+    day_days = Column(Integer)
+    created_at = Column(TIMESTAMP, default=func.now())
+
+    def as_dict(self):
+        return {
+            'endpoint_id': self.endpoint_id,
+            'raw_days': self.raw_days,
+            'hour_days': self.hour_days,
+            'day_days': self.day_days,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class LogMigrations(Base):
+    __tablename__ = "migrations"
+    __table_args__ = {'schema': DatabaseSchemas.LOG_SCHEMA.value}
+
+    endpoint_id = Column(Integer, ForeignKey(f"{DatabaseSchemas.CONFIG_SCHEMA.value}.endpoints.id", ondelete='CASCADE'),
+                         primary_key=True)
+    log_table = Column(String)
+    log_copied_id = Column(BigInteger, default=0)
+    notification_copied_id = Column(BigInteger, default=0)
+    copied_rows = Column(BigInteger, default=0)
+    status = Column(String)
+    updated_at = Column(TIMESTAMP, default=func.now(), onupdate=func.now())
+
+    def as_dict(self):
+        return {
+            'endpoint_id': self.endpoint_id,
+            'log_table': self.log_table,
+            'log_copied_id': self.log_copied_id,
+            'notification_copied_id': self.notification_copied_id,
+            'copied_rows': self.copied_rows,
+            'status': self.status,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class EndpointChecks(Base):
+    """Consolidated log storage, range partitioned by created_at (see LogPartitionDAO)."""
+    __tablename__ = "checks"
+    __table_args__ = (
+        Index('idx_checks_endpoint_id_created_at', 'endpoint_id', 'created_at'),
+        {'schema': DatabaseSchemas.LOG_SCHEMA.value, 'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    created_at = Column(TIMESTAMP, primary_key=True, default=func.now(), server_default=text('LOCALTIMESTAMP'))
+    endpoint_id = Column(Integer, ForeignKey(f"{DatabaseSchemas.CONFIG_SCHEMA.value}.endpoints.id", ondelete='CASCADE'),
+                         nullable=False)
+    status = Column(String)
+    response = Column(JSONB)
+    response_time = Column(Integer)
+
+
+class EndpointNotificationEvents(Base):
+    """Consolidated notification storage, range partitioned by created_at (see LogPartitionDAO)."""
+    __tablename__ = "events"
+    __table_args__ = (
+        Index('idx_events_endpoint_id_created_at', 'endpoint_id', 'created_at'),
+        {'schema': DatabaseSchemas.NOTIFICATION_SCHEMA.value, 'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    created_at = Column(TIMESTAMP, primary_key=True, default=func.now(), server_default=text('LOCALTIMESTAMP'))
+    endpoint_id = Column(Integer, ForeignKey(f"{DatabaseSchemas.CONFIG_SCHEMA.value}.endpoints.id", ondelete='CASCADE'),
+                         nullable=False)
+    notification_id = Column(Integer, ForeignKey(f"{DatabaseSchemas.CONFIG_SCHEMA.value}.notifications.id",
+                                                 ondelete='CASCADE'))
+    status = Column(String)
+    response = Column(String)
+
+
+class UserSessions(Base):
+    """Server-side sessions, the cookie only carries the ID. Unlogged, sessions are not worth the WAL."""
+    __tablename__ = "sessions"
+    __table_args__ = (
+        Index('idx_sessions_expires_at', 'expires_at'),
+        {'schema': DatabaseSchemas.CONFIG_SCHEMA.value, 'prefixes': ['UNLOGGED']},
+    )
+
+    id = Column(String, primary_key=True)
+    data = Column(JSONB)
+    expires_at = Column(TIMESTAMP, nullable=False)
+
+
+class ProbeNodes(Base):
+    """Probe processes alive, a node is considered dead once its heartbeat is older than the lease TTL."""
+    __tablename__ = "probe_nodes"
+    __table_args__ = {'schema': DatabaseSchemas.CONFIG_SCHEMA.value}
+
+    node_id = Column(String, primary_key=True)
+    heartbeat_at = Column(TIMESTAMP, nullable=False)
+    started_at = Column(TIMESTAMP, default=func.now())
+
+
+class ProbeLeases(Base):
+    """Ownership of the probe shards, an endpoint belongs to the shard `id % shards`."""
+    __tablename__ = "probe_leases"
+    __table_args__ = {'schema': DatabaseSchemas.CONFIG_SCHEMA.value}
+
+    shard = Column(Integer, primary_key=True, autoincrement=False)
+    node_id = Column(String)
+    expires_at = Column(TIMESTAMP)
+
+
+class IngestKeys(Base):
+    """Idempotency keys of the ingested check batches, a batch sent again with the same key is not written twice."""
+    __tablename__ = "ingest_keys"
+    __table_args__ = {'schema': DatabaseSchemas.CONFIG_SCHEMA.value}
+
+    key = Column(String, primary_key=True)
+    results = Column(Integer, nullable=False)
+    received_at = Column(TIMESTAMP, default=func.now(), index=True)
+
+
+ROLLUP_FUNCTION = f"{DatabaseSchemas.LOG_SCHEMA.value}.rollup_log_row"
+ROLLUP_TRIGGER = "trg_rollup_log_row"
+# Set locally by writers whose rows are already accounted in the rollups (e.g. the log storage migration).
+ROLLUP_SKIP_SETTING = "status_pulse.skip_rollup"
+# Merge of a new rollup row into an existing bucket, shared by the trigger and the batch writers.
+ROLLUP_CONFLICT_UPDATE = """
+    checks = r.checks + EXCLUDED.checks,
+    errors = r.errors + EXCLUDED.errors,
+    last_created_at = GREATEST(r.last_created_at, EXCLUDED.last_created_at),
+    last_error_at = GREATEST(r.last_error_at, EXCLUDED.last_error_at),
+    min_response_time = LEAST(r.min_response_time, EXCLUDED.min_response_time),
+    max_response_time = GREATEST(r.max_response_time, EXCLUDED.max_response_time),
+    sum_response_time = r.sum_response_time + EXCLUDED.sum_response_time,
+    timed_checks = r.timed_checks + EXCLUDED.timed_checks"""
+
+
+async def create_table(table_name: str, schema: DatabaseSchemas, columns: List[Column], db: Session = None):
     new_table = Table(table_name, Base.metadata, *columns, schema=schema.value)
 
     create_table_stmt = CreateTable(new_table)
 
-    async with SessionLocal() as session:
+    async with session_scope(db or SessionLocal()) as session:
         await session.execute(create_table_stmt)
         await session.commit()
 
     return new_table
 
 
-async def create_log_table(table_name: str):
+async def create_log_table(table_name: str, db: Session = None):
     columns = [
         Column('id', Integer, primary_key=True, autoincrement=True),
         Column('status', String),
@@ -347,17 +539,19 @@ async def create_log_table(table_name: str):
         Column('response', JSONB),
         Column('response_time', Integer)
     ]
-    table = await create_table(table_name, DatabaseSchemas.LOG_SCHEMA, columns)
+    table = await create_table(table_name, DatabaseSchemas.LOG_SCHEMA, columns, db)
 
     # Create an index on the created_at column
     index_name = f"idx_{table_name}_created_at"
     index = Index(index_name, Column("created_at"), unique=False, _table=table)
-    async with SessionLocal() as session:
+    async with session_scope(db or SessionLocal()) as session:
         await session.execute(CreateIndex(index))
         await session.commit()
 
+    await create_rollup_trigger(table_name, db=db)
+
 
-async def create_notification_table(table_name: str):
+async def create_notification_table(table_name: str, db: Session = None):
     columns = [
         Column('id', Integer, primary_key=True, autoincrement=True),
         Column('status', String),
@@ -368,4 +562,91 @@ async def create_notification_table(table_name: str):
         Column('created_at', TIMESTAMP, default=func.now()),
         Column('response', String)
     ]
-    await create_table(table_name, DatabaseSchemas.NOTIFICATION_SCHEMA, columns)
+    await create_table(table_name, DatabaseSchemas.NOTIFICATION_SCHEMA, columns, db)
+
+
+async def create_rollup_function():
+    """Create (or replace) the trigger function which folds every new log row into the hourly/daily rollups."""
+    rollups_table = f"{DatabaseSchemas.LOG_SCHEMA.value}.{EndpointLogRollups.__tablename__}"
+    create_function_sql = f"""
+        CREATE OR REPLACE FUNCTION {ROLLUP_FUNCTION}() RETURNS trigger AS $$
+        DECLARE
+            row_created_at timestamp := COALESCE(NEW.created_at, LOCALTIMESTAMP);
+            row_error integer := CASE WHEN NEW.status = 'healthy' THEN 0 ELSE 1 END;
+            rollup_unit text;
+        BEGIN
+            IF NEW.endpoint_id IS NULL THEN
+                RETURN NULL;
+            END IF;
+
+            -- Writers which skip the trigger account their rows in the rollups and notify the workers themselves.
+            IF current_setting('{ROLLUP_SKIP_SETTING}', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+
+            -- Tell the workers that the cached charts of the endpoint are outdated, equal notifications of a
+            -- transaction are delivered once.
+            PERFORM pg_notify('{INVALIDATION_CHANNEL}', json_build_object(
+                'event', '{InvalidationEvents.CHECK_WRITTEN.value}', 'endpoint_id', NEW.endpoint_id)::text);
+
+            FOREACH rollup_unit IN ARRAY ARRAY['hour', 'day'] LOOP
+                INSERT INTO {rollups_table} AS r
+                    (endpoint_id, unit, bucket, checks, errors, last_created_at, last_error_at,
+                     min_response_time, max_response_time, sum_response_time, timed_checks)
+                VALUES
+                    (NEW.endpoint_id, rollup_unit, date_trunc(rollup_unit, row_created_at), 1, row_error,
+                     row_created_at, CASE WHEN row_error = 1 THEN row_created_at END,
+                     NEW.response_time, NEW.response_time, COALESCE(NEW.response_time, 0),
+                     CASE WHEN NEW.response_time IS NULL THEN 0 ELSE 1 END)
+                ON CONFLICT (endpoint_id, unit, bucket) DO UPDATE SET {ROLLUP_CONFLICT_UPDATE};
+            END LOOP;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """
+    async with SessionLocal() as session:
+        await session.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": ROLLUP_FUNCTION})
+        await session.execute(text(create_function_sql))
+        await session.commit()
+
+
+async def create_rollup_trigger(table_name: str, backfill: bool = False, db: Session = None):
+    """Attach the rollup trigger to a log table, optionally folding the rows it already holds into the rollups.
+
+    The trigger is created and the backfill is done in one transaction, CREATE TRIGGER holds a lock which blocks
+    concurrent inserts, so no row is counted twice or missed.
+    """
+    log_table = f"{DatabaseSchemas.LOG_SCHEMA.value}.{table_name}"
+    rollups_table = f"{DatabaseSchemas.LOG_SCHEMA.value}.{EndpointLogRollups.__tablename__}"
+
+    async with session_scope(db or SessionLocal()) as session:
+        await session.execute(text("SELECT pg_advisory_xact_lock(hashtext(:table_name))"), {"table_name": log_table})
+        exists = await session.execute(text("SELECT 1 FROM pg_trigger WHERE tgrelid = CAST(:table_name AS regclass) "
+                                            "AND tgname = :trigger_name"),
+                                       {"table_name": log_table, "trigger_name": ROLLUP_TRIGGER})
+        if exists.first():
+            await session.rollback()
+            return
+
+        await session.execute(text(f"CREATE TRIGGER {ROLLUP_TRIGGER} AFTER INSERT ON {log_table} "
+                                   f"FOR EACH ROW EXECUTE FUNCTION {ROLLUP_FUNCTION}()"))
+
+        if backfill:
+            for rollup_unit in RollupUnits:
+                await session.execute(text(f"""
+                    INSERT INTO {rollups_table}
+                        (endpoint_id, unit, bucket, checks, errors, last_created_at, last_error_at,
+                         min_response_time, max_response_time, sum_response_time, timed_checks)
+                    SELECT endpoint_id, '{rollup_unit.value}', date_trunc('{rollup_unit.value}', created_at), count(*),
+                           count(*) FILTER (WHERE status != 'healthy'), max(created_at),
+                           max(created_at) FILTER (WHERE status != 'healthy'),
+                           min(response_time), max(response_time), COALESCE(sum(response_time), 0),
+                           count(response_time)
+                    FROM {log_table}
+                    WHERE endpoint_id IS NOT NULL AND created_at IS NOT NULL
+                    GROUP BY endpoint_id, date_trunc('{rollup_unit.value}', created_at)
+                    ON CONFLICT (endpoint_id, unit, bucket) DO NOTHING
+                """))
+
+        await session.commit()
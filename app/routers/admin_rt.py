@@ -3,8 +3,10 @@ from sqlalchemy.orm import Session
 
 from app.schemas.endpoints_sch import UpdateEndpoint, BaseEndpointsOut, EndpointsOut
 from app.schemas.response_sch import Response
+from app.schemas.retention_sch import RetentionPolicy, RetentionPolicyOut
 from app.schemas.users_sch import UserResponse, UpdateUserProfile, UpdateUserAdmin
 from app.services.endpoints_srv import EndpointService
+from app.services.retention_srv import RetentionService
 from app.services.users_srv import UserService
 from app.utils.check_session import auth_required, admin_access_required
 from app.utils.database import get_db
@@ -25,8 +27,12 @@ def create_endpoint_service(db: Session = Depends(get_db)):
 async def get_all(request: Request,
                   page: int = Query(1, gt=0),
                   per_page: int = Query(5, gt=0, le=50),
+                  count: str = Query("exact"),
+                  cursor: str = Query(None),
+                  status: str = Query(None),
                   endpoint_service: EndpointService = Depends(create_endpoint_service)) -> EndpointsOut:
-    return await endpoint_service.get_all(request, page, per_page)
+    return await endpoint_service.get_all(request, page, per_page, count_mode=count, cursor=cursor,
+                                          endpoint_status=status)
 
 
 @router.get("/admin/endpoints/{endpoint_id}", tags=["admin"])
@@ -69,6 +75,37 @@ async def delete_endpoint(request: Request, endpoint_id: int,
     return await endpoint_service.delete_endpoint(request, endpoint_id)
 
 
+def create_retention_service(db: Session = Depends(get_db)):
+    return RetentionService(db)
+
+
+@router.get("/admin/endpoints/{endpoint_id}/retention", tags=["admin"])
+@auth_required
+@admin_access_required
+async def get_retention_policy(request: Request, endpoint_id: int,
+                               retention_service: RetentionService = Depends(create_retention_service)
+                               ) -> RetentionPolicyOut:
+    return await retention_service.get_policy(request, endpoint_id)
+
+
+@router.put("/admin/endpoints/{endpoint_id}/retention", tags=["admin"])
+@auth_required
+@admin_access_required
+async def update_retention_policy(request: Request, endpoint_id: int, policy: RetentionPolicy,
+                                  retention_service: RetentionService = Depends(create_retention_service)
+                                  ) -> RetentionPolicyOut:
+    return await retention_service.update_policy(request, endpoint_id, policy)
+
+
+@router.delete("/admin/endpoints/{endpoint_id}/retention", tags=["admin"])
+@auth_required
+@admin_access_required
+async def delete_retention_policy(request: Request, endpoint_id: int,
+                                  retention_service: RetentionService = Depends(create_retention_service)
+                                  ) -> Response:
+    return await retention_service.delete_policy(request, endpoint_id)
+
+
 def create_user_service():
     return UserService()
 
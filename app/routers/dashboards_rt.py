@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, Request, Query
 from sqlalchemy.orm import Session
 
 from app.schemas.dashboards_sch import DashboardOut, CreateDashboard, UpdateDashboard, DashboardEndpoint, \
-    DashboardEndpointCreate, DashboardOutLight
+    DashboardEndpointCreate, DashboardOutLight, DashboardWidgetsData
 from app.schemas.response_sch import Response
 from app.services.dashboards_srv import DashboardService
 from app.utils.check_session import auth_required
@@ -38,6 +38,21 @@ async def get_by_id(request: Request, name: str = Query(None), dashboard_service
     return await dashboard_service.get_by_uuid(request, name)
 
 
+@router.post("/dashboards/{dashboard_id}/widgets/data", tags=["dashboards"])
+@auth_required
+async def get_widgets_data(request: Request, dashboard_id: int, widgets_data: DashboardWidgetsData,
+                           dashboard_service: DashboardService = Depends(create_dashboard_service)) -> Response:
+    return await dashboard_service.get_widgets_data(request, dashboard_id, widgets_data)
+
+
+@router.post("/dashboard/widgets/data", tags=["dashboards"])
+@auth_required
+async def get_widgets_data_by_uuid(request: Request, widgets_data: DashboardWidgetsData, name: str = Query(None),
+                                   dashboard_service: DashboardService = Depends(create_dashboard_service)
+                                   ) -> Response:
+    return await dashboard_service.get_widgets_data_by_uuid(request, name, widgets_data)
+
+
 @router.post("/dashboards", tags=["dashboards"])
 @auth_required
 async def create(request: Request, dashboard_data: CreateDashboard,
@@ -1,6 +1,7 @@
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, Request, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.schemas.endpoints_sch import CreateEndpoint, UpdateEndpoint, BaseEndpointsOut, EndpointsOut
@@ -23,8 +24,11 @@ async def get_all(request: Request,
                   page: int = Query(1, gt=0),
                   per_page: int = Query(10, gt=0, le=50),
                   search: str = Query(None),
+                  count: str = Query("exact"),
+                  cursor: str = Query(None),
+                  status: str = Query(None),
                   endpoint_service: EndpointService = Depends(create_endpoint_service)) -> EndpointsOut:
-    return await endpoint_service.get_all(request, page, per_page, search)
+    return await endpoint_service.get_all(request, page, per_page, search, count, cursor, status)
 
 
 @router.get("/endpoints/share", tags=["endpoints"])
@@ -63,8 +67,30 @@ async def get_uptime_logs_by_interval(request: Request, endpoint_id: int,
                                       date_from: datetime = Query(None),
                                       date_to: datetime = Query(None),
                                       full: bool = Query(None),
+                                      limit: int = Query(None, gt=0, le=1000),
+                                      cursor: str = Query(None),
                                       endpoint_service: EndpointService = Depends(create_endpoint_service)) -> Response:
-    return await endpoint_service.get_uptime_logs_by_interval(request, endpoint_id, date_from, date_to, full)
+    return await endpoint_service.get_uptime_logs_by_interval(request, endpoint_id, date_from, date_to, full, limit,
+                                                              cursor)
+
+
+@router.get("/endpoints/{endpoint_id}/uptime/logs/export", tags=["endpoints"])
+@auth_required
+async def export_uptime_logs(request: Request, endpoint_id: int,
+                             date_from: datetime = Query(None),
+                             date_to: datetime = Query(None),
+                             full: bool = Query(None),
+                             format: str = Query("ndjson"),
+                             endpoint_service: EndpointService = Depends(create_endpoint_service)
+                             ) -> StreamingResponse:
+    return await endpoint_service.export_uptime_logs(request, endpoint_id, date_from, date_to, full, format)
+
+
+@router.get("/endpoints/{endpoint_id}/uptime/logs/{log_id}", tags=["endpoints"])
+@auth_required
+async def get_uptime_log_by_id(request: Request, endpoint_id: int, log_id: int,
+                               endpoint_service: EndpointService = Depends(create_endpoint_service)) -> Response:
+    return await endpoint_service.get_uptime_log_by_id(request, endpoint_id, log_id)
 
 
 @router.get("/endpoints/{endpoint_id}/widget", tags=["endpoints"])
@@ -73,9 +99,10 @@ async def get_endpoint_widget_graph_by_id(request: Request, endpoint_id: int,
                                           type: str = Query(None),
                                           unit: str = Query(None),
                                           duration: int = Query(None),
+                                          max_points: int = Query(None, ge=3),
                                           endpoint_service: EndpointService = Depends(create_endpoint_service)
                                           ) -> Response:
-    return await endpoint_service.get_widget_graph_by_id(request, endpoint_id, type, unit, duration)
+    return await endpoint_service.get_widget_graph_by_id(request, endpoint_id, type, unit, duration, max_points)
 
 
 @router.post("/endpoints/{endpoint_id}/share", tags=["endpoints"])
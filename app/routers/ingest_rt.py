@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.orm import Session
+
+from app.schemas.response_sch import Response
+from app.services.ingest_srv import IngestService
+from app.utils.check_session import ingest_token_required
+from app.utils.database import get_db
+
+router = APIRouter()
+
+
+def create_ingest_service(db: Session = Depends(get_db)):
+    return IngestService(db)
+
+
+@router.post("/ingest/checks", tags=["ingest"])
+@ingest_token_required
+async def ingest_checks(request: Request,
+                        ingest_service: IngestService = Depends(create_ingest_service)) -> Response:
+    return await ingest_service.ingest_checks(request)
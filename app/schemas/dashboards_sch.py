@@ -155,6 +155,26 @@ class DashboardEndpoint(BaseModel):
         return duration
 
 
+class DashboardWidgetsData(BaseModel):
+    widgets: Optional[List[int]] = None
+    max_points: Optional[int] = None
+
+    @field_validator("max_points")
+    def check_max_points(cls, max_points):
+        """Validates Max Points."""
+        if max_points is not None and max_points < 3:
+            raise ValueError(f"{max_points} should be a number greater than 2.")
+        return max_points
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "widgets": [0, 1, 2],
+                "max_points": 300
+            }
+        }
+
+
 class DashboardEndpointLight(BaseModel):
     name: str
     status: str
@@ -102,13 +102,24 @@ class BaseEndpointLogs(BaseModel):
         return value
 
 
-class EndpointLogs(BaseEndpointLogs):
+class EndpointChartLogs(BaseEndpointLogs):
     id: int
     endpoint_id: int
-    response: dict
     response_time: int
 
 
+class EndpointLogs(EndpointChartLogs):
+    response: dict
+
+
+class EndpointLogsRollup(BaseEndpointLogs):
+    checks: int
+    errors: int
+    response_time: int | None = None
+    min_response_time: int | None = None
+    max_response_time: int | None = None
+
+
 class EndpointNotificationLogs(BaseEndpointLogs):
     id: int
     endpoint_id: int
@@ -0,0 +1,30 @@
+from typing import Optional
+
+from pydantic import BaseModel, field_validator
+
+
+class RetentionPolicy(BaseModel):
+    raw_days: Optional[int] = None
+    hour_days: Optional[int] = None
+    day_days: Optional[int] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "raw_days": 14,
+                "hour_days": 365,
+                "day_days": 0
+            }
+        }
+
+    @field_validator('raw_days', 'hour_days', 'day_days')
+    def validate_days(cls, value):
+        """Validates that the retention is not negative, 0 keeps the data forever."""
+        if value is not None and value < 0:
+            raise ValueError("Retention days should be 0 (keep forever) or a positive number")
+        return value
+
+
+# Response models
+class RetentionPolicyOut(RetentionPolicy):
+    endpoint_id: int
@@ -1,4 +1,5 @@
 import uuid
+from functools import partial
 from typing import List
 
 from fastapi import status, Request
@@ -8,9 +9,10 @@ from app.daos.dashboards_dao import DashboardDAO, DashboardError
 from app.exceptions.custom_http_expeption import CustomHTTPException
 from app.models import db_models as model
 from app.schemas.dashboards_sch import DashboardOut, DashboardEndpoint, CreateDashboard, UpdateDashboard, \
-    DashboardEndpointCreate, DashboardEndpointLight, DashboardOutLight
+    DashboardEndpointCreate, DashboardEndpointLight, DashboardOutLight, DashboardWidgetsData
+from app.utils import database
 from app.utils.chart_processor import ChartProcessor
-from app.utils.enums import SessionAttributes, DashboardScopes, AccessLevel
+from app.utils.enums import SessionAttributes, DashboardScopes, AccessLevel, DashboardChartTypes
 from app.utils.logger import Logger
 from app.utils.response import ok, error
 
@@ -19,6 +21,7 @@ LOGGER = Logger().start_logger()
 
 class DashboardService:
     def __init__(self, db: Session):
+        self.db = db
         self.dashboards_dao = DashboardDAO(db)
         self.chart_processor = ChartProcessor(db)
 
@@ -120,6 +123,51 @@ class DashboardService:
         return ok(message="Successfully provided dashboard.",
                   data=dashboard_endpoints)
 
+    @classmethod
+    async def _compute_widget(cls, db: Session, widget: model.DashboardEndpoints, max_points: int = None):
+        """Compute the series of a single widget, every widget runs on its own session to be computed concurrently."""
+        if not widget.endpoint or not widget.endpoint.log_table:
+            return []
+
+        chart_processor = ChartProcessor(db)
+        if widget.type == DashboardChartTypes.LINE_CHART.value:
+            return await chart_processor.process_line_chart(widget.endpoint, widget.unit, widget.duration, max_points)
+        if widget.type == DashboardChartTypes.UPTIME.value:
+            return await chart_processor.process_uptime_chart(widget.endpoint, widget.unit, widget.duration)
+        return []
+
+    async def _compute_widgets(self, dashboard: model.Dashboards, widgets_data: DashboardWidgetsData):
+        widgets = [widget for widget in dashboard.endpoints
+                   if widgets_data.widgets is None or widget.i in widgets_data.widgets]
+        series = await database.gather_queries(
+            self.db,
+            *(partial(self._compute_widget, widget=widget, max_points=widgets_data.max_points) for widget in widgets)
+        )
+        return {widget.i: data for widget, data in zip(widgets, series)}
+
+    async def get_widgets_data(self, request: Request, dashboard_id: int, widgets_data: DashboardWidgetsData):
+        self._validate_user_access(request, dashboard_id)
+        dashboard = await self._get_dashboard(dashboard_id)
+
+        widgets = await self._compute_widgets(dashboard, widgets_data)
+
+        LOGGER.info(f"Successfully computed {len(widgets)} widgets of dashboard {dashboard_id}.")
+        return ok(message="Successfully provided widgets data.", data=widgets)
+
+    async def get_widgets_data_by_uuid(self, request: Request, dashboard_uuid: str,
+                                       widgets_data: DashboardWidgetsData):
+        dashboard = await self.dashboards_dao.get_by_uuid(dashboard_uuid)
+        if not dashboard:
+            return error(message="Dashboard not found", status_code=status.HTTP_400_BAD_REQUEST)
+
+        if not self._have_public_access(dashboard):
+            self._validate_user_access(request, dashboard.id)
+
+        widgets = await self._compute_widgets(dashboard, widgets_data)
+
+        LOGGER.info(f"Successfully computed {len(widgets)} widgets of dashboard {dashboard_uuid}.")
+        return ok(message="Successfully provided widgets data.", data=widgets)
+
     async def create_dashboard(self, request: Request, dashboard_data: CreateDashboard):
         try:
             LOGGER.info("Creating dashboard.")
@@ -1,10 +1,15 @@
+import csv
+import io
+import json
 import uuid
 from datetime import datetime, timezone
 from typing import List
 
 from fastapi import Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
+from app.config.config import Settings
 from app.daos.endpoints_dao import EndpointDAO, DuplicateEndpointError
 from app.daos.log_table_dao import LogTableDAO
 from app.daos.notification_table_dao import NotificationTableDAO
@@ -14,18 +19,25 @@ from app.models.db_models import create_log_table, create_notification_table
 from app.schemas.endpoints_sch import BaseEndpointsOut, CreateEndpoint, CreateEndpointInDb, UpdateEndpoint, \
     EndpointsOut, EndpointLogs, EndpointNotificationLogs
 from app.schemas.shared_tokens_sch import CreateToken, CreateTokenBody
+from app.utils import database
 from app.utils.chart_processor import ChartProcessor
 from app.utils.enums import SessionAttributes, AccessLevel, EndpointStatus, EndpointPermissions, DashboardChartUnits, \
-    DashboardChartTypes
+    DashboardChartTypes, LogStorages, LogExportFormats, CountModes
 from app.utils.logger import Logger
+from app.utils.pagination import encode_cursor, decode_cursor
 from app.utils.response import ok, error
 from app.utils.token_manager import TokenManager
 
 LOGGER = Logger().start_logger()
+db_config = Settings().database
+
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_COLUMNS = ["id", "endpoint_id", "created_at", "status", "response_time", "response"]
 
 
 class EndpointService:
     def __init__(self, db: Session):
+        self.db = db
         self.endpoint_dao = EndpointDAO(db)
         self.log_table_dao = LogTableDAO(db)
         self.chart_processor = ChartProcessor(db)
@@ -79,32 +91,78 @@ class EndpointService:
 
         return endpoint
 
-    async def fetch_endpoints(self, request: Request, page: int, per_page: int, search_query: str):
+    async def fetch_endpoints(self, request: Request, page: int, per_page: int, search_query: str,
+                              count_mode: str = CountModes.EXACT.value, after: tuple = None,
+                              endpoint_status: str = None):
         user_access_level = request.session.get(SessionAttributes.USER_ACCESS_LEVEL.value)
 
         if user_access_level != AccessLevel.ADMIN.value:
             LOGGER.info("Fetching endpoints based on user-specific access.")
             user_endpoints_perm = request.session.get(SessionAttributes.USER_ENDPOINTS_PERM.value)
 
-            return await self.fetch_user_specific_endpoints(user_endpoints_perm, page, per_page, search_query)
+            return await self.fetch_user_specific_endpoints(user_endpoints_perm, page, per_page, search_query,
+                                                            count_mode, after, endpoint_status)
 
         LOGGER.info("Fetching all endpoints for admin user.")
-        return await self.fetch_admin_endpoints(page, per_page, search_query)
+        return await self.fetch_admin_endpoints(page, per_page, search_query, count_mode, after, endpoint_status)
+
+    async def _fetch_endpoints_page(self, page: int, per_page: int, search_query: str, user_endpoints_perm: dict,
+                                    is_admin: bool, count_mode: str, after: tuple = None, endpoint_status: str = None):
+        """Fetch a page of endpoints, the total count (None when not requested) and whether more endpoints follow."""
+        if after is None and count_mode == CountModes.EXACT.value:
+            endpoints, total_count = await self.endpoint_dao.get_page_with_total(page, per_page, search_query,
+                                                                                 user_endpoints_perm, is_admin,
+                                                                                 endpoint_status)
+            return endpoints, total_count, total_count > page * per_page
+
+        # One extra endpoint tells whether there is a next page.
+        queries = [lambda db: EndpointDAO(db).get_all_with_latest_log_status(page, per_page + 1, search_query,
+                                                                             user_endpoints_perm, is_admin, after,
+                                                                             endpoint_status)]
+        if count_mode == CountModes.EXACT.value:
+            queries.append(lambda db: EndpointDAO(db).count_endpoints(search_query, user_endpoints_perm, is_admin,
+                                                                      endpoint_status))
+        elif count_mode == CountModes.ESTIMATE.value:
+            queries.append(lambda db: EndpointDAO(db).estimate_total(search_query, user_endpoints_perm, is_admin,
+                                                                     endpoint_status))
+
+        endpoints, *total_count = await database.gather_queries(self.db, *queries)
+        return endpoints[:per_page], total_count[0] if total_count else None, len(endpoints) > per_page
 
     async def fetch_user_specific_endpoints(self, user_endpoints_perm: dict, page: int, per_page: int,
-                                            search_query: str):
-        endpoints = await self.endpoint_dao.get_all_with_latest_log_status(page, per_page, search_query,
-                                                                           user_endpoints_perm)
-        total_count = await self.endpoint_dao.count_total_invoices(search_query, user_endpoints_perm)
-        return endpoints, total_count
-
-    async def fetch_admin_endpoints(self, page: int, per_page: int, search_query: str):
-        endpoints = await self.endpoint_dao.get_all_with_latest_log_status(page, per_page, search_query, is_admin=True)
-        total_count = await self.endpoint_dao.count_total_invoices(search_query=search_query)
-        return endpoints, total_count
-
-    async def get_all(self, request: Request, page: int = 1, per_page: int = 10, search_query: str = None):
-        endpoints, total_count = await self.fetch_endpoints(request, page, per_page, search_query)
+                                            search_query: str, count_mode: str = CountModes.EXACT.value,
+                                            after: tuple = None, endpoint_status: str = None):
+        return await self._fetch_endpoints_page(page, per_page, search_query, user_endpoints_perm, False, count_mode,
+                                                after, endpoint_status)
+
+    async def fetch_admin_endpoints(self, page: int, per_page: int, search_query: str,
+                                    count_mode: str = CountModes.EXACT.value, after: tuple = None,
+                                    endpoint_status: str = None):
+        return await self._fetch_endpoints_page(page, per_page, search_query, None, True, count_mode, after,
+                                                endpoint_status)
+
+    async def get_all(self, request: Request, page: int = 1, per_page: int = 10, search_query: str = None,
+                      count_mode: str = CountModes.EXACT.value, cursor: str = None, endpoint_status: str = None):
+        if count_mode not in (cm.value for cm in CountModes):
+            return error(message=f"{count_mode} is not a valid count mode. Valid modes are: "
+                                 f"{', '.join(cm.value for cm in CountModes)}",
+                         status_code=status.HTTP_400_BAD_REQUEST)
+
+        if endpoint_status and endpoint_status not in (es.value for es in EndpointStatus):
+            return error(message=f"{endpoint_status} is not a valid status. Valid statuses are: "
+                                 f"{', '.join(es.value for es in EndpointStatus)}",
+                         status_code=status.HTTP_400_BAD_REQUEST)
+
+        after = None
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = decode_cursor(cursor, 2)
+                after = (datetime.fromisoformat(cursor_created_at), int(cursor_id))
+            except (ValueError, TypeError):
+                return error(message="Invalid cursor.", status_code=status.HTTP_400_BAD_REQUEST)
+
+        endpoints, total_count, has_more = await self.fetch_endpoints(request, page, per_page, search_query,
+                                                                      count_mode, after, endpoint_status)
 
         if not endpoints:
             LOGGER.info("No endpoints found in the database.")
@@ -124,7 +182,9 @@ class EndpointService:
             data={
                 "data": [endpoint for endpoint in endpoints_rsp],
                 "total_count": total_count,
-                "pages": (total_count + per_page - 1) // per_page
+                "pages": (total_count + per_page - 1) // per_page if total_count is not None else None,
+                "count_mode": count_mode,
+                "next_cursor": encode_cursor(endpoints[-1].created_at, endpoints[-1].id) if has_more else None
             }
         )
 
@@ -171,12 +231,9 @@ class EndpointService:
         return ok(message="Successfully provided status graph for endpoint.",
                   data=hourly_logs)
 
-    async def get_widget_graph_by_id(self, request: Request, endpoint_id: int, chart_type: str, unit: str, duration: int):
+    async def get_widget_graph_by_id(self, request: Request, endpoint_id: int, chart_type: str, unit: str, duration: int,
+                                     max_points: int = None):
         self._validate_access(request, endpoint_id)
-        endpoint = await self._get_endpoint(endpoint_id)
-        if not endpoint.log_table:
-            return ok(message="No logs found.", data=[])
-
         if unit not in (dcu.value for dcu in DashboardChartUnits):
             return error(message=f"{unit} is not a valid unit. Valid units are: "
                                  f"{', '.join(dcu.value for dcu in DashboardChartUnits)}")
@@ -190,9 +247,13 @@ class EndpointService:
         if unit == DashboardChartUnits.HOURS.value and (duration < 1 or duration > 72):
             return error(message=f"{duration} should be a valid number between 1 and 72 hours.")
 
+        endpoint = await self._get_endpoint(endpoint_id)
+        if not endpoint.log_table:
+            return ok(message="No logs found.", data=[])
+
         logs = []
         if endpoint.log_table and chart_type == DashboardChartTypes.LINE_CHART.value:
-            logs = await self.chart_processor.process_line_chart(endpoint, unit, duration)
+            logs = await self.chart_processor.process_line_chart(endpoint, unit, duration, max_points)
 
         if endpoint.log_table and chart_type == DashboardChartTypes.UPTIME.value:
             logs = await self.chart_processor.process_uptime_chart(endpoint, unit, duration)
@@ -222,8 +283,9 @@ class EndpointService:
                                                             request.session.get(SessionAttributes.USER_ID.value),
                                                             EndpointPermissions.UPDATE.value)
             await self.endpoint_dao.register_endpoint_status(endpoint.id, EndpointStatus.MEASURING.value)
-            await create_log_table(log_table)
-            await create_notification_table(log_table)
+            if db_config['log_storage'] != LogStorages.PARTITIONED.value:
+                await create_log_table(log_table, self.db)
+                await create_notification_table(log_table, self.db)
 
             if endpoint_data.notifications:
                 await self._upsert_notifications_to_endpoint(request, endpoint.id, endpoint_data.notifications)
@@ -264,8 +326,8 @@ class EndpointService:
 
         await self.endpoint_dao.delete(endpoint_id)
 
-        await self.log_table_dao.delete_log_table(endpoint.log_table)
-        await self.notification_table_dao.delete_log_table(endpoint.log_table)
+        await self.log_table_dao.delete_log_table(endpoint)
+        await self.notification_table_dao.delete_log_table(endpoint)
 
         LOGGER.info(f"Endpoint with ID {endpoint_id} has been successfully deleted.")
         return ok(message="Endpoint has been successfully deleted.")
@@ -314,14 +376,29 @@ class EndpointService:
             return error(message=e.detail, status_code=status.HTTP_400_BAD_REQUEST)
 
     async def get_uptime_logs_by_interval(self, request: Request, endpoint_id: int, date_from: datetime,
-                                          date_to: datetime, full: bool):
+                                          date_to: datetime, full: bool, limit: int = None, cursor: str = None):
         self._validate_access(request, endpoint_id)
         endpoint = await self._get_endpoint(endpoint_id)
 
+        after = None
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = decode_cursor(cursor, 2)
+                after = (datetime.fromisoformat(cursor_created_at), int(cursor_id))
+            except (ValueError, TypeError):
+                return error(message="Invalid cursor.", status_code=status.HTTP_400_BAD_REQUEST)
+
         endpoint_data = EndpointsOut.model_validate(endpoint.as_dict())
 
+        next_cursor = None
         if endpoint.log_table:
-            log_records = await self.log_table_dao.select_logs_by_interval(endpoint.log_table, date_from, date_to, full)
+            # One extra row tells whether there is a next page.
+            log_records = await self.log_table_dao.select_logs_by_interval(endpoint, date_from, date_to, full,
+                                                                           limit + 1 if limit else None, after)
+            if limit and len(log_records) > limit:
+                log_records = log_records[:limit]
+                next_cursor = encode_cursor(log_records[-1].created_at, log_records[-1].id)
+
             updated_logs = [
                 EndpointLogs(
                     id=log.id,
@@ -335,8 +412,97 @@ class EndpointService:
 
             endpoint_data.logs = [record for record in updated_logs]
 
+        if not limit and not cursor:
+            return ok(message="Successfully provided status graph for endpoint.",
+                      data=endpoint_data.logs)
+
         return ok(message="Successfully provided status graph for endpoint.",
-                  data=endpoint_data.logs)
+                  data={
+                      "data": endpoint_data.logs,
+                      "next_cursor": next_cursor
+                  })
+
+    @classmethod
+    def _export_row(cls, log):
+        return {
+            "id": log.id,
+            "endpoint_id": log.endpoint_id,
+            "created_at": int(log.created_at.replace(tzinfo=timezone.utc).timestamp()),
+            "status": log.status,
+            "response_time": log.response_time,
+            "response": log.response
+        }
+
+    @classmethod
+    def _format_export_chunk(cls, chunk, export_format: str) -> str:
+        if export_format == LogExportFormats.NDJSON.value:
+            return "".join(json.dumps(cls._export_row(log), default=str) + "\n" for log in chunk)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for log in chunk:
+            row = cls._export_row(log)
+            row["response"] = json.dumps(row["response"], default=str)
+            writer.writerow(row[column] for column in EXPORT_COLUMNS)
+        return buffer.getvalue()
+
+    @classmethod
+    async def _stream_export(cls, endpoint, date_from: datetime, date_to: datetime, full: bool, export_format: str):
+        # The response is streamed after the request scoped session is closed, so the export uses its own session.
+        log_table_dao = LogTableDAO()
+
+        if export_format == LogExportFormats.CSV.value:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(EXPORT_COLUMNS)
+            yield buffer.getvalue()
+
+        exported = 0
+        async for chunk in log_table_dao.stream_logs_by_interval(endpoint, date_from, date_to, full,
+                                                                 EXPORT_CHUNK_SIZE):
+            exported += len(chunk)
+            yield cls._format_export_chunk(chunk, export_format)
+
+        LOGGER.info(f"Exported {exported} logs of endpoint ID {endpoint.id}.")
+
+    async def export_uptime_logs(self, request: Request, endpoint_id: int, date_from: datetime, date_to: datetime,
+                                 full: bool, export_format: str):
+        self._validate_access(request, endpoint_id)
+        endpoint = await self._get_endpoint(endpoint_id)
+
+        if export_format not in (lef.value for lef in LogExportFormats):
+            return error(message=f"{export_format} is not a valid export format. Valid formats are: "
+                                 f"{', '.join(lef.value for lef in LogExportFormats)}",
+                         status_code=status.HTTP_400_BAD_REQUEST)
+
+        if not endpoint.log_table:
+            return ok(message="No logs found.", data=[])
+
+        media_type = "text/csv" if export_format == LogExportFormats.CSV.value else "application/x-ndjson"
+        return StreamingResponse(
+            self._stream_export(endpoint, date_from, date_to, full, export_format),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="endpoint-{endpoint_id}-logs.{export_format}"'}
+        )
+
+    async def get_uptime_log_by_id(self, request: Request, endpoint_id: int, log_id: int):
+        self._validate_access(request, endpoint_id)
+        endpoint = await self._get_endpoint(endpoint_id)
+
+        log = await self.log_table_dao.select_log_by_id(endpoint, log_id) if endpoint.log_table else None
+        if not log:
+            LOGGER.warning(f"Log with ID {log_id} of endpoint ID {endpoint_id} not found.")
+            raise CustomHTTPException(detail=f"Log with ID {log_id} does not exist.",
+                                      status_code=status.HTTP_404_NOT_FOUND)
+
+        return ok(message="Successfully provided log of endpoint.",
+                  data=EndpointLogs(
+                      id=log.id,
+                      endpoint_id=log.endpoint_id,
+                      response=log.response,
+                      response_time=log.response_time,
+                      status=log.status,
+                      created_at=int(log.created_at.replace(tzinfo=timezone.utc).timestamp())
+                  ))
 
     async def _upsert_notifications_to_endpoint(self, request: Request, endpoint_id: int, notification_ids: List[int]):
         user_notifications_set = request.session.get(SessionAttributes.USER_NOTIFICATIONS.value)
@@ -355,7 +521,7 @@ class EndpointService:
         endpoint = await self._get_endpoint(endpoint_id)
 
         if endpoint.log_table:
-            log_records = await self.notification_table_dao.select_logs_from_last_hours(endpoint.log_table, hours)
+            log_records = await self.notification_table_dao.select_logs_from_last_hours(endpoint, hours)
 
             updated_logs = [
                 EndpointNotificationLogs(
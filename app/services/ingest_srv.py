@@ -0,0 +1,235 @@
+import json
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Tuple
+
+from fastapi import Request, status
+from sqlalchemy.orm import Session
+
+from app.config.config import Settings
+from app.daos.endpoints_dao import EndpointDAO
+from app.daos.ingest_keys_dao import IngestKeyDAO
+from app.daos.log_table_dao import LogTableDAO
+from app.exceptions.custom_http_expeption import CustomHTTPException
+from app.models import db_models as model
+from app.utils.check_writer import CheckResult
+from app.utils.enums import EndpointStatus, LogStorages
+from app.utils.logger import Logger
+from app.utils.response import ok, error
+
+LOGGER = Logger().start_logger()
+db_config = Settings().database
+ingest_config = Settings().ingest
+
+INGESTED_STATUSES = (EndpointStatus.HEALTHY.value, EndpointStatus.UNHEALTHY.value, EndpointStatus.DEGRADED.value)
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+MAX_REPORTED_ERRORS = 100
+# Results are accepted up to a day old (their log partitions exist) and with a few minutes of clock skew.
+MAX_RESULT_AGE = timedelta(days=1)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class _InvalidJson:
+    """Placeholder of an NDJSON line which could not be decoded."""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+class IngestService:
+    """Write the check results sent by the external probers.
+
+    A request is written in its unit of work: the idempotency key, one COPY per log table and one update of the
+    statuses commit together, so a batch sent again with the same key is never written twice. Results are validated
+    by hand rather than through pydantic models, which would cost more than the writes themselves.
+    """
+
+    def __init__(self, db: Session):
+        self.endpoint_dao = EndpointDAO(db)
+        self.log_table_dao = LogTableDAO(db)
+        self.ingest_key_dao = IngestKeyDAO(db)
+
+    @classmethod
+    def _body_too_large(cls) -> CustomHTTPException:
+        return CustomHTTPException(detail=f"At most {ingest_config['max_body_bytes']} bytes per request.",
+                                   status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    @classmethod
+    def _check_content_length(cls, request: Request):
+        """Reject a body announced larger than allowed before anything is read."""
+        try:
+            content_length = int(request.headers.get("Content-Length", 0))
+        except ValueError:
+            raise CustomHTTPException(detail="Invalid Content-Length.", status_code=status.HTTP_400_BAD_REQUEST)
+        if content_length > int(ingest_config['max_body_bytes']):
+            raise cls._body_too_large()
+
+    @classmethod
+    async def _read_body(cls, request: Request) -> bytes:
+        """Read the body up to the allowed size, a chunked body does not announce its length."""
+        max_bytes = int(ingest_config['max_body_bytes'])
+        chunks, size = [], 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_bytes:
+                raise cls._body_too_large()
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    @classmethod
+    def _decode(cls, body: bytes, content_type: str) -> List:
+        """Decode a JSON array of results, or one result per line (NDJSON)."""
+        if content_type.split(";")[0].strip().lower() not in NDJSON_CONTENT_TYPES:
+            try:
+                results = json.loads(body)
+            except ValueError as e:
+                raise CustomHTTPException(detail=f"Invalid JSON: {e}", status_code=status.HTTP_400_BAD_REQUEST)
+            if not isinstance(results, list):
+                raise CustomHTTPException(detail="Expected a JSON array of check results.",
+                                          status_code=status.HTTP_400_BAD_REQUEST)
+            return results
+
+        lines = [line for line in body.split(b"\n") if line.strip()]
+        try:
+            # Decoding the whole batch at once is much faster than line by line, which only runs on invalid lines.
+            results = json.loads(b"[" + b",".join(lines) + b"]")
+            if len(results) == len(lines):
+                return results
+        except ValueError:
+            pass
+
+        results = []
+        for line in lines:
+            try:
+                results.append(json.loads(line))
+            except ValueError as e:
+                results.append(_InvalidJson(f"Invalid JSON: {e}"))
+        return results
+
+    @classmethod
+    def _parse_time(cls, value) -> datetime:
+        """Parse an ISO 8601 time (UTC unless it has an offset) or a UNIX timestamp into a naive UTC datetime."""
+        if isinstance(value, str):
+            created_at = datetime.fromisoformat(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            try:
+                created_at = datetime.fromtimestamp(value, timezone.utc)
+            except (OverflowError, OSError):
+                raise ValueError(f"created_at {value} is not a valid UNIX timestamp.")
+        else:
+            raise ValueError("created_at must be an ISO 8601 time or a UNIX timestamp.")
+
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        return created_at
+
+    @classmethod
+    def _validate(cls, item, endpoints: Dict[int, model.Endpoints], oldest: datetime, newest: datetime) \
+            -> CheckResult:
+        if isinstance(item, _InvalidJson):
+            raise ValueError(item.reason)
+        if not isinstance(item, dict):
+            raise ValueError("A check result must be a JSON object.")
+
+        endpoint_id = item.get("endpoint_id")
+        endpoint = endpoints.get(endpoint_id) if type(endpoint_id) is int else None
+        if endpoint is None:
+            raise ValueError(f"Endpoint {endpoint_id} does not exist or has no log storage.")
+
+        check_status = item.get("status")
+        if check_status not in INGESTED_STATUSES:
+            raise ValueError(f"status must be one of: {', '.join(INGESTED_STATUSES)}.")
+
+        created_at = cls._parse_time(item.get("created_at"))
+        if not oldest <= created_at <= newest:
+            raise ValueError(f"created_at {created_at.isoformat()} is out of the accepted range.")
+
+        response = item.get("response")
+        if response is None:
+            response = {}
+        elif not isinstance(response, dict):
+            raise ValueError("response must be a JSON object.")
+
+        response_time = item.get("response_time")
+        if response_time is not None and (type(response_time) is not int or response_time < 0):
+            raise ValueError("response_time must be a positive integer (ms).")
+
+        return CheckResult(endpoint, created_at, check_status, response, response_time)
+
+    async def _get_endpoints(self, items: List) -> Dict[int, model.Endpoints]:
+        """Fetch the endpoints the results refer to, those without log storage cannot be written."""
+        endpoint_ids = {item.get("endpoint_id") for item in items
+                        if isinstance(item, dict) and type(item.get("endpoint_id")) is int}
+        if not endpoint_ids:
+            return {}
+
+        endpoints = await self.endpoint_dao.get_by_ids(list(endpoint_ids))
+        if db_config['log_storage'] == LogStorages.PARTITIONED.value:
+            return endpoints
+        return {endpoint_id: endpoint for endpoint_id, endpoint in endpoints.items() if endpoint.log_table}
+
+    @classmethod
+    def _latest_statuses(cls, results: List[CheckResult]) -> Dict[int, Tuple[str, datetime]]:
+        """Status and time of the most recent result of every endpoint."""
+        latest: Dict[int, Tuple[str, datetime]] = {}
+        for result in results:
+            current = latest.get(result.endpoint.id)
+            if current is None or current[1] <= result.created_at:
+                latest[result.endpoint.id] = (result.status, result.created_at)
+        return latest
+
+    @classmethod
+    def _already_ingested(cls, ingested: model.IngestKeys | None):
+        return ok(message="Check results were already ingested.",
+                  data={"accepted": ingested.results if ingested else 0, "rejected": 0, "errors": [],
+                        "duplicate": True})
+
+    async def ingest_checks(self, request: Request):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+            raise CustomHTTPException(detail=f"{IDEMPOTENCY_HEADER} must have 1 to {MAX_KEY_LENGTH} characters.",
+                                      status_code=status.HTTP_400_BAD_REQUEST)
+        self._check_content_length(request)
+
+        if key is not None:
+            ingested = await self.ingest_key_dao.get_by_key(key)
+            if ingested:
+                return self._already_ingested(ingested)
+
+        items = self._decode(await self._read_body(request), request.headers.get("Content-Type", ""))
+        if len(items) > int(ingest_config['max_results']):
+            raise CustomHTTPException(detail=f"At most {ingest_config['max_results']} check results per request.",
+                                      status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        endpoints = await self._get_endpoints(items)
+        results, errors, rejected = [], [], 0
+        for index, item in enumerate(items):
+            try:
+                results.append(self._validate(item, endpoints, now - MAX_RESULT_AGE, now + MAX_CLOCK_SKEW))
+            except ValueError as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"index": index, "error": str(e)})
+
+        if rejected:
+            LOGGER.warning(f"Rejected {rejected} of {len(items)} ingested check results.")
+
+        data = {"accepted": len(results), "rejected": rejected, "errors": errors, "duplicate": False}
+        if not results:
+            if rejected:
+                return error(message="No valid check result.", data=data,
+                             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            return ok(message="No check result to ingest.", data=data)
+
+        if key is not None and not await self.ingest_key_dao.claim(key, len(results)):
+            # Claimed by a concurrent request with the same key, which was committed meanwhile.
+            return self._already_ingested(await self.ingest_key_dao.get_by_key(key))
+
+        # Concurrent batches of different zones lock the rollup and status rows of an endpoint in the same order.
+        results.sort(key=lambda result: (result.endpoint.id, result.created_at))
+        await self.log_table_dao.copy_logs([result.as_log() for result in results])
+        await self.endpoint_dao.update_statuses(self._latest_statuses(results))
+
+        return ok(message=f"Ingested {len(results)} check results.", data=data)
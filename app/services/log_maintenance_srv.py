@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.config.config import Settings
+from app.daos.ingest_keys_dao import IngestKeyDAO
+from app.daos.log_partition_dao import LogPartitionDAO
+from app.services.retention_srv import RetentionService
+from app.utils import database
+from app.utils.enums import LogStorages
+from app.utils.logger import Logger
+
+LOGGER = Logger().start_logger()
+db_config = Settings().database
+ingest_config = Settings().ingest
+
+MAINTENANCE_INTERVAL = 3600
+MAINTENANCE_LOCK = "log_maintenance"
+
+
+class LogMaintenanceService:
+    def __init__(self, db: Session = None):
+        self.log_partition_dao = LogPartitionDAO(db)
+        self.retention_service = RetentionService(db)
+        self.ingest_key_dao = IngestKeyDAO(db)
+
+    @classmethod
+    def is_partitioned(cls):
+        return db_config['log_storage'] != LogStorages.TABLES.value
+
+    async def maintain_partitions(self):
+        """Create the upcoming partitions, the old ones are dropped by the retention."""
+        interval = db_config['log_partition_interval']
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        step = self.log_partition_dao.partition_step(interval)
+
+        created = await self.log_partition_dao.create_partitions(
+            now, now + step * (int(db_config['log_partitions_ahead']) + 1), interval)
+        if created:
+            LOGGER.info(f"Created log partitions: {', '.join(created)}")
+
+    async def purge_ingest_keys(self):
+        """Forget the idempotency keys of the ingested batches once they are older than their TTL."""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        deleted = await self.ingest_key_dao.delete_before(now - timedelta(hours=int(ingest_config['key_ttl_hours'])))
+        if deleted:
+            LOGGER.info(f"Purged {deleted} expired ingest idempotency keys.")
+
+    async def maintain(self):
+        """Run a maintenance pass, unless another worker is already running one."""
+        async with database.try_advisory_lock(MAINTENANCE_LOCK) as acquired:
+            if not acquired:
+                LOGGER.debug("Log maintenance is already run by another worker, skipping this pass.")
+                return
+
+            if self.is_partitioned():
+                try:
+                    await self.maintain_partitions()
+                except Exception as e:
+                    LOGGER.error(f"Log partition maintenance failed: {e}")
+
+            try:
+                await self.retention_service.apply_retention()
+            except Exception as e:
+                LOGGER.error(f"Log retention failed: {e}")
+
+            try:
+                await self.purge_ingest_keys()
+            except Exception as e:
+                LOGGER.error(f"Purging the ingest idempotency keys failed: {e}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(MAINTENANCE_INTERVAL)
+            try:
+                await self.maintain()
+            except Exception as e:
+                LOGGER.error(f"Log maintenance failed: {e}")
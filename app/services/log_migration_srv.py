@@ -0,0 +1,84 @@
+import time
+from typing import List
+
+from app.config.config import Settings
+from app.daos.log_migration_dao import LogMigrationDAO, LOG_COPY_COLUMNS, NOTIFICATION_COPY_COLUMNS
+from app.daos.log_partition_dao import LogPartitionDAO
+from app.models import db_models as model
+from app.utils.enums import DatabaseSchemas, LogMigrationStatus
+from app.utils.logger import Logger
+
+LOGGER = Logger().start_logger()
+db_config = Settings().database
+
+
+class LogMigrationService:
+    """Copy the per-endpoint log and notification tables into the consolidated, partitioned storage.
+
+    Run it while db_log_storage=migrating (reads combine both storages), then switch to partitioned and run it once
+    more to copy the rows written in between. Progress is kept per endpoint in log.migrations, so it can be stopped
+    and resumed at any time.
+    """
+
+    def __init__(self):
+        self.log_migration_dao = LogMigrationDAO()
+        self.log_partition_dao = LogPartitionDAO()
+
+    async def _ensure_partitions(self, endpoint: model.Endpoints):
+        date_from, date_to = await self.log_migration_dao.select_interval(endpoint.log_table)
+        if date_from and date_to:
+            interval = db_config['log_partition_interval']
+            step = self.log_partition_dao.partition_step(interval)
+            await self.log_partition_dao.create_partitions(date_from, date_to + step, interval)
+
+    async def _copy_table(self, endpoint: model.Endpoints, schema: str, target: str, columns: List[str],
+                          progress_column: str, batch_size: int) -> int:
+        copied = 0
+        while True:
+            started = time.perf_counter()
+            rows = await self.log_migration_dao.copy_batch(endpoint, schema, target, columns, progress_column,
+                                                           batch_size)
+            copied += rows
+            if rows:
+                LOGGER.debug(f"Copied {rows} rows of {schema}.{endpoint.log_table} "
+                             f"({rows / (time.perf_counter() - started):.0f} rows/s).")
+            if rows < batch_size:
+                return copied
+
+    async def migrate_endpoint(self, endpoint: model.Endpoints, batch_size: int) -> int:
+        await self.log_migration_dao.get_or_create_progress(endpoint)
+        await self._ensure_partitions(endpoint)
+
+        copied = await self._copy_table(endpoint, DatabaseSchemas.LOG_SCHEMA.value,
+                                        model.EndpointChecks.__tablename__, LOG_COPY_COLUMNS,
+                                        'log_copied_id', batch_size)
+        copied += await self._copy_table(endpoint, DatabaseSchemas.NOTIFICATION_SCHEMA.value,
+                                         model.EndpointNotificationEvents.__tablename__, NOTIFICATION_COPY_COLUMNS,
+                                         'notification_copied_id', batch_size)
+
+        await self.log_migration_dao.set_status(endpoint.id, LogMigrationStatus.DONE.value)
+        return copied
+
+    async def migrate(self, batch_size: int = 10000, endpoint_ids: List[int] = None):
+        endpoints = await self.log_migration_dao.get_endpoints_to_migrate(endpoint_ids)
+        LOGGER.info(f"Migrating logs of {len(endpoints)} endpoints in batches of {batch_size} rows.")
+
+        started = time.perf_counter()
+        total = 0
+        for index, endpoint in enumerate(endpoints, start=1):
+            endpoint_started = time.perf_counter()
+            try:
+                copied = await self.migrate_endpoint(endpoint, batch_size)
+            except Exception as e:
+                LOGGER.error(f"Migration of endpoint {endpoint.id} ({endpoint.log_table}) failed: {e}")
+                continue
+
+            total += copied
+            elapsed = time.perf_counter() - endpoint_started
+            LOGGER.info(f"[{index}/{len(endpoints)}] Endpoint {endpoint.id}: copied {copied} rows in {elapsed:.1f}s "
+                        f"({copied / elapsed if elapsed else 0:.0f} rows/s).")
+
+        elapsed = time.perf_counter() - started
+        LOGGER.info(f"Migration finished: copied {total} rows in {elapsed:.1f}s "
+                    f"({total / elapsed if elapsed else 0:.0f} rows/s).")
+        return total
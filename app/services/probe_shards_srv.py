@@ -0,0 +1,99 @@
+import math
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List
+
+from app.daos.probe_leases_dao import ProbeLeaseDAO
+from app.utils.logger import Logger
+
+LOGGER = Logger().start_logger()
+
+
+# Heartbeats per local lease window (ttl - check timeout): a lease survives a few failed or slow heartbeats.
+HEARTBEATS_PER_WINDOW = 3
+MIN_HEARTBEAT_INTERVAL = 1
+
+
+class ProbeShardService:
+    """Split the endpoints between all running probers through leased shards.
+
+    Every heartbeat a node renews its leases, then claims free or expired shards up to its fair share
+    (shards / live nodes) or gives up those above it, so a joining node gets its share within a few heartbeats and
+    the shards of a dead node are taken over once their leases expire. A node only starts checks of a shard until the
+    local deadline of its lease, taken before the lease was written and shortened by the check timeout, so its last
+    check is over before any other node may claim the shard. The heartbeat interval is derived from that window, the
+    leases are renewed well before their deadline.
+    """
+
+    def __init__(self, shards: int, ttl: int, check_timeout: float):
+        self.heartbeat_interval = (ttl - check_timeout) / HEARTBEATS_PER_WINDOW
+        if self.heartbeat_interval < MIN_HEARTBEAT_INTERVAL:
+            raise ValueError(f"The probe lease TTL ({ttl}s) must be at least "
+                             f"{MIN_HEARTBEAT_INTERVAL * HEARTBEATS_PER_WINDOW}s longer than the probe timeout "
+                             f"({check_timeout}s).")
+        self.shards = shards
+        self.ttl = ttl
+        self.check_timeout = check_timeout
+        self.node_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._deadlines: Dict[int, float] = {}
+        # Shards given up, still leased until their last checks are over, with the time they stopped being probed.
+        self._releasing: Dict[int, float] = {}
+
+    def shard_of(self, endpoint_id: int) -> int:
+        return endpoint_id % self.shards
+
+    def owned(self) -> List[int]:
+        now = time.monotonic()
+        return sorted(shard for shard, deadline in self._deadlines.items() if deadline > now)
+
+    def owns(self, endpoint_id: int) -> bool:
+        return self._deadlines.get(self.shard_of(endpoint_id), 0) > time.monotonic()
+
+    def _deadline(self, started: float) -> float:
+        """Last moment a check of a shard leased at `started` may begin, it is over when the lease expires."""
+        return started + self.ttl - self.check_timeout
+
+    async def start(self):
+        await ProbeLeaseDAO().ensure_shards(self.shards)
+
+    async def rebalance(self) -> bool:
+        """Heartbeat, renew the leases and move towards the fair share, return whether the owned shards changed."""
+        lease_dao = ProbeLeaseDAO()
+        before = self.owned()
+        started = time.monotonic()
+
+        live_nodes = await lease_dao.heartbeat(self.node_id, self.ttl)
+        held = await lease_dao.renew(self.node_id, self.ttl)
+        fair_share = math.ceil(self.shards / live_nodes)
+
+        # The shards given up by a previous heartbeat are released once their running checks are over.
+        released = [shard for shard, stopped in self._releasing.items() if started - stopped >= self.check_timeout]
+        if released:
+            await lease_dao.release(self.node_id, released)
+        self._releasing = {shard: stopped for shard, stopped in self._releasing.items()
+                           if shard in held and shard not in released}
+        shards = [shard for shard in held if shard not in self._releasing and shard not in released]
+
+        excess = []
+        if len(shards) > fair_share:
+            excess = shards[fair_share:]
+            shards = shards[:fair_share]
+        elif len(shards) < fair_share:
+            shards += await lease_dao.claim(self.node_id, self.ttl, fair_share - len(shards))
+
+        self._deadlines = {shard: self._deadline(started) for shard in shards}
+        # No check of the excess shards starts from now on, their leases are renewed until a later heartbeat.
+        stopped = time.monotonic()
+        self._releasing.update((shard, stopped) for shard in excess)
+
+        changed = self.owned() != before
+        if changed:
+            LOGGER.info(f"Probe node {self.node_id} holds {len(shards)}/{self.shards} shards ({live_nodes} nodes).")
+        return changed
+
+    async def leave(self):
+        self._deadlines = {}
+        self._releasing = {}
+        await ProbeLeaseDAO().leave(self.node_id)
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+
+import httpx
+
+from app.config.config import Settings
+from app.daos.endpoints_dao import EndpointDAO
+from app.models import db_models as model
+from app.services.probe_shards_srv import ProbeShardService
+from app.utils.check_writer import CheckResult, CheckWriter
+from app.utils.enums import EndpointStatus, InvalidationEvents, LogStorages
+from app.utils.invalidation_bus import INVALIDATION_BUS
+from app.utils.logger import Logger
+from app.utils.probe_scheduler import ProbeScheduler
+
+LOGGER = Logger().start_logger()
+db_config = Settings().database
+probe_config = Settings().probe
+
+
+class ProbeService:
+    """Run the health checks of all endpoints from their cron schedules.
+
+    A single loop pops the due endpoints from the scheduler heap and starts their checks, at most `concurrency` checks
+    are in flight and they share one pooled HTTP client. Endpoints are reloaded every refresh interval and as soon as
+    one is updated or deleted. With shards configured, the node only probes the endpoints of the shards it leases.
+    Results and statuses are buffered and written in batches by the check writer.
+    """
+
+    def __init__(self, concurrency: int = None, timeout: float = None, refresh_interval: int = None):
+        self.concurrency = int(concurrency or probe_config['concurrency'])
+        self.timeout = float(timeout or probe_config['timeout'])
+        self.refresh_interval = int(refresh_interval or probe_config['refresh_interval'])
+        self.shards = ProbeShardService(int(probe_config['shards']), int(probe_config['lease_ttl']), self.timeout) \
+            if int(probe_config['shards']) > 0 else None
+        self.writer = CheckWriter(int(probe_config['batch_rows']), int(probe_config['batch_delay_ms']) / 1000,
+                                  int(probe_config['buffer_rows']))
+        self.scheduler = ProbeScheduler()
+        self.endpoints: Dict[int, model.Endpoints] = {}
+        self.client: httpx.AsyncClient | None = None
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._tasks = set()
+        self._refresh = asyncio.Event()
+
+    @classmethod
+    def _url(cls, endpoint: model.Endpoints) -> str:
+        if "://" in endpoint.url:
+            return endpoint.url
+        return f"{endpoint.type or 'https'}://{endpoint.url}"
+
+    @classmethod
+    def _matches(cls, expected, actual) -> bool:
+        """Whether the expected response is contained in the actual one, objects are compared key by key."""
+        if isinstance(expected, dict):
+            return isinstance(actual, dict) and all(key in actual and cls._matches(value, actual[key])
+                                                    for key, value in expected.items())
+        return expected == actual
+
+    @classmethod
+    def classify(cls, endpoint: model.Endpoints, status_code: int, body: bytes, response_time: int) \
+            -> Tuple[str, dict]:
+        """Classify a response by its status code, its body and its latency against the endpoint's threshold."""
+        if endpoint.status_code and status_code != endpoint.status_code:
+            return EndpointStatus.UNHEALTHY.value, {"status_code": status_code,
+                                                    "error": f"Expected status code {endpoint.status_code}."}
+
+        if endpoint.response:
+            try:
+                actual = json.loads(body)
+            except ValueError:
+                actual = None
+            if not cls._matches(endpoint.response, actual):
+                return EndpointStatus.UNHEALTHY.value, {"status_code": status_code,
+                                                        "error": "Unexpected response body."}
+
+        if endpoint.threshold and response_time > endpoint.threshold:
+            return EndpointStatus.DEGRADED.value, {"status_code": status_code,
+                                                   "error": f"Response time above {endpoint.threshold} ms."}
+
+        return EndpointStatus.HEALTHY.value, {"status_code": status_code}
+
+    async def check(self, endpoint: model.Endpoints) -> Tuple[datetime, str, dict, int | None]:
+        """Run a single check and return its time, status, response details and response time in ms."""
+        created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(self._url(endpoint))
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            return created_at, EndpointStatus.UNHEALTHY.value, {"error": str(e) or type(e).__name__}, None
+
+        response_time = int((time.perf_counter() - started) * 1000)
+        status, response_details = self.classify(endpoint, response.status_code, response.content, response_time)
+        return created_at, status, response_details, response_time
+
+    async def record(self, endpoint: model.Endpoints, created_at: datetime, status: str, response: dict,
+                     response_time: int | None):
+        await self.writer.write(CheckResult(endpoint, created_at, status, response, response_time))
+
+    async def _probe(self, endpoint: model.Endpoints):
+        try:
+            await self.record(endpoint, *await self.check(endpoint))
+        except Exception as e:
+            LOGGER.error(f"Check of endpoint {endpoint.id} failed: {e}")
+        finally:
+            self._slots.release()
+
+    async def _dispatch(self, endpoint: model.Endpoints):
+        # Waiting for a free slot holds the scheduler back instead of piling up checks.
+        await self._slots.acquire()
+        task = asyncio.create_task(self._probe(endpoint))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @classmethod
+    def _is_probed(cls, endpoint: model.Endpoints) -> bool:
+        return bool(endpoint.url and endpoint.cron and
+                    (endpoint.log_table or db_config['log_storage'] == LogStorages.PARTITIONED.value))
+
+    async def load_endpoints(self):
+        """(Re)load the endpoints to probe, unchanged schedules keep their next run."""
+        now = time.time()
+        endpoints = {}
+        if self.shards:
+            to_probe = await EndpointDAO().get_all_to_probe(self.shards.shards, self.shards.owned())
+        else:
+            to_probe = await EndpointDAO().get_all_to_probe()
+
+        for endpoint in to_probe:
+            if not self._is_probed(endpoint):
+                continue
+            try:
+                self.scheduler.schedule(endpoint.id, endpoint.cron, now)
+            except ValueError as e:
+                LOGGER.warning(f"Endpoint {endpoint.id} has an invalid cron {endpoint.cron}: {e}")
+                continue
+
+            endpoints[endpoint.id] = endpoint
+
+        for endpoint_id in set(self.endpoints) - set(endpoints):
+            self.scheduler.remove(endpoint_id)
+        self.endpoints = endpoints
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._refresh.wait(), self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._refresh.clear()
+
+            try:
+                await self.load_endpoints()
+            except Exception as e:
+                LOGGER.error(f"Reloading the endpoints to probe failed: {e}")
+
+    async def _lease_loop(self):
+        while True:
+            try:
+                if await self.shards.rebalance():
+                    self._refresh.set()
+            except Exception as e:
+                # The leases which cannot be renewed lapse, their endpoints are taken over by the other nodes.
+                LOGGER.error(f"Renewing the probe leases failed: {e}")
+            await asyncio.sleep(self.shards.heartbeat_interval)
+
+    async def _schedule_loop(self):
+        while True:
+            for endpoint_id in self.scheduler.pop_due(time.time()):
+                endpoint = self.endpoints.get(endpoint_id)
+                if endpoint is not None and (self.shards is None or self.shards.owns(endpoint_id)):
+                    await self._dispatch(endpoint)
+
+            next_run = self.scheduler.next_run()
+            await self.scheduler.wait(None if next_run is None else max(next_run - time.time(), 0))
+
+    async def run(self):
+        for event in (InvalidationEvents.RESET, InvalidationEvents.ENDPOINT_UPDATED,
+                      InvalidationEvents.ENDPOINT_DELETED):
+            INVALIDATION_BUS.subscribe(event.value, lambda data: self._refresh.set())
+
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits) as client:
+            self.client = client
+            if self.shards:
+                await self.shards.start()
+                await self.shards.rebalance()
+            await self.load_endpoints()
+            LOGGER.info(f"Probing {len(self.scheduler)} endpoints with up to {self.concurrency} concurrent checks.")
+
+            background = [asyncio.create_task(INVALIDATION_BUS.run()), asyncio.create_task(self._refresh_loop()),
+                          asyncio.create_task(self.writer.run())]
+            if self.shards:
+                background.append(asyncio.create_task(self._lease_loop()))
+            try:
+                await self._schedule_loop()
+            finally:
+                # The running checks end first, the writer's last flush then writes their results.
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+                for task in background:
+                    task.cancel()
+                await asyncio.gather(*background, return_exceptions=True)
+                if self.shards:
+                    await self.shards.leave()
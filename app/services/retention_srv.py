@@ -0,0 +1,126 @@
+import time
+from datetime import datetime, timezone, timedelta
+
+from fastapi import Request, status
+from sqlalchemy.orm import Session
+
+from app.config.config import Settings
+from app.daos.endpoints_dao import EndpointDAO
+from app.daos.log_partition_dao import LogPartitionDAO
+from app.daos.log_rollup_dao import LogRollupDAO
+from app.daos.log_table_dao import LogTableDAO
+from app.daos.notification_table_dao import NotificationTableDAO
+from app.daos.retention_policies_dao import RetentionPolicyDAO
+from app.exceptions.custom_http_expeption import CustomHTTPException
+from app.schemas.retention_sch import RetentionPolicy, RetentionPolicyOut
+from app.utils.enums import LogStorages, RollupUnits
+from app.utils.logger import Logger
+from app.utils.response import ok
+
+LOGGER = Logger().start_logger()
+db_config = Settings().database
+
+
+class RetentionService:
+    def __init__(self, db: Session = None):
+        self.endpoint_dao = EndpointDAO(db)
+        self.retention_policy_dao = RetentionPolicyDAO(db)
+        self.log_table_dao = LogTableDAO(db)
+        self.notification_table_dao = NotificationTableDAO(db)
+        self.log_rollup_dao = LogRollupDAO(db)
+        self.log_partition_dao = LogPartitionDAO(db)
+
+    @classmethod
+    def _default_policy(cls):
+        return {
+            'raw_days': int(db_config['log_retention_days']),
+            'hour_days': int(db_config['rollup_hour_retention_days']),
+            'day_days': int(db_config['rollup_day_retention_days'])
+        }
+
+    @classmethod
+    def _effective_policy(cls, override=None):
+        policy = cls._default_policy()
+        if override:
+            policy.update({key: value for key, value in override.as_dict().items()
+                           if key in policy and value is not None})
+        return policy
+
+    async def _get_endpoint(self, endpoint_id: int):
+        endpoint = await self.endpoint_dao.get_by_id(endpoint_id)
+        if not endpoint:
+            LOGGER.warning(f"Endpoint with ID {endpoint_id} not found.")
+            raise CustomHTTPException(detail=f"Endpoint with ID {endpoint_id} does not exist.",
+                                      status_code=status.HTTP_404_NOT_FOUND)
+        return endpoint
+
+    async def get_policy(self, request: Request, endpoint_id: int):
+        await self._get_endpoint(endpoint_id)
+        override = await self.retention_policy_dao.get_by_endpoint_id(endpoint_id)
+
+        return ok(message="Successfully provided retention policy.",
+                  data=RetentionPolicyOut(endpoint_id=endpoint_id, **self._effective_policy(override)))
+
+    async def update_policy(self, request: Request, endpoint_id: int, policy: RetentionPolicy):
+        await self._get_endpoint(endpoint_id)
+        override = await self.retention_policy_dao.upsert(endpoint_id, policy.model_dump())
+
+        LOGGER.info(f"Successfully updated retention policy of endpoint ID {endpoint_id}.")
+        return ok(message="Successfully updated retention policy.",
+                  data=RetentionPolicyOut(endpoint_id=endpoint_id, **self._effective_policy(override)))
+
+    async def delete_policy(self, request: Request, endpoint_id: int):
+        await self._get_endpoint(endpoint_id)
+        await self.retention_policy_dao.delete(endpoint_id)
+
+        LOGGER.info(f"Retention policy of endpoint ID {endpoint_id} has been reset to the default.")
+        return ok(message="Retention policy has been reset to the default.")
+
+    @classmethod
+    async def _delete_in_batches(cls, delete_batch, batch_size: int) -> int:
+        """Run a bounded delete until it removes less than a batch, every batch is a short transaction."""
+        deleted = 0
+        while True:
+            rows = await delete_batch()
+            deleted += rows
+            if rows < batch_size:
+                return deleted
+
+    async def apply_retention(self) -> dict:
+        """Delete the logs, notifications and rollups which are past their (per-endpoint) retention."""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        batch_size = int(db_config['retention_batch_size'])
+        report = {'logs': 0, 'notifications': 0, 'hour_rollups': 0, 'day_rollups': 0, 'partitions': []}
+
+        endpoints = await self.endpoint_dao.get_all_with_log_table()
+        overrides = {override.endpoint_id: override for override in await self.retention_policy_dao.get_all()}
+        policies = {endpoint.id: self._effective_policy(overrides.get(endpoint.id)) for endpoint in endpoints}
+
+        # Whole partitions are dropped up to the longest raw retention, shorter ones are deleted row by row below.
+        raw_retentions = [policy['raw_days'] for policy in policies.values()] or [self._default_policy()['raw_days']]
+        if db_config['log_storage'] != LogStorages.TABLES.value and 0 not in raw_retentions:
+            report['partitions'] = await self.log_partition_dao.drop_partitions_before(
+                now - timedelta(days=max(raw_retentions)))
+
+        for endpoint in endpoints:
+            policy = policies[endpoint.id]
+            if policy['raw_days']:
+                cutoff = now - timedelta(days=policy['raw_days'])
+                report['logs'] += await self._delete_in_batches(
+                    lambda: self.log_table_dao.delete_logs_before(endpoint, cutoff, batch_size), batch_size)
+                report['notifications'] += await self._delete_in_batches(
+                    lambda: self.notification_table_dao.delete_logs_before(endpoint, cutoff, batch_size), batch_size)
+
+            for unit, key in ((RollupUnits.HOUR.value, 'hour'), (RollupUnits.DAY.value, 'day')):
+                if policy[f'{key}_days']:
+                    cutoff = now - timedelta(days=policy[f'{key}_days'])
+                    report[f'{key}_rollups'] += await self._delete_in_batches(
+                        lambda: self.log_rollup_dao.delete_rollups_before(endpoint.id, unit, cutoff, batch_size),
+                        batch_size)
+
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        LOGGER.info(f"Retention applied in {report['seconds']}s: removed {report['logs']} logs, "
+                    f"{report['notifications']} notifications, {report['hour_rollups']} hourly and "
+                    f"{report['day_rollups']} daily rollups, dropped {len(report['partitions'])} partitions.")
+        return report
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List
+
+from app.utils.enums import EndpointStatus
+
+
+class Bucket:
+    __slots__ = ('start', 'checks', 'errors', 'last_created_at', 'last_error_at', 'min_response_time',
+                 'max_response_time', 'sum_response_time', 'timed_checks')
+
+    def __init__(self, start: datetime):
+        self.start = start
+        self.checks = 0
+        self.errors = 0
+        self.last_created_at = None
+        self.last_error_at = None
+        self.min_response_time = None
+        self.max_response_time = None
+        self.sum_response_time = 0
+        self.timed_checks = 0
+
+
+class TimeBuckets:
+    """Fixed-width time buckets filled in a single pass over log rows.
+
+    Every row is placed by integer arithmetic on its offset from the start of the first bucket, so the cost is
+    O(rows + buckets) whatever the order of the rows. Rows outside of the covered interval are ignored.
+    """
+
+    def __init__(self, start_time: datetime, width: timedelta, count: int):
+        if width <= timedelta(0):
+            raise ValueError("Bucket width should be positive")
+
+        self.start_time = start_time
+        self.width = width
+        self.count = count
+        self._width_us = self._to_microseconds(width)
+        self._buckets: List[Bucket] = [Bucket(start_time + width * index) for index in range(count)]
+
+    @staticmethod
+    def _to_microseconds(delta: timedelta) -> int:
+        return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+    def add(self, created_at: datetime, status: str, response_time: int = None):
+        index = self._to_microseconds(created_at - self.start_time) // self._width_us
+        if index < 0 or index >= self.count:
+            return
+
+        bucket = self._buckets[index]
+        bucket.checks += 1
+        if bucket.last_created_at is None or created_at > bucket.last_created_at:
+            bucket.last_created_at = created_at
+
+        if status != EndpointStatus.HEALTHY.value:
+            bucket.errors += 1
+            if bucket.last_error_at is None or created_at > bucket.last_error_at:
+                bucket.last_error_at = created_at
+
+        if response_time is not None:
+            bucket.timed_checks += 1
+            bucket.sum_response_time += response_time
+            if bucket.min_response_time is None or response_time < bucket.min_response_time:
+                bucket.min_response_time = response_time
+            if bucket.max_response_time is None or response_time > bucket.max_response_time:
+                bucket.max_response_time = response_time
+
+    def extend(self, rows: Iterable) -> "TimeBuckets":
+        """Add rows exposing created_at, status and optionally response_time attributes."""
+        add = self.add
+        for row in rows:
+            add(row.created_at, row.status, getattr(row, 'response_time', None))
+        return self
+
+    def __iter__(self) -> Iterator[Bucket]:
+        return iter(self._buckets)
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+from app.config.config import Settings
+from app.utils.enums import InvalidationEvents
+
+chart_config = Settings().charts
+
+
+class ChartCacheEntry:
+    __slots__ = ('marker', 'value', 'state', 'version', 'created')
+
+    def __init__(self, marker: Any, value: Any, state: Any = None, version: tuple = None):
+        self.marker = marker
+        self.value = value
+        self.state = state
+        self.version = version
+        self.created = time.monotonic()
+
+
+class ChartCache:
+    """In-process LRU cache of chart series.
+
+    Every entry holds the marker (created_at and id of the latest log) it was computed for, so the caller can tell
+    whether it is still up to date or only needs the rows written after it. Entries are dropped after ttl seconds to
+    bound the effect of late rows, which an incremental extension cannot see.
+
+    The version of an endpoint is bumped by every check_written event of the invalidation bus, an entry computed at
+    the current version is up to date without asking the database. An entry of an older version is recomputed, the
+    rows written since may be older than its marker.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, ChartCacheEntry]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._epoch = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable) -> ChartCacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl and time.monotonic() - entry.created > self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, marker: Any, value: Any, state: Any = None, version: tuple = None):
+        self._entries[key] = ChartCacheEntry(marker, value, state, version)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def version(self, endpoint_id: int) -> tuple:
+        return self._epoch, self._versions.get(endpoint_id, 0)
+
+    def touch(self, endpoint_id: int):
+        self._versions[endpoint_id] = self._versions.get(endpoint_id, 0) + 1
+
+    def invalidate(self, endpoint_id: int):
+        """Drop the entries of an endpoint, keys start with the endpoint ID."""
+        self.touch(endpoint_id)
+        for key in [key for key in self._entries if key[0] == endpoint_id]:
+            del self._entries[key]
+
+    def clear(self):
+        """Drop every entry, the new epoch keeps series computed before from being stored as up to date."""
+        self._entries.clear()
+        self._epoch += 1
+
+    def subscribe(self, bus):
+        bus.subscribe(InvalidationEvents.RESET.value, lambda data: self.clear())
+        bus.subscribe(InvalidationEvents.CHECK_WRITTEN.value, lambda data: self.touch(data['endpoint_id']))
+        bus.subscribe(InvalidationEvents.ENDPOINT_UPDATED.value, lambda data: self.invalidate(data['endpoint_id']))
+        bus.subscribe(InvalidationEvents.ENDPOINT_DELETED.value, lambda data: self.invalidate(data['endpoint_id']))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+CHART_CACHE = ChartCache(int(chart_config['cache_size']), int(chart_config['cache_ttl']))
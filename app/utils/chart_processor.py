@@ -1,78 +1,289 @@
+import bisect
+from functools import partial
 from datetime import timezone, datetime, timedelta
 
 from sqlalchemy.orm import Session
 
+from app.config.config import Settings
+from app.daos.log_rollup_dao import LogRollupDAO
 from app.daos.log_table_dao import LogTableDAO
-from app.schemas.endpoints_sch import EndpointLogs, BaseEndpointLogs
-from app.utils.enums import EndpointStatus, DashboardChartUnits
+from app.schemas.endpoints_sch import EndpointChartLogs, BaseEndpointLogs, EndpointLogsRollup
+from app.utils.bucketing import TimeBuckets
+from app.utils.chart_cache import CHART_CACHE
+from app.utils.downsampling import downsample
+from app.utils.invalidation_bus import INVALIDATION_BUS
+from app.utils.enums import EndpointStatus, DashboardChartUnits, ChartSources, RollupUnits, DashboardChartTypes
 from app.models import db_models as model
 
+chart_config = Settings().charts
+
+# The charts never render the response body, it is provided per point by the log detail endpoint.
+LINE_CHART_COLUMNS = ("id", "endpoint_id", "created_at", "status", "response_time")
+UPTIME_CHART_COLUMNS = ("id", "created_at", "status")
+
 
 class ChartProcessor:
     def __init__(self, db: Session):
         self.log_table_dao = LogTableDAO(db)
+        self.log_rollup_dao = LogRollupDAO(db)
+        self.cache = CHART_CACHE
+
+    @classmethod
+    def _use_rollups(cls):
+        return chart_config['source'] == ChartSources.ROLLUP.value
+
+    @classmethod
+    def _to_timestamp(cls, value: datetime):
+        return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+    @classmethod
+    def _chart_window(cls, unit: str, duration: int):
+        """Return the UTC start/end of the chart and the width of a single bucket."""
+        current_time = datetime.now()
+        if unit == DashboardChartUnits.HOURS.value:
+            rounded_time = current_time + timedelta(hours=1)
+            end_time = rounded_time.replace(minute=0, second=0, microsecond=0).astimezone(timezone.utc).replace(tzinfo=None)
+            width = timedelta(hours=1)
+        else:
+            rounded_time = current_time + timedelta(days=1)
+            end_time = rounded_time.replace(hour=0, minute=0, second=0, microsecond=0).astimezone(timezone.utc).replace(tzinfo=None)
+            width = timedelta(days=1)
+
+        return end_time - width * duration, end_time, width
+
+    @classmethod
+    def _classify_bucket(cls, bucket_start: datetime, checks: int, errors: int, last_created_at: datetime | None,
+                         last_error_at: datetime | None) -> BaseEndpointLogs:
+        """Turn the counters of a single bucket into an uptime chart point."""
+        if errors >= 3:
+            return BaseEndpointLogs(created_at=cls._to_timestamp(last_error_at), status=EndpointStatus.DEGRADED.value)
+        if errors > 0:
+            return BaseEndpointLogs(created_at=cls._to_timestamp(last_error_at), status=EndpointStatus.UNHEALTHY.value)
+        if checks:
+            return BaseEndpointLogs(created_at=cls._to_timestamp(last_created_at), status=EndpointStatus.HEALTHY.value)
+
+        return BaseEndpointLogs(created_at=cls._to_timestamp(bucket_start), status=EndpointStatus.NODATA.value)
+
+    @classmethod
+    def _downsample_line_chart(cls, points: list, max_points: int = None) -> list:
+        """Reduce the points to about max_points on response time, non-healthy points are always kept."""
+        return downsample(points, max_points,
+                          x=lambda point: point.created_at,
+                          y=lambda point: point.response_time or 0,
+                          keep=lambda point: point.status != EndpointStatus.HEALTHY.value)
+
+    @classmethod
+    def _log_marker(cls, log):
+        return (log.created_at, log.id) if log else None
 
-    async def process_line_chart(self, endpoint: model.Endpoints, unit: str, duration: int):
-        log_records = await self.log_table_dao.select_logs_from_last_hours(endpoint.log_table, unit, duration)
+    async def _latest_marker(self, endpoint: model.Endpoints):
+        return self._log_marker(await self.log_table_dao.select_latest_log(endpoint))
+
+    def _is_current(self, endpoint_id: int, entry) -> bool:
+        """While the invalidation bus is listening, an entry is up to date until a check of its endpoint is written."""
+        return INVALIDATION_BUS.listening and entry.version == self.cache.version(endpoint_id)
+
+    @classmethod
+    def _can_extend(cls, entry) -> bool:
+        """Whether an outdated entry may be compared with the latest log and extended with the logs after its marker.
+
+        While the invalidation bus is listening an outdated entry is recomputed instead: the checks written since may
+        be late ones, older than the marker, which neither the marker nor an extension can see. Without the bus the
+        marker is all there is to go on, the cache TTL bounds the effect of late rows.
+        """
+        return entry is not None and entry.marker is not None and not INVALIDATION_BUS.listening
+
+    async def _cached(self, key: tuple, endpoint: model.Endpoints, compute):
+        """Return the cached series while no check was written since it was computed, recompute it otherwise."""
+        entry = self.cache.get(key)
+        if entry and self._is_current(endpoint.id, entry):
+            return entry.value
+
+        version = self.cache.version(endpoint.id)
+        marker = await self._latest_marker(endpoint)
+        if self._can_extend(entry) and entry.marker == marker:
+            entry.version = version
+            return entry.value
+
+        value = await compute()
+        self.cache.put(key, marker, value, version=version)
+        return value
+
+    async def process_line_chart(self, endpoint: model.Endpoints, unit: str, duration: int, max_points: int = None):
+        if self._use_rollups() and unit == DashboardChartUnits.DAY.value:
+            compute = partial(self._process_line_chart_from_rollups, endpoint, duration)
+            if self.cache.enabled:
+                key = (endpoint.id, DashboardChartTypes.LINE_CHART.value, ChartSources.ROLLUP.value, duration)
+                points = await self._cached(key, endpoint, compute)
+            else:
+                points = await compute()
+        else:
+            points = await self._process_line_chart_from_logs(endpoint, unit, duration)
+
+        return self._downsample_line_chart(points, max_points)
+
+    @classmethod
+    def _line_chart_start(cls, unit: str, duration: int) -> int:
+        """Return the timestamp of the first point of a line chart, as selected by the DAO."""
+        if unit == DashboardChartUnits.HOURS.value:
+            return cls._to_timestamp(datetime.now() - timedelta(hours=duration))
+        return cls._to_timestamp(datetime.now() - timedelta(days=duration))
+
+    @classmethod
+    def _to_chart_logs(cls, log_records) -> list:
         return [
-            EndpointLogs(
+            EndpointChartLogs(
                 id=log.id,
                 endpoint_id=log.endpoint_id,
-                response=log.response,
                 response_time=log.response_time,
                 status=log.status,
                 created_at=int(log.created_at.replace(tzinfo=timezone.utc).timestamp())
             ) for log in log_records
         ]
 
-    async def process_uptime_chart(self, endpoint: model.Endpoints, unit: str, duration: int):
-        hourly_logs = []
-        logs = await self.log_table_dao.select_logs_from_last_hours(endpoint.log_table, unit, duration)
+    async def _process_line_chart_from_logs(self, endpoint: model.Endpoints, unit: str, duration: int):
+        """Plot every check of the interval, a cached series is slid forward and only recomputed when outdated.
 
-        current_time = datetime.now()
-        if unit == DashboardChartUnits.HOURS.value:
-            rounded_time = current_time + timedelta(hours=1)
-            end_time = rounded_time.replace(minute=0, second=0, microsecond=0).astimezone(timezone.utc).replace(tzinfo=None)
-            start_time = end_time - timedelta(hours=duration)
+        Without the invalidation bus an outdated series is extended with the checks after its marker instead.
+        """
+        if unit not in (DashboardChartUnits.HOURS.value, DashboardChartUnits.DAY.value):
+            return []
+        if not self.cache.enabled:
+            return self._to_chart_logs(await self.log_table_dao.select_logs_from_last_hours(
+                endpoint, unit, duration, LINE_CHART_COLUMNS))
+
+        key = (endpoint.id, DashboardChartTypes.LINE_CHART.value, unit, duration)
+        entry = self.cache.get(key)
+        if entry and self._is_current(endpoint.id, entry):
+            points = entry.value
+        elif self._can_extend(entry):
+            version = self.cache.version(endpoint.id)
+            marker = entry.marker
+            if marker != await self._latest_marker(endpoint):
+                log_records = await self.log_table_dao.select_logs_after(endpoint, marker, LINE_CHART_COLUMNS)
+                # Another request may have extended the entry meanwhile.
+                if entry.marker == marker:
+                    entry.value = entry.value + self._to_chart_logs(log_records)
+                    entry.marker = self._log_marker(log_records[-1]) if log_records else marker
+            entry.version = version
+            points = entry.value
         else:
-            rounded_time = current_time + timedelta(days=1)
-            end_time = rounded_time.replace(hour=0, minute=0, second=0, microsecond=0).astimezone(timezone.utc).replace(tzinfo=None)
-            start_time = end_time - timedelta(days=duration)
+            version = self.cache.version(endpoint.id)
+            log_records = await self.log_table_dao.select_logs_from_last_hours(endpoint, unit, duration,
+                                                                               LINE_CHART_COLUMNS)
+            points = self._to_chart_logs(log_records)
+            self.cache.put(key, self._log_marker(log_records[-1]) if log_records else None, points, version=version)
+            entry = self.cache.get(key)
 
-        for d in range(duration):
-            if unit == DashboardChartUnits.HOURS.value:
-                current_hour_start = start_time + timedelta(hours=d)
-                next_hour_start = current_hour_start + timedelta(hours=1)
-            else:
-                current_hour_start = start_time + timedelta(days=d)
-                next_hour_start = current_hour_start + timedelta(days=1)
-
-            if next_hour_start > end_time:
-                next_hour_start = end_time
-
-            logs_current_hour = [log._asdict() for log in logs
-                                 if current_hour_start <= log._asdict()['created_at'] < next_hour_start]
-            error_log = [log for log in logs_current_hour if log['status'] != 'healthy']
-
-            if len(error_log) >= 3:
-                hourly_log = BaseEndpointLogs(
-                    created_at=int(max(error_log, key=lambda log: log['created_at'])['created_at']
-                                   .replace(tzinfo=timezone.utc).timestamp()),
-                    status=EndpointStatus.DEGRADED.value)
-            elif 3 > len(error_log) > 0:
-                hourly_log = BaseEndpointLogs(
-                    created_at=int(max(error_log, key=lambda log: log['created_at'])['created_at']
-                                   .replace(tzinfo=timezone.utc).timestamp()),
-                    status=EndpointStatus.UNHEALTHY.value)
-            elif logs_current_hour:
-                hourly_log = BaseEndpointLogs(
-                    created_at=int(max(logs_current_hour, key=lambda log: log['created_at'])['created_at']
-                                   .replace(tzinfo=timezone.utc).timestamp()),
-                    status=EndpointStatus.HEALTHY.value)
-            else:
-                hourly_log = BaseEndpointLogs(
-                    created_at=int(current_hour_start.replace(tzinfo=timezone.utc).timestamp()),
-                    status=EndpointStatus.NODATA.value)
+        start = bisect.bisect_left(points, self._line_chart_start(unit, duration), key=lambda point: point.created_at)
+        if start and entry:
+            entry.value = points = points[start:]
+        return points
+
+    async def _process_line_chart_from_rollups(self, endpoint: model.Endpoints, duration: int):
+        """Plot one point per hour (average response time) instead of every single check."""
+        date_from = (datetime.now(timezone.utc) - timedelta(days=duration)).replace(tzinfo=None)
+        date_from = date_from.replace(minute=0, second=0, microsecond=0)
+        rollups = await self.log_rollup_dao.select_rollups(endpoint.id, RollupUnits.HOUR.value, date_from)
+
+        return [
+            EndpointLogsRollup(
+                status=self._classify_bucket(rollup.bucket, rollup.checks, rollup.errors,
+                                             rollup.last_created_at, rollup.last_error_at).status,
+                created_at=self._to_timestamp(rollup.bucket),
+                checks=rollup.checks,
+                errors=rollup.errors,
+                response_time=rollup.sum_response_time // rollup.timed_checks if rollup.timed_checks else None,
+                min_response_time=rollup.min_response_time,
+                max_response_time=rollup.max_response_time
+            ) for rollup in rollups
+        ]
+
+    async def process_uptime_chart(self, endpoint: model.Endpoints, unit: str, duration: int):
+        if self._use_rollups():
+            compute = partial(self._process_uptime_chart_from_rollups, endpoint, unit, duration)
+        elif chart_config['source'] == ChartSources.SQL.value:
+            compute = partial(self._process_uptime_chart_from_sql, endpoint, unit, duration)
+        else:
+            return await self._process_uptime_chart_from_logs(endpoint, unit, duration)
+
+        if not self.cache.enabled:
+            return await compute()
+
+        start_time, _, _ = self._chart_window(unit, duration)
+        key = (endpoint.id, DashboardChartTypes.UPTIME.value, chart_config['source'], unit, duration, start_time)
+        return await self._cached(key, endpoint, compute)
+
+    async def _process_uptime_chart_from_logs(self, endpoint: model.Endpoints, unit: str, duration: int):
+        """Bucket every check of the interval, outdated buckets are recomputed, or extended with the checks after
+        their marker without the invalidation bus.
 
-            hourly_logs.append(hourly_log)
-        return hourly_logs
+        The window start is part of the cache key, a chart which slid to the next bucket is computed again.
+        """
+        start_time, _, width = self._chart_window(unit, duration)
+        key = (endpoint.id, DashboardChartTypes.UPTIME.value, ChartSources.RAW.value, unit, duration, start_time)
+        entry = self.cache.get(key) if self.cache.enabled else None
+
+        if entry and self._is_current(endpoint.id, entry):
+            return entry.value
+
+        version = self.cache.version(endpoint.id)
+        if self._can_extend(entry):
+            marker = entry.marker
+            if marker != await self._latest_marker(endpoint):
+                logs = await self.log_table_dao.select_logs_after(endpoint, marker, UPTIME_CHART_COLUMNS)
+                # Another request may have extended the entry meanwhile.
+                if entry.marker == marker:
+                    entry.state.extend(logs)
+                    entry.marker = self._log_marker(logs[-1]) if logs else marker
+                    entry.value = self._classify_buckets(entry.state)
+            entry.version = version
+            return entry.value
+
+        logs = await self.log_table_dao.select_logs_from_last_hours(endpoint, unit, duration, UPTIME_CHART_COLUMNS)
+        buckets = TimeBuckets(start_time, width, duration).extend(logs)
+        uptime = self._classify_buckets(buckets)
+        if self.cache.enabled:
+            self.cache.put(key, self._log_marker(logs[-1]) if logs else None, uptime, buckets, version)
+        return uptime
+
+    @classmethod
+    def _classify_buckets(cls, buckets: TimeBuckets) -> list:
+        return [
+            cls._classify_bucket(bucket.start, bucket.checks, bucket.errors,
+                                 bucket.last_created_at, bucket.last_error_at)
+            for bucket in buckets
+        ]
+
+    async def _process_uptime_chart_from_rollups(self, endpoint: model.Endpoints, unit: str, duration: int):
+        """Build the uptime chart from the hourly/daily rollups, one stored row per bucket.
+
+        Daily rollups are cut on UTC midnight, each of them is placed in the chart bucket it overlaps the most.
+        """
+        start_time, end_time, width = self._chart_window(unit, duration)
+        rollup_unit = RollupUnits.HOUR.value if unit == DashboardChartUnits.HOURS.value else RollupUnits.DAY.value
+        rollups = await self.log_rollup_dao.select_rollups(endpoint.id, rollup_unit, start_time - width, end_time)
+
+        buckets = [None] * duration
+        for rollup in rollups:
+            index = round((rollup.bucket - start_time) / width)
+            if 0 <= index < duration:
+                buckets[index] = rollup
+
+        return [
+            self._classify_bucket(start_time + width * index, rollup.checks, rollup.errors,
+                                  rollup.last_created_at, rollup.last_error_at)
+            if rollup else self._classify_bucket(start_time + width * index, 0, 0, None, None)
+            for index, rollup in enumerate(buckets)
+        ]
+
+    async def _process_uptime_chart_from_sql(self, endpoint: model.Endpoints, unit: str, duration: int):
+        """Build the uptime chart from buckets aggregated by the database, one returned row per bucket."""
+        start_time, _, width = self._chart_window(unit, duration)
+        buckets = await self.log_table_dao.select_uptime_buckets(endpoint, start_time, width, duration)
+
+        return [
+            self._classify_bucket(bucket.bucket, bucket.checks, bucket.errors,
+                                  bucket.last_created_at, bucket.last_error_at)
+            for bucket in buckets
+        ]
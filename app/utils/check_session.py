@@ -1,3 +1,4 @@
+import hmac
 from functools import wraps
 
 from starlette.requests import Request
@@ -5,6 +6,7 @@ from app.config.config import Settings
 from app.daos.users_dao import UserDAO
 from app.utils.enums import UserStatus, SessionAttributes, AccessLevel
 from app.utils.logger import Logger
+from app.utils.permission_cache import PERMISSION_CACHE, UserPermissions
 from app.utils.response import unauthorized, forbidden
 
 LOGGER = Logger().start_logger()
@@ -18,26 +20,27 @@ def auth_required(function_to_protect):
         if not email:
             return unauthorized()
 
-        user_dao = UserDAO()
-        user = await user_dao.get_detailed_user_info_by_email(email)
+        permissions = PERMISSION_CACHE.get(email)
+        if permissions is None:
+            generation = PERMISSION_CACHE.generation
+            user_dao = UserDAO()
+            user = await user_dao.get_detailed_user_info_by_email(email)
 
-        if not user:
-            return unauthorized()
+            if not user:
+                return unauthorized()
 
-        if user.status != UserStatus.ACTIVE.value:
-            return unauthorized()
+            permissions = UserPermissions.from_user(user)
+            PERMISSION_CACHE.put(email, permissions, generation)
 
-        endpoints_perm = {endpoint.endpoint.id: {"permissions": endpoint.permissions}
-                          for endpoint in user.endpoints if endpoint.endpoint}
-        notifications = [notification.id for notification in user.notifications]
-        dashboards = [dashboard.id for dashboard in user.dashboards]
+        if permissions.status != UserStatus.ACTIVE.value:
+            return unauthorized()
 
-        request.session[SessionAttributes.USER_INFO.value] = user.as_dict()
-        request.session[SessionAttributes.USER_ACCESS_LEVEL.value] = user.access_level
-        request.session[SessionAttributes.USER_ID.value] = user.id
-        request.session[SessionAttributes.USER_ENDPOINTS_PERM.value] = endpoints_perm
-        request.session[SessionAttributes.USER_NOTIFICATIONS.value] = notifications
-        request.session[SessionAttributes.USER_DASHBOARDS.value] = dashboards
+        request.session[SessionAttributes.USER_INFO.value] = permissions.user_info
+        request.session[SessionAttributes.USER_ACCESS_LEVEL.value] = permissions.access_level
+        request.session[SessionAttributes.USER_ID.value] = permissions.user_id
+        request.session[SessionAttributes.USER_ENDPOINTS_PERM.value] = permissions.endpoints_perm
+        request.session[SessionAttributes.USER_NOTIFICATIONS.value] = permissions.notifications
+        request.session[SessionAttributes.USER_DASHBOARDS.value] = permissions.dashboards
 
         return await function_to_protect(request, *args, **kwargs)
 
@@ -54,3 +57,18 @@ def admin_access_required(function_to_protect):
 
     return wrapper
 
+
+def ingest_token_required(function_to_protect):
+    """Authenticate the external probers by one of the configured bearer tokens, without a session."""
+    @wraps(function_to_protect)
+    async def wrapper(request: Request, *args, **kwargs):
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        tokens = [allowed.strip() for allowed in config.ingest['tokens'].split(",") if allowed.strip()]
+        if scheme.lower() != "bearer" or not token.strip() or \
+                not any(hmac.compare_digest(token.strip().encode(), allowed.encode()) for allowed in tokens):
+            return unauthorized()
+
+        return await function_to_protect(request, *args, **kwargs)
+
+    return wrapper
+
@@ -0,0 +1,222 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import asyncpg
+
+from app.daos.endpoints_dao import EndpointDAO
+from app.daos.log_table_dao import LogTableDAO
+from app.models import db_models as model
+from app.utils.logger import Logger
+
+LOGGER = Logger().start_logger()
+
+METRICS_INTERVAL = 60
+RETRY_DELAY = 1
+# SQLSTATE classes of the errors worth retrying: connection failures, operator intervention (e.g. shutdown),
+# insufficient resources and transaction rollbacks (serialization failures, deadlocks).
+TRANSIENT_SQLSTATE_CLASSES = ("08", "57", "53", "40")
+
+
+def is_rejected(error: BaseException) -> bool:
+    """Whether the database answered a write with a permanent error, rather than being unreachable."""
+    while error is not None:
+        if isinstance(error, asyncpg.PostgresError):
+            return not (error.sqlstate or "").startswith(TRANSIENT_SQLSTATE_CLASSES)
+        error = getattr(error, "orig", None) or error.__cause__
+    return False
+
+
+class CheckResult:
+    __slots__ = ('endpoint', 'created_at', 'status', 'response', 'response_time')
+
+    def __init__(self, endpoint: model.Endpoints, created_at: datetime, status: str, response: dict,
+                 response_time: int | None):
+        self.endpoint = endpoint
+        self.created_at = created_at
+        self.status = status
+        self.response = response
+        self.response_time = response_time
+
+    def as_log(self) -> tuple:
+        return self.endpoint, self.created_at, self.status, self.response, self.response_time
+
+
+class CheckWriterMetrics:
+    """Flush statistics of the current reporting window."""
+
+    def __init__(self):
+        self.flushes = 0
+        self.rows = 0
+        self.dropped_rows = 0
+        self.max_flush_rows = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.statuses = 0
+        self.changed_statuses = 0
+
+    def record_flush(self, rows: int, seconds: float):
+        self.flushes += 1
+        self.rows += rows
+        self.max_flush_rows = max(self.max_flush_rows, rows)
+        self.flush_seconds += seconds
+        self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "flushes": self.flushes,
+            "rows": self.rows,
+            "dropped_rows": self.dropped_rows,
+            "avg_flush_rows": self.rows // self.flushes if self.flushes else 0,
+            "max_flush_rows": self.max_flush_rows,
+            "avg_flush_ms": round(self.flush_seconds * 1000 / self.flushes, 1) if self.flushes else 0,
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 1),
+            "blocked_ms": round(self.blocked_seconds * 1000, 1),
+            "statuses": self.statuses,
+            "changed_statuses": self.changed_statuses
+        }
+
+
+class CheckWriter:
+    """Buffer check results and write them in batches, one transaction and one COPY per log table.
+
+    The buffer is flushed when it holds `batch_rows` results or `batch_delay` seconds after the previous flush. Once
+    `max_rows` results are waiting, writers block until a flush made room, so a slow database slows the checks down
+    instead of growing the buffer without bounds.
+
+    The latest status of every endpoint written by a flush is then applied with a single statement, so the current
+    statuses are updated once per flush instead of once per check.
+    """
+
+    def __init__(self, batch_rows: int, batch_delay: float, max_rows: int):
+        self.batch_rows = batch_rows
+        self.batch_delay = batch_delay
+        self.max_rows = max(max_rows, batch_rows)
+        self.metrics = CheckWriterMetrics()
+        self._buffer: List[CheckResult] = []
+        self._statuses: Dict[int, Tuple[str, datetime]] = {}
+        self._flush_requested = asyncio.Event()
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+
+    def __len__(self):
+        return len(self._buffer)
+
+    async def write(self, result: CheckResult):
+        if len(self._buffer) >= self.max_rows:
+            blocked = time.perf_counter()
+            while len(self._buffer) >= self.max_rows:
+                self._has_room.clear()
+                await self._has_room.wait()
+            self.metrics.blocked_seconds += time.perf_counter() - blocked
+
+        self._buffer.append(result)
+        if len(self._buffer) >= self.batch_rows:
+            self._flush_requested.set()
+
+    async def _write_batch(self, batch: List[CheckResult]) -> Tuple[List[CheckResult], List[CheckResult]]:
+        """Write a batch and return the written results and the results to retry.
+
+        Results are only retried while the database cannot be reached, those it rejected are dropped.
+        """
+        try:
+            await LogTableDAO().copy_logs([result.as_log() for result in batch])
+            return batch, []
+        except Exception as e:
+            if not is_rejected(e):
+                LOGGER.warning(f"Writing {len(batch)} check results failed, keeping them for the next flush: {e}")
+                return [], batch
+            LOGGER.warning(f"Writing {len(batch)} check results was rejected, retrying per endpoint: {e}")
+
+        # Isolate the endpoints whose table cannot be written (e.g. deleted meanwhile) from the others.
+        by_endpoint = defaultdict(list)
+        for result in batch:
+            by_endpoint[result.endpoint.id].append(result)
+
+        written, retry = [], []
+        for endpoint_id, results in by_endpoint.items():
+            try:
+                await LogTableDAO().copy_logs([result.as_log() for result in results])
+                written.extend(results)
+            except Exception as e:
+                if not is_rejected(e):
+                    retry.extend(results)
+                    continue
+                LOGGER.error(f"Writing {len(results)} check results of endpoint {endpoint_id} failed: {e}")
+                self.metrics.dropped_rows += len(results)
+
+        return written, retry
+
+    def _collect_statuses(self, batch: List[CheckResult]):
+        """Keep the status of the most recent check of every endpoint, results may arrive out of order."""
+        for result in batch:
+            latest = self._statuses.get(result.endpoint.id)
+            if latest is None or latest[1] <= result.created_at:
+                self._statuses[result.endpoint.id] = (result.status, result.created_at)
+
+    async def _write_statuses(self):
+        if not self._statuses:
+            return
+
+        statuses, self._statuses = self._statuses, {}
+        try:
+            changed = await EndpointDAO().update_statuses(statuses)
+            self.metrics.statuses += len(statuses)
+            self.metrics.changed_statuses += changed
+        except Exception as e:
+            LOGGER.error(f"Updating the status of {len(statuses)} endpoints failed: {e}")
+            # Only flushes change the pending statuses, none was added meanwhile: retry them with the next flush.
+            self._statuses = statuses
+
+    async def flush(self) -> bool:
+        """Write the buffered results and the statuses, return False when the results were kept to be retried."""
+        if not self._buffer:
+            await self._write_statuses()
+            return True
+
+        batch, self._buffer = self._buffer, []
+        started = time.perf_counter()
+        written, retry = await self._write_batch(batch)
+        if retry:
+            # The oldest results are dropped when the retried ones do not fit in the buffer anymore.
+            pending = retry + self._buffer
+            self.metrics.dropped_rows += max(len(pending) - self.max_rows, 0)
+            self._buffer = pending[-self.max_rows:]
+        else:
+            self.metrics.record_flush(len(batch), time.perf_counter() - started)
+
+        # Only the checks which were logged change the statuses.
+        self._collect_statuses(written)
+        await self._write_statuses()
+
+        if len(self._buffer) < self.max_rows:
+            self._has_room.set()
+        return not retry
+
+    def _report(self):
+        metrics = self.metrics.as_dict()
+        self.metrics = CheckWriterMetrics()
+        if metrics["flushes"] or metrics["dropped_rows"] or metrics["statuses"]:
+            LOGGER.info(f"Check writer: {', '.join(f'{key}={value}' for key, value in metrics.items())}, "
+                        f"buffered={len(self._buffer)}")
+
+    async def run(self):
+        reported = time.monotonic()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), self.batch_delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_requested.clear()
+
+                if not await self.flush():
+                    await asyncio.sleep(RETRY_DELAY)
+                if time.monotonic() - reported >= METRICS_INTERVAL:
+                    self._report()
+                    reported = time.monotonic()
+        finally:
+            await self.flush()
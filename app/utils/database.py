@@ -1,3 +1,8 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import event, text
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
@@ -23,10 +28,90 @@ SessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 Base = declarative_base()
 
 
+UNIT_OF_WORK = "unit_of_work"
+AFTER_COMMIT = "after_commit"
+QUERY_SEMAPHORE = "query_semaphore"
+
+
 async def get_db():
-    db = SessionLocal()
-    try:
+    """Request scoped unit of work: a single connection and transaction, committed once the request succeeded.
+
+    The session joins the transaction through savepoints, so a DAO commit only releases its savepoint and a DAO
+    rollback only undoes its own work. DAOs keep the session open (see session_scope).
+    """
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+        db.info[UNIT_OF_WORK] = True
+        db.info[AFTER_COMMIT] = []
+        try:
+            yield db
+            await db.close()
+            await transaction.commit()
+        except Exception as e:
+            await db.close()
+            await transaction.rollback()
+            raise e
+
+    for callback in db.info[AFTER_COMMIT]:
+        callback()
+
+
+@asynccontextmanager
+async def session_scope(db: AsyncSession):
+    """Scope of a single DAO call, a standalone session is closed at the end while a unit of work is kept open."""
+    if db.info.get(UNIT_OF_WORK):
         yield db
-    finally:
-        await db.close()
+        return
+
+    async with db:
+        yield db
+
+
+@asynccontextmanager
+async def try_advisory_lock(name: str):
+    """Try to take a session level advisory lock for the duration of the block, yield whether it was acquired.
+
+    The lock is held by a dedicated connection, so it covers the work of every session used inside the block. It is
+    released at the end of the block, or by the server if the connection is lost.
+    """
+    async with engine.connect() as connection:
+        acquired = (await connection.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"),
+                                             {"name": name})).scalar()
+        # Do not stay idle in transaction while the block runs, the lock outlives the transaction.
+        await connection.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await connection.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": name})
+                await connection.commit()
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], None]):
+    """Run a callback once the pending changes of the session are committed."""
+    if db.info.get(UNIT_OF_WORK):
+        db.info[AFTER_COMMIT].append(callback)
+        return
+
+    event.listen(db.sync_session, "after_commit", lambda session: callback(), once=True)
+
+
+async def gather_queries(db: AsyncSession | None, *queries: Callable[[AsyncSession], Awaitable]) -> List:
+    """Run independent read queries concurrently, each one on its own session and pooled connection.
+
+    The queries of a request (identified by its db session) share a semaphore, so a single request never holds more
+    than `query_concurrency` pooled connections for them, on top of the connection of its own unit of work. They do
+    not see the uncommitted changes of the request's unit of work.
+    """
+    if db is None:
+        semaphore = asyncio.Semaphore(int(config.get('query_concurrency', 4)))
+    else:
+        semaphore = db.info.setdefault(QUERY_SEMAPHORE, asyncio.Semaphore(int(config.get('query_concurrency', 4))))
+
+    async def run(query: Callable[[AsyncSession], Awaitable]):
+        async with semaphore:
+            async with SessionLocal() as session:
+                return await query(session)
 
+    return list(await asyncio.gather(*(run(query) for query in queries)))
@@ -0,0 +1,54 @@
+from typing import Callable, List, Sequence, TypeVar
+
+T = TypeVar('T')
+
+MIN_POINTS = 3
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets, return the indices of the points to keep (first and last included).
+
+    The points in between are split into threshold - 2 buckets, from every bucket the point forming the largest
+    triangle with the previously kept point and the average of the next bucket is kept.
+    """
+    count = len(xs)
+    if threshold >= count:
+        return list(range(count))
+    if threshold < MIN_POINTS:
+        return [0, count - 1][:max(threshold, 0)]
+
+    every = (count - 2) / (threshold - 2)
+    selected = [0]
+    previous = 0
+    for index in range(threshold - 2):
+        average_start = int((index + 1) * every) + 1
+        average_end = min(int((index + 2) * every) + 1, count)
+        average_size = average_end - average_start
+        average_x = sum(xs[average_start:average_end]) / average_size
+        average_y = sum(ys[average_start:average_end]) / average_size
+
+        previous_x, previous_y = xs[previous], ys[previous]
+        max_area = -1.0
+        for candidate in range(int(index * every) + 1, int((index + 1) * every) + 1):
+            area = abs((previous_x - average_x) * (ys[candidate] - previous_y)
+                       - (previous_x - xs[candidate]) * (average_y - previous_y))
+            if area > max_area:
+                max_area = area
+                previous = candidate
+        selected.append(previous)
+
+    selected.append(count - 1)
+    return selected
+
+
+def downsample(points: Sequence[T], max_points: int, x: Callable[[T], float], y: Callable[[T], float],
+               keep: Callable[[T], bool] = None) -> List[T]:
+    """Reduce points (ordered by x) to about max_points with LTTB, the points matching keep are never dropped."""
+    if not max_points or len(points) <= max_points:
+        return list(points)
+
+    forced = {index for index, point in enumerate(points) if keep(point)} if keep else set()
+    budget = max(max_points - len(forced), MIN_POINTS)
+    selected = set(lttb([x(point) for point in points], [y(point) for point in points], budget)) | forced
+
+    return [points[index] for index in sorted(selected)]
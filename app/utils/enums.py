@@ -62,3 +62,60 @@ class SessionAttributes(Enum):
     USER_NOTIFICATIONS = 'user_notifications'
     USER_DASHBOARDS = 'user_dashboards'
 
+
+
+class ChartSources(Enum):
+    ROLLUP = 'rollup'
+    SQL = 'sql'
+    RAW = 'raw'
+
+
+class RollupUnits(Enum):
+    HOUR = 'hour'
+    DAY = 'day'
+
+
+class LogStorages(Enum):
+    TABLES = 'tables'
+    MIGRATING = 'migrating'
+    PARTITIONED = 'partitioned'
+
+
+class PartitionIntervals(Enum):
+    DAY = 'day'
+    WEEK = 'week'
+
+
+class LogMigrationStatus(Enum):
+    COPYING = 'copying'
+    DONE = 'done'
+
+
+class LogExportFormats(Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+
+class EndpointSearchModes(Enum):
+    ILIKE = 'ilike'
+    TRIGRAM = 'trigram'
+
+
+class CountModes(Enum):
+    EXACT = 'exact'
+    ESTIMATE = 'estimate'
+    NONE = 'none'
+
+
+class InvalidationEvents(Enum):
+    RESET = 'reset'
+    CHECK_WRITTEN = 'check_written'
+    ENDPOINT_UPDATED = 'endpoint_updated'
+    ENDPOINT_DELETED = 'endpoint_deleted'
+    PERMISSIONS_CHANGED = 'permissions_changed'
+
+
+class SessionBackends(Enum):
+    COOKIE = 'cookie'
+    MEMORY = 'memory'
+    POSTGRES = 'postgres'
@@ -0,0 +1,90 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.utils.database import SQLALCHEMY_DATABASE_URL, after_commit
+from app.utils.enums import InvalidationEvents
+from app.utils.logger import Logger
+
+LOGGER = Logger().start_logger()
+
+INVALIDATION_CHANNEL = "status_pulse_invalidation"
+RECONNECT_DELAY = 5
+
+
+async def publish(db: Session, event: str, **data):
+    """Queue a change event in the current transaction, Postgres delivers it to the listeners on commit.
+
+    The event is also dispatched in this worker right after the commit, without waiting for the notification.
+    """
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                     {"channel": INVALIDATION_CHANNEL, "payload": json.dumps({"event": event, **data})})
+    after_commit(db, lambda: INVALIDATION_BUS.dispatch(event, dict(data)))
+
+
+class InvalidationBus:
+    """Deliver the change events published by any worker or node to the in-process caches of this worker.
+
+    Every worker listens on a dedicated asyncpg connection. Events published while it was not listening are lost,
+    so a reset event is dispatched whenever the connection is (re)established or lost, and caches must not rely on
+    events while `listening` is false.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[dict], None]]] = defaultdict(list)
+        self.listening = False
+
+    def subscribe(self, event: str, handler: Callable[[dict], None]):
+        self._handlers[event].append(handler)
+
+    def dispatch(self, event: str, data: dict = None):
+        for handler in self._handlers.get(event, []):
+            try:
+                handler(data or {})
+            except Exception as e:
+                LOGGER.error(f"Invalidation handler of {event} failed: {e}")
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            LOGGER.warning(f"Ignoring malformed invalidation event: {payload}")
+            return
+        self.dispatch(data.pop("event", None), data)
+
+    def _set_listening(self, listening: bool):
+        self.listening = listening
+        self.dispatch(InvalidationEvents.RESET.value)
+
+    async def run(self):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(SQLALCHEMY_DATABASE_URL)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(INVALIDATION_CHANNEL, self._on_notification)
+
+                self._set_listening(True)
+                LOGGER.info(f"Listening to invalidation events on {INVALIDATION_CHANNEL}.")
+                await closed.wait()
+                LOGGER.warning("Invalidation listener connection closed.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                LOGGER.warning(f"Invalidation listener failed: {e}")
+            finally:
+                if self.listening:
+                    self._set_listening(False)
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+INVALIDATION_BUS = InvalidationBus()
@@ -0,0 +1,85 @@
+import time
+from typing import Dict, List
+
+from app.config.config import Settings
+from app.models import db_models as model
+from app.utils.enums import InvalidationEvents
+
+config = Settings().app
+
+
+class UserPermissions:
+    __slots__ = ('user_info', 'user_id', 'status', 'access_level', 'endpoints_perm', 'notifications', 'dashboards')
+
+    def __init__(self, user_info: dict, user_id: int, status: str, access_level: str, endpoints_perm: Dict[int, dict],
+                 notifications: List[int], dashboards: List[int]):
+        self.user_info = user_info
+        self.user_id = user_id
+        self.status = status
+        self.access_level = access_level
+        self.endpoints_perm = endpoints_perm
+        self.notifications = notifications
+        self.dashboards = dashboards
+
+    @classmethod
+    def from_user(cls, user: model.Users) -> "UserPermissions":
+        return cls(
+            user_info=user.as_dict(),
+            user_id=user.id,
+            status=user.status,
+            access_level=user.access_level,
+            endpoints_perm={endpoint.endpoint.id: {"permissions": endpoint.permissions}
+                            for endpoint in user.endpoints if endpoint.endpoint},
+            notifications=[notification.id for notification in user.notifications],
+            dashboards=[dashboard.id for dashboard in user.dashboards]
+        )
+
+
+class PermissionCache:
+    """Permissions of the authenticated users by email, kept for ttl seconds or until an invalidation event.
+
+    Every invalidation starts a new generation, permissions loaded during an older generation are not stored, so a
+    load racing with an assignment change cannot put stale permissions back.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.generation = 0
+        self._entries: Dict[str, tuple] = {}
+
+    def get(self, email: str) -> UserPermissions | None:
+        entry = self._entries.get(email)
+        if entry is None:
+            return None
+        permissions, expires = entry
+        if time.monotonic() >= expires:
+            self._entries.pop(email, None)
+            return None
+        return permissions
+
+    def put(self, email: str, permissions: UserPermissions, generation: int):
+        if self.ttl > 0 and generation == self.generation:
+            self._entries[email] = (permissions, time.monotonic() + self.ttl)
+
+    def invalidate_user(self, user_id: int):
+        self.generation += 1
+        for email in [email for email, (permissions, _) in self._entries.items() if permissions.user_id == user_id]:
+            del self._entries[email]
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def _on_permissions_changed(self, data: dict):
+        if data.get('user_id') is None:
+            self.clear()
+        else:
+            self.invalidate_user(data['user_id'])
+
+    def subscribe(self, bus):
+        bus.subscribe(InvalidationEvents.RESET.value, lambda data: self.clear())
+        bus.subscribe(InvalidationEvents.PERMISSIONS_CHANGED.value, self._on_permissions_changed)
+        bus.subscribe(InvalidationEvents.ENDPOINT_DELETED.value, lambda data: self.clear())
+
+
+PERMISSION_CACHE = PermissionCache(int(config.get('auth_cache_ttl', 60)))
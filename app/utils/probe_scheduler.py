@@ -0,0 +1,84 @@
+import asyncio
+import heapq
+import itertools
+from typing import Dict, List, Tuple
+
+from croniter import croniter
+
+
+class ProbeScheduler:
+    """Next run of every probed endpoint, kept in a single heap instead of one sleeping task per endpoint.
+
+    Cron expressions are evaluated in UTC. A rescheduled or removed endpoint leaves its previous heap entry behind, the
+    entry is dropped when it reaches the top because its generation no longer matches.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, int]] = []
+        self._entries: Dict[int, Tuple[str, int]] = {}
+        self._generations = itertools.count()
+        self.changed = asyncio.Event()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, endpoint_id: int):
+        return endpoint_id in self._entries
+
+    @classmethod
+    def _next_run(cls, cron: str, after: float) -> float:
+        return croniter(cron, after).get_next(float)
+
+    def schedule(self, endpoint_id: int, cron: str, now: float):
+        """Schedule an endpoint, an endpoint already scheduled with the same cron keeps its next run."""
+        entry = self._entries.get(endpoint_id)
+        if entry and entry[0] == cron:
+            return
+
+        generation = next(self._generations)
+        self._entries[endpoint_id] = (cron, generation)
+        heapq.heappush(self._heap, (self._next_run(cron, now), generation, endpoint_id))
+        self.changed.set()
+
+    def remove(self, endpoint_id: int):
+        self._entries.pop(endpoint_id, None)
+
+    def endpoint_ids(self) -> List[int]:
+        return list(self._entries)
+
+    def _drop_stale(self):
+        while self._heap:
+            _, generation, endpoint_id = self._heap[0]
+            entry = self._entries.get(endpoint_id)
+            if entry is not None and entry[1] == generation:
+                return
+            heapq.heappop(self._heap)
+
+    def next_run(self) -> float | None:
+        """Timestamp of the earliest run, None when nothing is scheduled."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[int]:
+        """Pop the endpoints due at `now` and schedule their next run.
+
+        The next run is computed from `now`, so runs missed while the prober was behind are skipped, not replayed.
+        """
+        due = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+
+            _, generation, endpoint_id = heapq.heappop(self._heap)
+            cron = self._entries[endpoint_id][0]
+            heapq.heappush(self._heap, (self._next_run(cron, now), generation, endpoint_id))
+            due.append(endpoint_id)
+
+    async def wait(self, timeout: float | None):
+        """Sleep until the timeout or until the schedule changed."""
+        self.changed.clear()
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.config import Settings
+from app.daos.sessions_dao import SessionDAO
+from app.utils.enums import SessionAttributes, SessionBackends
+from app.utils.logger import Logger
+
+LOGGER = Logger().start_logger()
+config = Settings().app
+
+PURGE_INTERVAL = 3600
+
+# Resolved on every request by auth_required (from the permission cache), they are never stored with the session.
+TRANSIENT_ATTRIBUTES = frozenset({
+    SessionAttributes.USER_INFO.value,
+    SessionAttributes.USER_ACCESS_LEVEL.value,
+    SessionAttributes.USER_ID.value,
+    SessionAttributes.USER_ENDPOINTS_PERM.value,
+    SessionAttributes.USER_NOTIFICATIONS.value,
+    SessionAttributes.USER_DASHBOARDS.value
+})
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class MemorySessionStore:
+    """Sessions kept by the worker itself, a stand-in for local development with a single worker."""
+
+    def __init__(self):
+        self._sessions: Dict[str, Tuple[dict, datetime]] = {}
+
+    async def load(self, session_id: str) -> Tuple[dict, datetime] | None:
+        session = self._sessions.get(session_id)
+        if session and session[1] <= _utcnow():
+            del self._sessions[session_id]
+            return None
+        return session
+
+    async def save(self, session_id: str, data: dict, expires_at: datetime):
+        self._sessions[session_id] = (data, expires_at)
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def purge(self) -> int:
+        now = _utcnow()
+        expired = [session_id for session_id, (_, expires_at) in self._sessions.items() if expires_at <= now]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return len(expired)
+
+
+class PostgresSessionStore:
+    """Sessions shared by all workers and nodes, kept in the unlogged config.sessions table."""
+
+    async def load(self, session_id: str) -> Tuple[dict, datetime] | None:
+        session = await SessionDAO().get(session_id, _utcnow())
+        return (session.data or {}, session.expires_at) if session else None
+
+    async def save(self, session_id: str, data: dict, expires_at: datetime):
+        await SessionDAO().upsert(session_id, data, expires_at)
+
+    async def delete(self, session_id: str):
+        await SessionDAO().delete(session_id)
+
+    async def purge(self) -> int:
+        return await SessionDAO().delete_expired(_utcnow())
+
+
+def create_session_store(backend: str):
+    if backend == SessionBackends.MEMORY.value:
+        return MemorySessionStore()
+    if backend == SessionBackends.POSTGRES.value:
+        return PostgresSessionStore()
+    return None
+
+
+async def purge_sessions(store):
+    while True:
+        await asyncio.sleep(PURGE_INTERVAL)
+        try:
+            purged = await store.purge()
+            if purged:
+                LOGGER.info(f"Purged {purged} expired sessions.")
+        except Exception as e:
+            LOGGER.error(f"Session purge failed: {e}")
+
+
+class ServerSessionMiddleware:
+    """Drop-in replacement of starlette's SessionMiddleware keeping the session data on the server side.
+
+    The cookie only carries a random session ID. The data is written back only when it changed (or when half of its
+    lifetime passed), the transient attributes are left out, and the ID is rotated whenever the logged-in user changes.
+    """
+
+    def __init__(self, app: ASGIApp, store, session_cookie: str = "session", max_age: int = 14 * 24 * 60 * 60,
+                 path: str = "/", same_site: str = "lax", https_only: bool = False):
+        self.app = app
+        self.store = store
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.path = path
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    @classmethod
+    def _persistent(cls, session: dict) -> dict:
+        return {key: value for key, value in session.items() if key not in TRANSIENT_ATTRIBUTES}
+
+    @classmethod
+    def _snapshot(cls, data: dict) -> str:
+        return json.dumps(data, sort_keys=True, default=str)
+
+    def _cookie(self, value: str, max_age: int) -> str:
+        return f"{self.session_cookie}={value}; path={self.path}; Max-Age={max_age}; {self.security_flags}"
+
+    async def _delete(self, session_id: str):
+        """Delete a session, a failure is logged only: the stored session expires on its own."""
+        try:
+            await self.store.delete(session_id)
+        except Exception as e:
+            LOGGER.error(f"Unable to delete session: {e}")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        session_id = HTTPConnection(scope).cookies.get(self.session_cookie)
+        loaded = None
+        if session_id:
+            try:
+                loaded = await self.store.load(session_id)
+            except Exception as e:
+                LOGGER.error(f"Unable to load session: {e}")
+
+        data, expires_at = loaded if loaded else ({}, None)
+        if not loaded:
+            session_id = None
+        snapshot = self._snapshot(data)
+        user_name = data.get(SessionAttributes.USER_NAME.value)
+        scope["session"] = dict(data)
+
+        async def send_wrapper(message: Message):
+            nonlocal session_id
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                persistent = self._persistent(scope["session"])
+
+                if persistent:
+                    rotate = persistent.get(SessionAttributes.USER_NAME.value) != user_name
+                    refresh = expires_at is None or expires_at - _utcnow() < timedelta(seconds=self.max_age / 2)
+                    if session_id is None or rotate or refresh or self._snapshot(persistent) != snapshot:
+                        if session_id and rotate:
+                            await self._delete(session_id)
+                        if session_id is None or rotate:
+                            session_id = secrets.token_urlsafe(32)
+                        try:
+                            await self.store.save(session_id, persistent, _utcnow() + timedelta(seconds=self.max_age))
+                            headers.append("Set-Cookie", self._cookie(session_id, self.max_age))
+                        except Exception as e:
+                            # The response is sent anyway, the client keeps its previous cookie.
+                            LOGGER.error(f"Unable to save session: {e}")
+                elif session_id:
+                    await self._delete(session_id)
+                    headers.append("Set-Cookie", self._cookie("null", 0))
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+SESSION_STORE = create_session_store(config['session_backend'])
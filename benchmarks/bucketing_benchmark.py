@@ -0,0 +1,62 @@
+"""Throughput of the uptime chart bucketing on a 31 days / 1 minute cron sized input.
+
+Run from the repository root with: python -m benchmarks.bucketing_benchmark
+"""
+import random
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from app.utils.bucketing import TimeBuckets
+
+Log = namedtuple('Log', ['created_at', 'status', 'response_time'])
+
+ROWS = 50000
+BUCKETS = 72
+ROUNDS = 5
+
+
+def generate_logs(start_time: datetime, end_time: datetime, rows: int):
+    step = (end_time - start_time) / rows
+    return [Log(start_time + step * index, 'healthy' if random.random() > 0.01 else 'unhealthy',
+                random.randint(20, 800))
+            for index in range(rows)]
+
+
+def legacy_bucketing(logs, start_time: datetime, width: timedelta, count: int):
+    """The per-bucket rescan which was used by ChartProcessor.process_uptime_chart."""
+    buckets = []
+    for d in range(count):
+        bucket_start = start_time + width * d
+        bucket_end = bucket_start + width
+        logs_in_bucket = [log._asdict() for log in logs if bucket_start <= log._asdict()['created_at'] < bucket_end]
+        buckets.append((len(logs_in_bucket), len([log for log in logs_in_bucket if log['status'] != 'healthy'])))
+    return buckets
+
+
+def measure(name: str, function, rows: int):
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    print(f"{name:<12} best of {ROUNDS}: {best * 1000:9.2f} ms  {rows / best:14,.0f} rows/s")
+
+
+def main():
+    width = timedelta(hours=1)
+    start_time = datetime(2024, 1, 1)
+    logs = generate_logs(start_time, start_time + width * BUCKETS, ROWS)
+
+    print(f"{ROWS} rows, {BUCKETS} buckets of {width}")
+    measure("single pass", lambda: TimeBuckets(start_time, width, BUCKETS).extend(logs), ROWS)
+    measure("legacy", lambda: legacy_bucketing(logs, start_time, width, BUCKETS), ROWS)
+
+    single_pass = [(b.checks, b.errors) for b in TimeBuckets(start_time, width, BUCKETS).extend(logs)]
+    assert single_pass == legacy_bucketing(logs, start_time, width, BUCKETS), "Bucketing results differ"
+
+
+if __name__ == "__main__":
+    main()
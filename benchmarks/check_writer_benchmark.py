@@ -0,0 +1,82 @@
+"""Write throughput of check results: one INSERT per row (rollup trigger per row) against the batched COPY path.
+
+Needs the database configured in .env and existing endpoints with log storage. Every round runs in a transaction
+which is rolled back, nothing is kept.
+
+Run from the repository root with: python -m benchmarks.check_writer_benchmark --endpoint 1 --endpoint 2
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.daos.endpoints_dao import EndpointDAO
+from app.daos.log_table_dao import LogTableDAO
+from app.utils import database
+
+ROUNDS = 3
+INSERT_LOG = ("INSERT INTO {schema}.{table} (created_at, endpoint_id, status, response, response_time) "
+              "VALUES (:created_at, :endpoint_id, :status, CAST(:response AS JSONB), :response_time);")
+
+
+def generate_logs(endpoints, rows: int):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return [(random.choice(endpoints), now - timedelta(seconds=rows - index),
+             'healthy' if random.random() > 0.01 else 'unhealthy', {"status_code": 200}, random.randint(20, 800))
+            for index in range(rows)]
+
+
+async def measure(name: str, write, rows: int):
+    timings = []
+    for _ in range(ROUNDS):
+        async with database.engine.connect() as connection:
+            transaction = await connection.begin()
+            db = database.SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+            db.info[database.UNIT_OF_WORK] = True
+            try:
+                started = time.perf_counter()
+                await write(LogTableDAO(db))
+                timings.append(time.perf_counter() - started)
+            finally:
+                await db.close()
+                await transaction.rollback()
+
+    best = min(timings)
+    print(f"{name:<14} best of {ROUNDS}: {best * 1000:9.2f} ms  {rows / best:14,.0f} rows/s")
+
+
+async def main(endpoint_ids, rows: int, batch_rows: int):
+    endpoints = list((await EndpointDAO().get_by_ids(endpoint_ids)).values())
+    if not endpoints:
+        raise SystemExit("None of the given endpoints exists.")
+    logs = generate_logs(endpoints, rows)
+
+    async def insert_rows(log_table_dao: LogTableDAO):
+        for endpoint, created_at, status, response, response_time in logs:
+            schema, table = log_table_dao._log_target(endpoint)
+            await log_table_dao.db.execute(text(INSERT_LOG.format(schema=schema, table=table)), {
+                "created_at": created_at, "endpoint_id": endpoint.id, "status": status,
+                "response": json.dumps(response), "response_time": response_time})
+
+    async def copy_batches(log_table_dao: LogTableDAO):
+        for start in range(0, rows, batch_rows):
+            await log_table_dao.copy_logs(logs[start:start + batch_rows])
+
+    print(f"{rows} rows over {len(endpoints)} endpoints, batches of {batch_rows} rows")
+    await measure("insert per row", insert_rows, rows)
+    await measure("batched copy", copy_batches, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoint", type=int, action="append", dest="endpoint_ids", required=True,
+                        help="Endpoint ID the results are written for, can be repeated.")
+    parser.add_argument("--rows", type=int, default=20000, help="Results written per round.")
+    parser.add_argument("--batch-rows", type=int, default=1000, help="Results per COPY batch.")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.endpoint_ids, args.rows, args.batch_rows))
@@ -0,0 +1,14 @@
+import argparse
+import asyncio
+
+from app.services.log_migration_srv import LogMigrationService
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the per-endpoint log tables into the partitioned storage.")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows copied per transaction.")
+    parser.add_argument("--endpoint", type=int, action="append", dest="endpoint_ids",
+                        help="Migrate only this endpoint ID, can be repeated.")
+    args = parser.parse_args()
+
+    asyncio.run(LogMigrationService().migrate(args.batch_size, args.endpoint_ids))
@@ -0,0 +1,13 @@
+import argparse
+import asyncio
+
+from app.services.probe_srv import ProbeService
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the health checks of the endpoints from their cron schedules.")
+    parser.add_argument("--concurrency", type=int, help="Checks in flight at once (default: probe_concurrency).")
+    parser.add_argument("--timeout", type=float, help="Seconds before a check times out (default: probe_timeout).")
+    args = parser.parse_args()
+
+    asyncio.run(ProbeService(args.concurrency, args.timeout).run())